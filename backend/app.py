@@ -3,6 +3,7 @@ from flask_cors import CORS
 import logging
 import os
 from datetime import datetime
+from functools import partial
 import socket
 
 # Importar configuraciones
@@ -10,7 +11,7 @@ from config import config
 
 # Importar utilidades
 from utils.database import init_db, test_db_connection
-from utils.auth import create_response
+from utils.auth import create_response, verified_token_cache
 
 # Importar blueprints
 from routes.auth import auth_bp
@@ -21,10 +22,21 @@ from routes.empresa_empleado import empresa_bp, empleado_bp
 from routes.tareas import tareas_bp
 from routes.producto_routes import producto_bp
 from routes.proyecto_routes import proyecto_bp
+from routes.notificaciones import notificaciones_bp
 
 # NUEVAS IMPORTACIONES: Seguridad y middleware
 from utils.middleware import security_middleware, cors_handler, SecurityMiddleware
 from utils.security import security_event_logger
+from utils.scheduler import scheduler
+from utils.audit import audit_writer
+from utils.quotas import quota_limiter
+from utils.token_revocation import token_revocation_list
+from utils.password_pool import password_pool
+from utils.email_outbox import email_outbox
+from utils.maintenance import expired_rows_purger
+from utils.availability import availability_index
+from utils.firebase import firebase_auth
+from utils.event_bus import event_bus
 
 # Configurar logging
 logging.basicConfig(
@@ -45,6 +57,90 @@ def get_local_ip():
     except Exception:
         return "127.0.0.1"
 
+def register_background_jobs(app):
+    """Registrar los trabajos periódicos de la aplicación"""
+    from services.financial_service import proyeccion_service
+    from models.contadores_repository import ContadoresRepository
+    from models.dashboard_empresa_repository import DashboardEmpresaRepository
+    from utils.security import rate_limiter
+    
+    scheduler.add_job(
+        'proyecciones_objetivos',
+        proyeccion_service.recalcular_todas,
+        app.config['GOAL_FORECAST_INTERVAL_SECONDS'],
+        run_immediately=True
+    )
+    scheduler.add_job(
+        'reconciliar_contadores',
+        ContadoresRepository.reconciliar,
+        app.config['COUNTERS_RECONCILE_INTERVAL_SECONDS']
+    )
+    scheduler.add_job(
+        'resumir_eventos_seguridad',
+        security_event_logger.flush,
+        app.config['SECURITY_EVENT_WINDOW_SECONDS']
+    )
+    scheduler.add_job(
+        'purgar_rate_limits',
+        rate_limiter.store.purge_expired,
+        app.config['RATE_LIMIT_PURGE_INTERVAL_SECONDS']
+    )
+
+    # Carga inicial síncrona: ningún token revocado pasa mientras arranca el worker
+    try:
+        token_revocation_list.sync()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo cargar la lista de revocación: {e}")
+    scheduler.add_job(
+        'sincronizar_revocaciones',
+        token_revocation_list.sync,
+        app.config['REVOCATION_SYNC_INTERVAL_SECONDS']
+    )
+    scheduler.add_job(
+        'podar_revocaciones',
+        token_revocation_list.prune,
+        app.config['REVOCATION_PRUNE_INTERVAL_SECONDS']
+    )
+
+    # Índice de disponibilidad: carga inicial en segundo plano (mientras tanto
+    # /check-username y /check-email consultan la base de datos)
+    scheduler.add_job(
+        'reconstruir_disponibilidad',
+        availability_index.build,
+        app.config['AVAILABILITY_REBUILD_INTERVAL_SECONDS'],
+        run_immediately=True
+    )
+    scheduler.add_job(
+        'sincronizar_disponibilidad',
+        availability_index.sync,
+        app.config['AVAILABILITY_SYNC_INTERVAL_SECONDS']
+    )
+
+    # Claves públicas de Firebase: precarga y renovación antes de que venzan
+    if firebase_auth.is_configured():
+        scheduler.add_job(
+            'refrescar_claves_firebase',
+            firebase_auth.key_store.refresh_if_stale,
+            app.config['FIREBASE_KEYS_CHECK_INTERVAL_SECONDS'],
+            run_immediately=True
+        )
+    if app.config['EMPRESA_DASHBOARD_ROLLUPS_ENABLED']:
+        scheduler.add_job(
+            'rollups_dashboard_empresa',
+            partial(DashboardEmpresaRepository.refrescar_rollups, app.config['EMPRESA_DASHBOARD_ROLLUP_MIN_EMPLEADOS']),
+            app.config['EMPRESA_DASHBOARD_ROLLUP_INTERVAL_SECONDS'],
+            run_immediately=True
+        )
+    scheduler.add_job(
+        'purgar_expirados',
+        expired_rows_purger.purge_all,
+        app.config['PURGE_INTERVAL_SECONDS']
+    )
+
+    # Workers de la bandeja de salida (envían también lo que quedó pendiente)
+    if app.config['EMAIL_OUTBOX_ENABLED']:
+        email_outbox.start()
+
 def create_app(config_name=None):
     """Factory function para crear la aplicación Flask"""
     
@@ -90,8 +186,15 @@ def create_app(config_name=None):
     app.register_blueprint(tareas_bp, url_prefix='/api/tareas')
     app.register_blueprint(producto_bp)
     app.register_blueprint(proyecto_bp)
+    app.register_blueprint(notificaciones_bp)
     logger.info("✅ Blueprints registrados correctamente")
     
+    # Tareas periódicas en segundo plano
+    if app.config.get('BACKGROUND_JOBS_ENABLED'):
+        register_background_jobs(app)
+        scheduler.start()
+        logger.info("⏱️ Tareas en segundo plano iniciadas")
+    
     # Ruta de prueba y salud
     @app.route('/')
     def index():
@@ -152,7 +255,18 @@ def create_app(config_name=None):
                 'version': '1.0.0',
                 'local_ip': local_ip,
                 'expo_ready': db_status,
-                'cors_origins': 'dynamic'
+                'cors_origins': 'dynamic',
+                'audit': audit_writer.get_stats(),
+                'quotas': quota_limiter.get_stats(),
+                'jwt_cache': verified_token_cache.get_stats(),
+                'revocations': token_revocation_list.get_stats(),
+                'password_pool': password_pool.get_stats(),
+                'email_outbox': email_outbox.get_stats(),
+                'purge': expired_rows_purger.get_stats(),
+                'availability': availability_index.get_stats(),
+                'firebase': firebase_auth.get_stats(),
+                'security_events': security_event_logger.get_stats(),
+                'event_bus': event_bus.get_stats()
             }
             
             status_code = 200 if db_status else 503
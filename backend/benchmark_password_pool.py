@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Latencias con carga mixta de login (bcrypt) y dashboard (CPU ligera):
+bcrypt en el hilo de la request vs pool de procesos acotado.
+También verifica el rechazo rápido cuando la cola del pool se llena.
+"""
+
+import sys
+import os
+import time
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.password_pool import PasswordHasherPool, PasswordPoolBusy
+
+ROUNDS = 12
+REQUEST_THREADS = 16
+TOTAL_REQUESTS = 200
+LOGIN_EVERY = 5  # 1 de cada 5 requests es un login
+
+
+def _dashboard():
+    # Trabajo Python que necesita el GIL, similar a armar la respuesta JSON
+    return sum(i * i for i in range(20000))
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(nombre, pool, password_hash):
+    latencias = {'login': [], 'dashboard': []}
+    rechazados = [0]
+
+    def request(i):
+        inicio = time.perf_counter()
+        tipo = 'login' if i % LOGIN_EVERY == 0 else 'dashboard'
+        try:
+            if tipo == 'login':
+                pool.verify('Password123', password_hash)
+            else:
+                _dashboard()
+        except PasswordPoolBusy:
+            rechazados[0] += 1
+            return
+        latencias[tipo].append((time.perf_counter() - inicio) * 1000)
+
+    with ThreadPoolExecutor(max_workers=REQUEST_THREADS) as executor:
+        list(executor.map(request, range(TOTAL_REQUESTS)))
+
+    print(f"{nombre}")
+    for tipo, valores in latencias.items():
+        print(f"   {tipo:<10} p50={statistics.median(valores):8.1f} ms  "
+              f"p95={_percentil(valores, 0.95):8.1f} ms  n={len(valores)}")
+    print(f"   rechazados={rechazados[0]}")
+    return latencias
+
+
+def test_rechazo_rapido():
+    print("PRUEBA: rechazo inmediato con la cola llena")
+    pool = PasswordHasherPool(workers=1, max_pending=1, rounds=ROUNDS)
+    errores = []
+
+    def hashear(_):
+        inicio = time.perf_counter()
+        try:
+            pool.hash('Password123')
+        except PasswordPoolBusy:
+            errores.append((time.perf_counter() - inicio) * 1000)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(hashear, range(8)))
+    pool.shutdown()
+
+    if not errores:
+        print("❌ No se rechazó ninguna solicitud")
+        return False
+    print(f"   rechazadas={len(errores)} en {max(errores):.2f} ms como máximo")
+    return max(errores) < 50
+
+
+def test_rehash():
+    print("PRUEBA: detección de costo distinto para re-hash")
+    pool = PasswordHasherPool(workers=0, rounds=ROUNDS)
+    viejo = PasswordHasherPool(workers=0, rounds=4).hash('Password123')
+    return pool.needs_rehash(viejo) and pool.verify('Password123', viejo)
+
+
+if __name__ == "__main__":
+    print("Benchmark - bcrypt en pool de procesos")
+    print("=" * 60)
+
+    try:
+        ok = test_rechazo_rapido() and test_rehash()
+        print()
+
+        password_hash = PasswordHasherPool(workers=0, rounds=ROUNDS).hash('Password123')
+
+        en_hilo = PasswordHasherPool(workers=0, rounds=ROUNDS)
+        medir("bcrypt en el hilo de la request", en_hilo, password_hash)
+
+        pool = PasswordHasherPool(workers=max(1, (os.cpu_count() or 2) - 1),
+                                  max_pending=TOTAL_REQUESTS, rounds=ROUNDS)
+        medir(f"bcrypt en pool ({pool.workers} procesos)", pool, password_hash)
+        print(f"   stats={pool.get_stats()}")
+        pool.shutdown()
+
+        if ok:
+            print("✅ Pruebas completadas exitosamente!")
+        else:
+            print("❌ Algunas pruebas fallaron!")
+            sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error ejecutando pruebas: {e}")
+        sys.exit(1)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del costo por request de la inspección de User-Agent y path:
+bucle de re.search por patrón (implementación anterior) vs firmas
+precompiladas en una sola regex con caché LRU de User-Agents
+"""
+
+import sys
+import os
+import re
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.request_screening import (
+    RequestScreener, DEFAULT_USER_AGENT_SIGNATURES, DEFAULT_PATH_SIGNATURES
+)
+
+ITERACIONES = 50000
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+    'Expo/2.29.8 CFNetwork/1474 Darwin/23.0.0',
+    'okhttp/4.9.2',
+    'sqlmap/1.7.2#stable (https://sqlmap.org)'
+]
+
+PATHS = [
+    '/api/v1/financial/dashboard',
+    '/api/v1/financial/transactions',
+    '/api/v1/auth/login',
+    '/api/v1/financial/goals/12/movements',
+    '/static/../../etc/passwd'
+]
+
+
+def _legacy_user_agent(user_agent):
+    if not user_agent:
+        return True
+    user_agent_lower = user_agent.lower()
+    for pattern in DEFAULT_USER_AGENT_SIGNATURES:
+        if re.search(pattern, user_agent_lower, re.IGNORECASE):
+            return True
+    return False
+
+
+def _legacy_path(path):
+    path_lower = path.lower()
+    for pattern in DEFAULT_PATH_SIGNATURES:
+        if re.search(pattern, path_lower, re.IGNORECASE):
+            return True
+    return False
+
+
+def medir(nombre, verificar_ua, verificar_path):
+    inicio = time.perf_counter()
+    for i in range(ITERACIONES):
+        verificar_ua(USER_AGENTS[i % len(USER_AGENTS)])
+        verificar_path(PATHS[i % len(PATHS)])
+    por_request = (time.perf_counter() - inicio) / ITERACIONES * 1e6
+    print(f"{nombre:<28} {por_request:8.2f} µs/request")
+    return por_request
+
+
+def test_mismos_veredictos(screener):
+    print("PRUEBA: el motor precompilado da los mismos veredictos")
+    for user_agent in USER_AGENTS + ['']:
+        if screener.is_suspicious_user_agent(user_agent) != _legacy_user_agent(user_agent):
+            print(f"❌ Veredicto distinto para User-Agent: {user_agent}")
+            return False
+    for path in PATHS:
+        if screener.is_path_traversal(path) != _legacy_path(path):
+            print(f"❌ Veredicto distinto para path: {path}")
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    print("Micro-benchmark - Inspección de requests")
+    print("=" * 60)
+
+    try:
+        screener = RequestScreener()
+        ok = test_mismos_veredictos(screener)
+        print()
+
+        anterior = medir("re.search por patrón", _legacy_user_agent, _legacy_path)
+        nuevo = medir("regex combinada + LRU", screener.is_suspicious_user_agent, screener.is_path_traversal)
+        print(f"Mejora: {anterior / nuevo:.1f}x | Caché UA: {screener.get_stats()}")
+
+        if ok:
+            print("✅ Pruebas completadas exitosamente!")
+        else:
+            print("❌ Algunas pruebas fallaron!")
+            sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error ejecutando pruebas: {e}")
+        sys.exit(1)
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Script para construir (o reconstruir) el índice de búsqueda de usuarios
+"""
+
+import sys
+import os
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.user_search_repository import UserSearchRepository
+
+
+if __name__ == "__main__":
+    print("Construyendo índice de búsqueda de usuarios...")
+    print("=" * 60)
+
+    try:
+        inicio = time.monotonic()
+        total = UserSearchRepository.reconstruir()
+        print(f"✅ {total} usuarios indexados en {time.monotonic() - inicio:.1f} s")
+    except Exception as e:
+        print(f"❌ Error construyendo el índice: {e}")
+        sys.exit(1)
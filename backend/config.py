@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -31,6 +32,59 @@ class Config:
         seconds=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 7200))
     )
     JWT_ALGORITHM = 'HS256'
+    # Caché de tokens ya verificados (claims por hash del token, expira en 'exp')
+    JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', 10000))
+    JWT_CACHE_MAX_TTL_SECONDS = int(os.getenv('JWT_CACHE_MAX_TTL_SECONDS', 900))
+    # Revocación de tokens (revoked_tokens + filtro de Bloom en memoria)
+    REVOCATION_BLOOM_CAPACITY = int(os.getenv('REVOCATION_BLOOM_CAPACITY', 100000))
+    REVOCATION_BLOOM_ERROR_RATE = float(os.getenv('REVOCATION_BLOOM_ERROR_RATE', 0.001))
+    REVOCATION_SYNC_INTERVAL_SECONDS = int(os.getenv('REVOCATION_SYNC_INTERVAL_SECONDS', 15))
+    REVOCATION_PRUNE_INTERVAL_SECONDS = int(os.getenv('REVOCATION_PRUNE_INTERVAL_SECONDS', 3600))
+    
+    # Purga por trozos de tokens, códigos y emails vencidos
+    PURGE_INTERVAL_SECONDS = int(os.getenv('PURGE_INTERVAL_SECONDS', 900))
+    PURGE_CHUNK_SIZE = int(os.getenv('PURGE_CHUNK_SIZE', 1000))
+    PURGE_PAUSE_MS = int(os.getenv('PURGE_PAUSE_MS', 50))
+    PURGE_MAX_SECONDS_PER_RUN = float(os.getenv('PURGE_MAX_SECONDS_PER_RUN', 30))
+    PURGE_TOKEN_RETENTION_MINUTES = int(os.getenv('PURGE_TOKEN_RETENTION_MINUTES', 60))
+    PURGE_OUTBOX_RETENTION_DAYS = int(os.getenv('PURGE_OUTBOX_RETENTION_DAYS', 7))
+    # Caché de los campos de autorización del usuario (rutas de perfil)
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 5000))
+    USER_CACHE_TTL_SECONDS = int(os.getenv('USER_CACHE_TTL_SECONDS', 30))
+    # Índice de disponibilidad de username/email (Bloom + caché negativo)
+    AVAILABILITY_BLOOM_CAPACITY = int(os.getenv('AVAILABILITY_BLOOM_CAPACITY', 200000))
+    AVAILABILITY_BLOOM_ERROR_RATE = float(os.getenv('AVAILABILITY_BLOOM_ERROR_RATE', 0.01))
+    AVAILABILITY_NEGATIVE_CACHE_SIZE = int(os.getenv('AVAILABILITY_NEGATIVE_CACHE_SIZE', 10000))
+    AVAILABILITY_NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv('AVAILABILITY_NEGATIVE_CACHE_TTL_SECONDS', 30))
+    AVAILABILITY_SYNC_INTERVAL_SECONDS = int(os.getenv('AVAILABILITY_SYNC_INTERVAL_SECONDS', 30))
+    AVAILABILITY_REBUILD_INTERVAL_SECONDS = int(os.getenv('AVAILABILITY_REBUILD_INTERVAL_SECONDS', 3600))
+    # Verificación de ID tokens de Firebase (claves precargadas + caché de claims)
+    FIREBASE_CLAIMS_CACHE_SIZE = int(os.getenv('FIREBASE_CLAIMS_CACHE_SIZE', 2000))
+    FIREBASE_CLOCK_SKEW_SECONDS = int(os.getenv('FIREBASE_CLOCK_SKEW_SECONDS', 30))
+    FIREBASE_KEYS_REFRESH_MARGIN_SECONDS = int(os.getenv('FIREBASE_KEYS_REFRESH_MARGIN_SECONDS', 600))
+    FIREBASE_KEYS_CHECK_INTERVAL_SECONDS = int(os.getenv('FIREBASE_KEYS_CHECK_INTERVAL_SECONDS', 300))
+    # Dashboard de empresa: rollups mensuales precalculados para empresas grandes
+    EMPRESA_DASHBOARD_ROLLUPS_ENABLED = os.getenv('EMPRESA_DASHBOARD_ROLLUPS_ENABLED', 'False').lower() == 'true'
+    EMPRESA_DASHBOARD_ROLLUP_MIN_EMPLEADOS = int(os.getenv('EMPRESA_DASHBOARD_ROLLUP_MIN_EMPLEADOS', 50))
+    EMPRESA_DASHBOARD_ROLLUP_INTERVAL_SECONDS = int(os.getenv('EMPRESA_DASHBOARD_ROLLUP_INTERVAL_SECONDS', 300))
+    EMPRESA_DASHBOARD_ROLLUP_MAX_AGE_SECONDS = int(os.getenv('EMPRESA_DASHBOARD_ROLLUP_MAX_AGE_SECONDS', 900))
+    # Aprobación/rechazo de gastos por lote
+    EMPRESA_GASTOS_LOTE_MAX = int(os.getenv('EMPRESA_GASTOS_LOTE_MAX', 500))
+    # Alta masiva de empleados (JSON o CSV)
+    EMPRESA_EMPLEADOS_LOTE_MAX = int(os.getenv('EMPRESA_EMPLEADOS_LOTE_MAX', 500))
+    EMPRESA_EMPLEADOS_CSV_MAX_BYTES = int(os.getenv('EMPRESA_EMPLEADOS_CSV_MAX_BYTES', 1024 * 1024))
+    # Bus de eventos de aprobación y streams SSE (memory = un worker, database = compartido vía notificaciones)
+    EVENT_BUS_BACKEND = os.getenv('EVENT_BUS_BACKEND', 'memory')
+    EVENT_BUS_POLL_SECONDS = float(os.getenv('EVENT_BUS_POLL_SECONDS', 1.0))
+    EVENT_BUS_MAX_QUEUE = int(os.getenv('EVENT_BUS_MAX_QUEUE', 100))
+    EVENT_BUS_MAX_STREAMS_PER_USER = int(os.getenv('EVENT_BUS_MAX_STREAMS_PER_USER', 5))
+    EVENT_BUS_HEARTBEAT_SECONDS = int(os.getenv('EVENT_BUS_HEARTBEAT_SECONDS', 15))
+    EVENT_BUS_STREAM_MAX_SECONDS = int(os.getenv('EVENT_BUS_STREAM_MAX_SECONDS', 300))
+    EVENT_BUS_RETRY_MS = int(os.getenv('EVENT_BUS_RETRY_MS', 3000))
+    # Margen de ids releídos al reconectar y segundos que el poller espera un id saltado
+    # (transacciones que confirman fuera de orden)
+    EVENT_BUS_LOOKBACK_IDS = int(os.getenv('EVENT_BUS_LOOKBACK_IDS', 1000))
+    EVENT_BUS_GAP_SECONDS = float(os.getenv('EVENT_BUS_GAP_SECONDS', 30))
     
     # Configuración CORS segura y flexible
     @classmethod
@@ -66,9 +120,102 @@ class Config:
     
     CORS_ORIGINS = []  # Se poblará dinámicamente
     
+    # Tareas en segundo plano
+    BACKGROUND_JOBS_ENABLED = os.getenv('BACKGROUND_JOBS_ENABLED', 'true').lower() == 'true'
+    GOAL_FORECAST_INTERVAL_SECONDS = int(os.getenv('GOAL_FORECAST_INTERVAL_SECONDS', 3600))
+    COUNTERS_RECONCILE_INTERVAL_SECONDS = int(os.getenv('COUNTERS_RECONCILE_INTERVAL_SECONDS', 6 * 3600))
+    
+    # Auditoría asíncrona (cola acotada + escritura por lotes)
+    AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 200))
+    AUDIT_FLUSH_INTERVAL_MS = int(os.getenv('AUDIT_FLUSH_INTERVAL_MS', 500))
+    
+    # Rate limiting (memory = por proceso, sqlite = compartido entre workers del host)
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_SQLITE_PATH = os.getenv(
+        'RATE_LIMIT_SQLITE_PATH',
+        os.path.join(tempfile.gettempdir(), 'mi_app_rate_limits.sqlite3')
+    )
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+    RATE_LIMIT_PURGE_INTERVAL_SECONDS = int(os.getenv('RATE_LIMIT_PURGE_INTERVAL_SECONDS', 300))
+    # Eventos de seguridad agregados por (ip, tipo) y bloqueo automático de IPs
+    SECURITY_EVENT_WINDOW_SECONDS = int(os.getenv('SECURITY_EVENT_WINDOW_SECONDS', 60))
+    SECURITY_EVENT_MAX_KEYS = int(os.getenv('SECURITY_EVENT_MAX_KEYS', 10000))
+    SECURITY_AUTOBLOCK_THRESHOLD = int(os.getenv('SECURITY_AUTOBLOCK_THRESHOLD', 100))  # 0 desactiva
+    SECURITY_AUTOBLOCK_SECONDS = int(os.getenv('SECURITY_AUTOBLOCK_SECONDS', 900))
+    SECURITY_AUTOBLOCK_ALLOWLIST = [
+        ip.strip() for ip in os.getenv('SECURITY_AUTOBLOCK_ALLOWLIST', '127.0.0.1,::1').split(',') if ip.strip()
+    ]
+    # Envíos de código de verificación por email (cooldown + ventana)
+    VERIFICATION_EMAIL_COOLDOWN_SECONDS = int(os.getenv('VERIFICATION_EMAIL_COOLDOWN_SECONDS', 60))
+    VERIFICATION_EMAIL_MAX_PER_WINDOW = int(os.getenv('VERIFICATION_EMAIL_MAX_PER_WINDOW', 3))
+    VERIFICATION_EMAIL_WINDOW_SECONDS = int(os.getenv('VERIFICATION_EMAIL_WINDOW_SECONDS', 900))
+    
+    # Cuotas por usuario (token bucket): burst = capacidad, refill = tokens por segundo
+    QUOTAS_ENABLED = os.getenv('QUOTAS_ENABLED', 'true').lower() == 'true'
+    QUOTA_BUCKETS = {
+        'api': {
+            'burst': float(os.getenv('QUOTA_API_BURST', 120)),
+            'refill_per_second': float(os.getenv('QUOTA_API_REFILL_PER_SECOND', 2))
+        },
+        'chat': {
+            'burst': float(os.getenv('QUOTA_CHAT_BURST', 5)),
+            'refill_per_second': float(os.getenv('QUOTA_CHAT_REFILL_PER_SECOND', 0.1))
+        }
+    }
+    # Ruta -> (bucket, costo en tokens); las rutas no listadas cuestan 1 del bucket 'api'
+    QUOTA_ROUTES = {
+        'read': ('api', 1),
+        'dashboard': ('api', 6),
+        'transactions': ('api', 4),
+        'income_summary': ('api', 3),
+        'expenses_by_category': ('api', 3),
+        'goals_summary': ('api', 3),
+        'goal_movements': ('api', 2),
+        'bills_summary': ('api', 2),
+        'write': ('api', 3),
+        'chat': ('chat', 1)
+    }
+    
+    # Inspección de requests: firmas adicionales (regex separadas por ';;')
+    SCREENING_EXTRA_USER_AGENT_SIGNATURES = [
+        sig for sig in os.getenv('SCREENING_EXTRA_USER_AGENT_SIGNATURES', '').split(';;') if sig.strip()
+    ]
+    SCREENING_EXTRA_PATH_SIGNATURES = [
+        sig for sig in os.getenv('SCREENING_EXTRA_PATH_SIGNATURES', '').split(';;') if sig.strip()
+    ]
+    SCREENING_UA_CACHE_SIZE = int(os.getenv('SCREENING_UA_CACHE_SIZE', 4096))
+    
+    # Email: bandeja de salida con workers SMTP (EMAIL_SMTP_PORT=0 usa Gmail 465/587)
+    EMAIL_OUTBOX_ENABLED = os.getenv('EMAIL_OUTBOX_ENABLED', 'True').lower() == 'true'
+    EMAIL_OUTBOX_WORKERS = int(os.getenv('EMAIL_OUTBOX_WORKERS', 2))
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 20))
+    EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv('EMAIL_OUTBOX_POLL_SECONDS', 5))
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+    EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.getenv('EMAIL_OUTBOX_BACKOFF_SECONDS', 30))
+    EMAIL_SMTP_HOST = os.getenv('EMAIL_SMTP_HOST', 'smtp.gmail.com')
+    EMAIL_SMTP_PORT = int(os.getenv('EMAIL_SMTP_PORT', 0))
+    EMAIL_SMTP_SECURITY = os.getenv('EMAIL_SMTP_SECURITY', 'starttls')  # ssl | starttls | none
+    EMAIL_SMTP_USER = os.getenv('GMAIL_EMAIL')
+    EMAIL_SMTP_PASSWORD = os.getenv('GMAIL_APP_PASSWORD')
+    
+    # Chatbot (pool acotado de llamadas al modelo)
+    CHAT_MODEL_BACKEND = os.getenv('CHAT_MODEL_BACKEND', 'gemini')  # gemini | fake
+    CHAT_MAX_WORKERS = int(os.getenv('CHAT_MAX_WORKERS', 4))
+    CHAT_MAX_QUEUE = int(os.getenv('CHAT_MAX_QUEUE', 16))
+    CHAT_MAX_PER_USER = int(os.getenv('CHAT_MAX_PER_USER', 1))
+    CHAT_RESPONSE_TIMEOUT = float(os.getenv('CHAT_RESPONSE_TIMEOUT', 60))
+    CHAT_CONTEXT_MAX_TOKENS = int(os.getenv('CHAT_CONTEXT_MAX_TOKENS', 400))
+    CHAT_CONTEXT_TTL_SECONDS = float(os.getenv('CHAT_CONTEXT_TTL_SECONDS', 600))
+    
     # Configuración de validación
     PASSWORD_MIN_LENGTH = 8
     PASSWORD_MAX_LENGTH = 128
+    # bcrypt en pool de procesos (0 workers = en el hilo de la request)
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    PASSWORD_POOL_WORKERS = int(os.getenv('PASSWORD_POOL_WORKERS', 2))
+    PASSWORD_POOL_MAX_PENDING = int(os.getenv('PASSWORD_POOL_MAX_PENDING', 32))
+    PASSWORD_POOL_TIMEOUT_SECONDS = float(os.getenv('PASSWORD_POOL_TIMEOUT_SECONDS', 10))
     USERNAME_MIN_LENGTH = 3
     USERNAME_MAX_LENGTH = 50
 
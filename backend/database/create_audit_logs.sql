@@ -0,0 +1,18 @@
+-- Registro de auditoría del panel de administración
+-- Lo escribe por lotes utils/audit.py (AuditWriter); created_at lo fija la
+-- aplicación al encolar el evento, no el momento del INSERT del lote.
+
+USE mi_app_db;
+
+CREATE TABLE IF NOT EXISTS audit_logs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NULL,
+    action VARCHAR(64) NOT NULL,
+    target_type VARCHAR(50) NULL,
+    target_id INT NULL,
+    details JSON NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    INDEX idx_created_at (created_at),
+    INDEX idx_user_id (user_id)
+) ENGINE=InnoDB;
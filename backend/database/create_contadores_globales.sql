@@ -0,0 +1,52 @@
+-- Contadores globales del panel de administración
+-- Se actualizan en la misma transacción que los INSERT/DELETE de users, ingresos
+-- y gastos (ver models/contadores_repository.py) y los reconcilia un job periódico.
+-- Cada clave se reparte en varios slots para no serializar las escrituras en una fila.
+
+USE mi_app_db;
+
+-- Columna usada por la gestión de usuarios del panel de administración.
+-- ADD COLUMN IF NOT EXISTS es solo de MariaDB: se consulta information_schema
+-- para que el script también corra en MySQL 8 (imagen de docker-compose).
+SET @tiene_status := (
+    SELECT COUNT(*) FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'status'
+);
+SET @sql_status := IF(@tiene_status = 0,
+    'ALTER TABLE users ADD COLUMN status ENUM(''active'', ''suspended'', ''banned'') NOT NULL DEFAULT ''active''',
+    'DO 0');
+PREPARE agregar_status FROM @sql_status;
+EXECUTE agregar_status;
+DEALLOCATE PREPARE agregar_status;
+
+CREATE TABLE IF NOT EXISTS contadores_globales (
+    clave VARCHAR(64) NOT NULL,
+    slot TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    valor DECIMAL(20,2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (clave, slot)
+) ENGINE=InnoDB;
+
+-- Carga inicial (la reconciliación periódica también la corrige)
+INSERT INTO contadores_globales (clave, slot, valor)
+SELECT 'usuarios_total', 0, COUNT(*) FROM users
+ON DUPLICATE KEY UPDATE valor = VALUES(valor);
+
+INSERT INTO contadores_globales (clave, slot, valor)
+SELECT 'usuarios_baneados', 0, COALESCE(SUM(status = 'banned'), 0) FROM users
+ON DUPLICATE KEY UPDATE valor = VALUES(valor);
+
+INSERT INTO contadores_globales (clave, slot, valor)
+SELECT 'ingresos_total', 0, COALESCE(SUM(monto), 0) FROM ingresos
+ON DUPLICATE KEY UPDATE valor = VALUES(valor);
+
+INSERT INTO contadores_globales (clave, slot, valor)
+SELECT 'gastos_total', 0, COALESCE(SUM(monto), 0) FROM gastos
+ON DUPLICATE KEY UPDATE valor = VALUES(valor);
+
+INSERT INTO contadores_globales (clave, slot, valor)
+SELECT CONCAT('usuarios_nuevos:', DATE_FORMAT(created_at, '%Y-%m')), 0, COUNT(*)
+FROM users
+GROUP BY DATE_FORMAT(created_at, '%Y-%m')
+ON DUPLICATE KEY UPDATE valor = VALUES(valor);
@@ -0,0 +1,27 @@
+-- Dashboard de empresa (ver models/dashboard_empresa_repository.py)
+-- El resumen por empleado filtra gastos por rango de fechas (fecha >= inicio
+-- AND fecha < fin) sobre un índice que cubre todas las columnas leídas, sin
+-- tocar las filas de gastos. idx_user_fecha queda cubierto por el nuevo índice.
+-- dashboard_empresa_mensual guarda el mismo resumen precalculado por un job
+-- para las empresas grandes (EMPRESA_DASHBOARD_ROLLUPS_ENABLED).
+-- ADD/DROP INDEX IF [NOT] EXISTS requiere MariaDB.
+
+USE mi_app_db;
+
+ALTER TABLE gastos
+    ADD INDEX IF NOT EXISTS idx_user_fecha_estado_monto (user_id, fecha, estado_aprobacion_id, monto, requiere_aprobacion),
+    DROP INDEX IF EXISTS idx_user_fecha;
+
+CREATE TABLE IF NOT EXISTS dashboard_empresa_mensual (
+    empresa_id INT NOT NULL,
+    user_id INT NOT NULL,
+    mes DATE NOT NULL,
+    gastos_aprobados DECIMAL(14,2) NOT NULL DEFAULT 0,
+    pendientes_mes INT NOT NULL DEFAULT 0,
+    pendientes_total INT NOT NULL DEFAULT 0,
+    actualizado_en DATETIME NOT NULL,
+
+    PRIMARY KEY (empresa_id, mes, user_id),
+    INDEX idx_mes_actualizado (mes, actualizado_en),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
@@ -0,0 +1,25 @@
+-- Bandeja de salida de emails
+-- La escriben las requests (registro, reenvío de código, verificación de
+-- acciones de admin) y la vacían los workers de utils/email_outbox.py.
+-- next_attempt_at es el backoff de reintentos y, en estado 'sending', el
+-- vencimiento del lease del worker que reclamó el email.
+-- FOR UPDATE SKIP LOCKED requiere MySQL 8.0+ o MariaDB 10.6+.
+
+USE mi_app_db;
+
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    recipient VARCHAR(255) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    body_text TEXT NOT NULL,
+    body_html MEDIUMTEXT NULL,
+    status ENUM('pending', 'sending', 'sent', 'failed') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error VARCHAR(500) NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME NULL,
+
+    INDEX idx_status_next_attempt (status, next_attempt_at),
+    INDEX idx_created_at (created_at)
+) ENGINE=InnoDB;
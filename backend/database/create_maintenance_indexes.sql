@@ -0,0 +1,13 @@
+-- Índices para la purga por trozos de utils/maintenance.py
+-- Cada DELETE ... WHERE expires_at < ... LIMIT n debe recorrer un rango del
+-- índice y no la tabla completa. email_verification_tokens,
+-- password_reset_tokens y revoked_tokens ya tienen idx_expires_at en schema.sql.
+-- ADD INDEX IF NOT EXISTS requiere MariaDB.
+
+USE mi_app_db;
+
+ALTER TABLE action_verification_codes
+    ADD INDEX IF NOT EXISTS idx_expires_at (expires_at);
+
+ALTER TABLE email_outbox
+    ADD INDEX IF NOT EXISTS idx_status_created_at (status, created_at);
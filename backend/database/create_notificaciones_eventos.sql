@@ -0,0 +1,10 @@
+-- Notificaciones como historial del bus de eventos (ver utils/event_bus.py)
+-- Al reconectar, el stream SSE lee WHERE user_id = ? AND id > ? ORDER BY id:
+-- idx_user_leida no sirve para ese rango, idx_user_id_id sí.
+-- Con EVENT_BUS_BACKEND=database cada worker recorre la PK por id > último leído.
+-- ADD INDEX IF NOT EXISTS requiere MariaDB.
+
+USE mi_app_db;
+
+ALTER TABLE notificaciones
+    ADD INDEX IF NOT EXISTS idx_user_id_id (user_id, id);
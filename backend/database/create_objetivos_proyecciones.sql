@@ -0,0 +1,23 @@
+-- Proyecciones precalculadas de objetivos de ahorro
+-- Las genera el job batch de ProyeccionObjetivoService; /goals y el dashboard solo las leen
+
+USE mi_app_db;
+
+CREATE TABLE IF NOT EXISTS objetivos_proyecciones (
+    objetivo_id INT PRIMARY KEY,
+    velocidad_diaria DECIMAL(14,4) NOT NULL DEFAULT 0,
+    velocidad_mensual DECIMAL(12,2) NOT NULL DEFAULT 0,
+    fecha_proyectada DATE NULL COMMENT 'NULL = al ritmo actual no se completa',
+    aporte_mensual_requerido DECIMAL(12,2) NULL COMMENT 'NULL = objetivo sin fecha límite',
+    en_camino BOOLEAN NULL,
+    completado BOOLEAN NOT NULL DEFAULT FALSE,
+    total_movimientos INT NOT NULL DEFAULT 0,
+    calculado_at DATETIME NOT NULL,
+
+    FOREIGN KEY (objetivo_id) REFERENCES objetivos(id) ON DELETE CASCADE,
+    INDEX idx_calculado_at (calculado_at)
+) ENGINE=InnoDB;
+
+-- Historial por objetivo ordenado por fecha (agregados de proyección e historial)
+ALTER TABLE objetivos_movimientos
+    ADD INDEX idx_objetivo_created_at (objetivo_id, created_at);
@@ -0,0 +1,21 @@
+-- Índice de búsqueda de usuarios para la consola de administración
+-- users_search_ngrams guarda los trigramas normalizados (minúsculas, sin acentos)
+-- de username, email, first_name y last_name; lo mantiene UserSearchRepository
+-- en cada escritura de usuario. Cargar con: python build_user_search_index.py
+
+USE mi_app_db;
+
+CREATE TABLE IF NOT EXISTS users_search_ngrams (
+    ngram CHAR(3) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    user_id INT NOT NULL,
+
+    PRIMARY KEY (ngram, user_id),
+    INDEX idx_user_id (user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Búsqueda por prefijo de nombre/apellido y listado filtrado por rol/estado
+ALTER TABLE users
+    ADD INDEX idx_first_name (first_name),
+    ADD INDEX idx_last_name (last_name),
+    ADD INDEX idx_rol_status_id (id_rol, status, id);
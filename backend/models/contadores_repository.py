@@ -0,0 +1,166 @@
+"""
+Contadores globales mantenidos incrementalmente
+Los totales del panel de administración (usuarios, baneados, ingresos y gastos
+procesados) se actualizan en la misma transacción que el INSERT/DELETE que los
+modifica, así /admin/stats y /admin/reports/summary leen unas pocas filas en
+lugar de recorrer tablas completas. Un job periódico los reconcilia.
+"""
+import logging
+import random
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Optional, Union
+
+from utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+Numero = Union[int, Decimal]
+
+
+class ContadoresRepository:
+    """
+    Cada contador se reparte en SLOTS filas (clave, slot) y cada escritura
+    suma su delta en un slot aleatorio: las transacciones concurrentes casi
+    nunca esperan por el bloqueo de la misma fila. El valor es SUM(valor).
+    """
+
+    SLOTS = 16
+
+    USUARIOS = 'usuarios_total'
+    USUARIOS_BANEADOS = 'usuarios_baneados'
+    INGRESOS = 'ingresos_total'
+    GASTOS = 'gastos_total'
+    PREFIJO_USUARIOS_MES = 'usuarios_nuevos:'
+
+    @classmethod
+    def clave_usuarios_mes(cls, fecha: Optional[Union[date, datetime]] = None) -> str:
+        """Clave del contador de usuarios registrados en el mes de la fecha"""
+        return f"{cls.PREFIJO_USUARIOS_MES}{(fecha or date.today()).strftime('%Y-%m')}"
+
+    @classmethod
+    def incrementar(cls, cursor, deltas: Dict[str, Numero]):
+        """
+        Aplica los deltas con el cursor de la transacción en curso (no hace commit).
+        Un único INSERT ... ON DUPLICATE KEY para todas las claves, en orden fijo
+        para que dos transacciones no se bloqueen mutuamente.
+        """
+        filas = [
+            (clave, random.randrange(cls.SLOTS), delta)
+            for clave, delta in sorted(deltas.items())
+            if delta
+        ]
+        if not filas:
+            return
+
+        placeholders = ", ".join(["(%s, %s, %s)"] * len(filas))
+        query = f"""
+            INSERT INTO contadores_globales (clave, slot, valor)
+            VALUES {placeholders}
+            ON DUPLICATE KEY UPDATE valor = valor + VALUES(valor)
+        """
+        cursor.execute(query, tuple(valor for fila in filas for valor in fila))
+
+    @classmethod
+    def delta_usuario(cls, signo: int, status: Optional[str] = None,
+                      created_at: Optional[Union[date, datetime]] = None) -> Dict[str, int]:
+        """Deltas correspondientes a crear (signo=1) o eliminar (signo=-1) un usuario"""
+        deltas = {
+            cls.USUARIOS: signo,
+            cls.clave_usuarios_mes(created_at): signo
+        }
+        if status == 'banned':
+            deltas[cls.USUARIOS_BANEADOS] = signo
+        return deltas
+
+    @classmethod
+    def obtener(cls) -> Dict[str, Decimal]:
+        """Valor actual de los contadores globales y del mes en curso"""
+        claves = (cls.USUARIOS, cls.USUARIOS_BANEADOS, cls.INGRESOS, cls.GASTOS, cls.clave_usuarios_mes())
+        query = f"""
+            SELECT clave, COALESCE(SUM(valor), 0) AS valor
+            FROM contadores_globales
+            WHERE clave IN ({", ".join(["%s"] * len(claves))})
+            GROUP BY clave
+        """
+        filas = get_db().fetch_all(query, claves) or []
+        valores = {clave: Decimal('0') for clave in claves}
+        valores.update({fila['clave']: Decimal(str(fila['valor'])) for fila in filas})
+        return valores
+
+    @classmethod
+    def reconciliar(cls) -> Dict[str, Decimal]:
+        """
+        Recalcula todos los contadores desde las tablas base y corrige la deriva.
+
+        Contadores y tablas base se leen en una misma instantánea consistente,
+        sin bloqueos: cada escritura suma su delta en la misma transacción que
+        su INSERT/DELETE, así que en la instantánea ambos coinciden salvo la
+        deriva real. La corrección es un delta más (los contadores son
+        aditivos) en una transacción corta, y las escrituras posteriores a la
+        instantánea no se pierden ni se duplican.
+        Retorna la deriva corregida por clave.
+        """
+        db = get_db()
+        with db.get_db_cursor() as (cursor, connection):
+            try:
+                connection.start_transaction(consistent_snapshot=True, isolation_level='REPEATABLE READ',
+                                             readonly=True)
+                cursor.execute("SELECT clave, valor FROM contadores_globales")
+                actuales: Dict[str, Decimal] = {}
+                for fila in cursor.fetchall():
+                    actuales[fila['clave']] = actuales.get(fila['clave'], Decimal('0')) + Decimal(str(fila['valor']))
+
+                cursor.execute("""
+                    SELECT
+                        COUNT(*) AS usuarios,
+                        COALESCE(SUM(status = 'banned'), 0) AS baneados
+                    FROM users
+                """)
+                usuarios = cursor.fetchone()
+                cursor.execute("SELECT COALESCE(SUM(monto), 0) AS total FROM ingresos")
+                ingresos = cursor.fetchone()['total']
+                cursor.execute("SELECT COALESCE(SUM(monto), 0) AS total FROM gastos")
+                gastos = cursor.fetchone()['total']
+                cursor.execute("""
+                    SELECT DATE_FORMAT(created_at, '%Y-%m') AS mes, COUNT(*) AS total
+                    FROM users
+                    GROUP BY mes
+                """)
+                meses = cursor.fetchall()
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+
+            reales = {
+                cls.USUARIOS: Decimal(usuarios['usuarios']),
+                cls.USUARIOS_BANEADOS: Decimal(usuarios['baneados']),
+                cls.INGRESOS: Decimal(str(ingresos)),
+                cls.GASTOS: Decimal(str(gastos))
+            }
+            for fila in meses:
+                if fila['mes']:
+                    reales[f"{cls.PREFIJO_USUARIOS_MES}{fila['mes']}"] = Decimal(fila['total'])
+
+            # Meses que ya no tienen usuarios quedan en cero
+            for clave in actuales:
+                reales.setdefault(clave, Decimal('0'))
+
+            deriva = {
+                clave: valor - actuales.get(clave, Decimal('0'))
+                for clave, valor in reales.items()
+                if valor != actuales.get(clave, Decimal('0'))
+            }
+            if deriva:
+                try:
+                    connection.start_transaction()
+                    cls.incrementar(cursor, deriva)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+
+        if deriva:
+            logger.warning(f"Contadores globales reconciliados con deriva: {deriva}")
+        return deriva
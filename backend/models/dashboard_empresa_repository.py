@@ -0,0 +1,150 @@
+"""
+Resumen del dashboard de empresa
+Una sola consulta trae, por empleado, los gastos aprobados y pendientes del
+mes y los pendientes de aprobación totales. Los agregados parten de los
+empleados de la empresa y buscan sus gastos por user_id (con el rango
+fecha >= inicio AND fecha < fin) en el índice idx_user_fecha_estado_monto,
+que cubre las columnas leídas: no se tocan gastos de otras empresas.
+
+Para empresas grandes el mismo resumen puede servirse de
+dashboard_empresa_mensual, que un job recalcula periódicamente.
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+ROL_EMPLEADO = 3
+ESTADO_PENDIENTE = 1
+ESTADO_APROBADO = 2
+
+
+def rango_mes(dia: Optional[date] = None) -> Tuple[date, date]:
+    """[primer día del mes, primer día del mes siguiente)"""
+    inicio = (dia or date.today()).replace(day=1)
+    fin = (inicio + timedelta(days=32)).replace(day=1)
+    return inicio, fin
+
+
+def _agregados_empleado(filtro_empresa: str) -> str:
+    """
+    Agregados por empleado en tablas derivadas. Cada una parte de los
+    empleados de las empresas que cumplen `filtro_empresa` (predicado sobre
+    e.created_by_empresa_id) y busca sus gastos en idx_user_fecha_estado_monto
+    por user_id: sin el filtro se agregarían los gastos de toda la base.
+    Parámetros: (inicio, fin, *empresa) para `mes` y (*empresa) para `pend`.
+    """
+    return f"""
+    LEFT JOIN (
+        SELECT g.user_id,
+               SUM(CASE WHEN g.estado_aprobacion_id = {ESTADO_APROBADO} THEN g.monto ELSE 0 END) AS aprobados,
+               SUM(g.estado_aprobacion_id = {ESTADO_PENDIENTE}) AS pendientes
+        FROM users e
+        JOIN gastos g ON g.user_id = e.id AND g.fecha >= %s AND g.fecha < %s
+        WHERE {filtro_empresa} AND e.id_rol = {ROL_EMPLEADO}
+        GROUP BY g.user_id
+    ) mes ON mes.user_id = u.id
+    LEFT JOIN (
+        SELECT g.user_id, COUNT(*) AS total
+        FROM users e
+        JOIN gastos g ON g.user_id = e.id
+                     AND g.estado_aprobacion_id = {ESTADO_PENDIENTE} AND g.requiere_aprobacion = 1
+        WHERE {filtro_empresa} AND e.id_rol = {ROL_EMPLEADO}
+        GROUP BY g.user_id
+    ) pend ON pend.user_id = u.id
+"""
+
+
+class DashboardEmpresaRepository:
+    """Consultas del dashboard de empresa y mantenimiento de sus rollups"""
+
+    @classmethod
+    def resumen_en_vivo(cls, empresa_id: int, inicio: date, fin: date) -> List[Dict[str, Any]]:
+        """Resumen por empleado calculado sobre gastos (un round-trip)"""
+        query = f"""
+            SELECT u.id, u.username, u.is_active,
+                   COALESCE(mes.aprobados, 0) AS gastos_aprobados,
+                   COALESCE(mes.pendientes, 0) AS pendientes_mes,
+                   COALESCE(pend.total, 0) AS pendientes_total
+            FROM users u
+            {_agregados_empleado("e.created_by_empresa_id = %s")}
+            WHERE u.created_by_empresa_id = %s AND u.id_rol = %s
+            ORDER BY gastos_aprobados DESC
+        """
+        return get_db().fetch_all(
+            query, (inicio, fin, empresa_id, empresa_id, empresa_id, ROL_EMPLEADO)
+        ) or []
+
+    @classmethod
+    def resumen_rollup(cls, empresa_id: int, mes: date, max_edad_segundos: int) -> Optional[List[Dict[str, Any]]]:
+        """Resumen precalculado del mes, o None si no existe o está desactualizado"""
+        filas = get_db().fetch_all("""
+            SELECT u.id, u.username, u.is_active,
+                   r.gastos_aprobados, r.pendientes_mes, r.pendientes_total, r.actualizado_en
+            FROM dashboard_empresa_mensual r
+            JOIN users u ON u.id = r.user_id
+            WHERE r.empresa_id = %s AND r.mes = %s
+            ORDER BY r.gastos_aprobados DESC
+        """, (empresa_id, mes)) or []
+        if not filas:
+            return None
+        limite = datetime.now() - timedelta(seconds=max_edad_segundos)
+        if min(fila['actualizado_en'] for fila in filas) < limite:
+            return None
+        return filas
+
+    @classmethod
+    def refrescar_rollups(cls, min_empleados: int, dia: Optional[date] = None) -> int:
+        """
+        Recalcula el resumen del mes de las empresas con al menos `min_empleados`
+        empleados; retorna cuántas filas escribió. Las filas de empleados que ya
+        no existen o de empresas que quedaron por debajo del umbral se borran.
+        """
+        inicio, fin = rango_mes(dia)
+        ahora = datetime.now().replace(microsecond=0)
+        db = get_db()
+        with db.get_db_cursor() as (cursor, connection):
+            try:
+                connection.start_transaction()
+                cursor.execute("""
+                    SELECT created_by_empresa_id
+                    FROM users
+                    WHERE id_rol = %s AND created_by_empresa_id IS NOT NULL
+                    GROUP BY created_by_empresa_id
+                    HAVING COUNT(*) >= %s
+                """, (ROL_EMPLEADO, min_empleados))
+                empresas = [fila['created_by_empresa_id'] for fila in cursor.fetchall()]
+
+                escritas = 0
+                if empresas:
+                    en_empresas = f"IN ({', '.join(['%s'] * len(empresas))})"
+                    cursor.execute(f"""
+                        INSERT INTO dashboard_empresa_mensual
+                            (empresa_id, user_id, mes, gastos_aprobados, pendientes_mes, pendientes_total, actualizado_en)
+                        SELECT u.created_by_empresa_id, u.id, %s,
+                               COALESCE(mes.aprobados, 0), COALESCE(mes.pendientes, 0), COALESCE(pend.total, 0), %s
+                        FROM users u
+                        {_agregados_empleado("e.created_by_empresa_id " + en_empresas)}
+                        WHERE u.created_by_empresa_id {en_empresas} AND u.id_rol = %s
+                        ON DUPLICATE KEY UPDATE
+                            gastos_aprobados = VALUES(gastos_aprobados),
+                            pendientes_mes = VALUES(pendientes_mes),
+                            pendientes_total = VALUES(pendientes_total),
+                            actualizado_en = VALUES(actualizado_en)
+                    """, (inicio, ahora, inicio, fin, *empresas, *empresas, *empresas, ROL_EMPLEADO))
+                    escritas = cursor.rowcount
+                cursor.execute(
+                    "DELETE FROM dashboard_empresa_mensual WHERE mes = %s AND actualizado_en < %s",
+                    (inicio, ahora)
+                )
+                # Meses anteriores: el dashboard solo muestra el mes en curso
+                cursor.execute("DELETE FROM dashboard_empresa_mensual WHERE mes < %s", (inicio,))
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        logger.info(f"📊 Rollups del dashboard de empresa actualizados ({escritas} filas, mes {inicio:%Y-%m})")
+        return escritas
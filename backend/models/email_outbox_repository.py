@@ -0,0 +1,92 @@
+"""
+Bandeja de salida de emails (tabla email_outbox)
+Las requests solo insertan el mensaje; los workers de utils/email_outbox.py
+reclaman lotes con FOR UPDATE SKIP LOCKED, los envían y registran el
+resultado. next_attempt_at sirve a la vez de backoff de reintentos y de
+lease: un lote reclamado por un worker que murió vuelve a estar disponible
+cuando vence.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+
+class EmailOutboxRepository:
+    """Acceso a email_outbox"""
+
+    @classmethod
+    def encolar(cls, destinatario: str, asunto: str, texto: str, html: Optional[str] = None) -> int:
+        """Inserta un email pendiente; retorna su id"""
+        return get_db().execute_query("""
+            INSERT INTO email_outbox (recipient, subject, body_text, body_html, status, next_attempt_at)
+            VALUES (%s, %s, %s, %s, 'pending', NOW())
+        """, (destinatario, asunto, texto, html))
+
+    @classmethod
+    def reclamar_lote(cls, limite: int, lease_segundos: int) -> List[Dict[str, Any]]:
+        """
+        Reclama hasta `limite` emails listos para enviar. SKIP LOCKED evita que
+        dos workers tomen el mismo lote y que esperen entre sí.
+        """
+        db = get_db()
+        with db.get_db_cursor() as (cursor, connection):
+            try:
+                connection.start_transaction()
+                cursor.execute("""
+                    SELECT id, recipient, subject, body_text, body_html, attempts
+                    FROM email_outbox
+                    WHERE status IN ('pending', 'sending') AND next_attempt_at <= NOW()
+                    ORDER BY next_attempt_at, id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                """, (limite,))
+                filas = cursor.fetchall()
+                if filas:
+                    ids = [fila['id'] for fila in filas]
+                    cursor.execute(f"""
+                        UPDATE email_outbox
+                        SET status = 'sending', next_attempt_at = NOW() + INTERVAL %s SECOND
+                        WHERE id IN ({", ".join(["%s"] * len(ids))})
+                    """, (lease_segundos, *ids))
+                connection.commit()
+                return filas
+            except Exception:
+                connection.rollback()
+                raise
+
+    @classmethod
+    def marcar_enviados(cls, ids: List[int]):
+        if not ids:
+            return
+        get_db().execute_query(f"""
+            UPDATE email_outbox
+            SET status = 'sent', attempts = attempts + 1, sent_at = NOW(), last_error = NULL
+            WHERE id IN ({", ".join(["%s"] * len(ids))})
+        """, tuple(ids))
+
+    @classmethod
+    def marcar_fallido(cls, email_id: int, error: str, reintentar_en: Optional[int]):
+        """Registra el fallo; sin reintentar_en el email queda como 'failed'"""
+        if reintentar_en is None:
+            get_db().execute_query("""
+                UPDATE email_outbox
+                SET status = 'failed', attempts = attempts + 1, last_error = %s
+                WHERE id = %s
+            """, (error[:500], email_id))
+        else:
+            get_db().execute_query("""
+                UPDATE email_outbox
+                SET status = 'pending', attempts = attempts + 1, last_error = %s,
+                    next_attempt_at = NOW() + INTERVAL %s SECOND
+                WHERE id = %s
+            """, (error[:500], reintentar_en, email_id))
+
+    @classmethod
+    def contar_pendientes(cls) -> int:
+        fila = get_db().fetch_one(
+            "SELECT COUNT(*) AS total FROM email_outbox WHERE status IN ('pending', 'sending')"
+        )
+        return fila['total'] if fila else 0
@@ -333,6 +333,7 @@ class Objetivo(UserOwnedEntity):
     # Relaciones
     prioridad: Optional[Prioridad] = field(default=None, repr=False)
     movimientos: List['ObjetivoMovimiento'] = field(default_factory=list, repr=False)
+    proyeccion: Optional['ProyeccionObjetivo'] = field(default=None, repr=False)
     
     @property
     def progreso_porcentaje(self) -> float:
@@ -374,6 +375,20 @@ class ObjetivoMovimiento(BaseEntity):
     objetivo: Optional[Objetivo] = field(default=None, repr=False)
 
 
+@dataclass
+class ProyeccionObjetivo(BaseEntity):
+    """Proyección precalculada de cumplimiento de un objetivo"""
+    objetivo_id: int = 0
+    velocidad_diaria: Decimal = Decimal('0.00')
+    velocidad_mensual: Decimal = Decimal('0.00')
+    fecha_proyectada: Optional[date] = None  # None = al ritmo actual no se completa
+    aporte_mensual_requerido: Optional[Decimal] = None  # None = sin fecha límite
+    en_camino: Optional[bool] = None
+    completado: bool = False
+    total_movimientos: int = 0
+    calculado_at: Optional[datetime] = None
+
+
 @dataclass
 class Factura(UserOwnedEntity):
     """Facturas y cuentas por pagar"""
@@ -12,6 +12,7 @@ import logging
 from dataclasses import asdict
 
 from models.financial_base import *
+from models.contadores_repository import ContadoresRepository
 from utils.database import db_manager
 
 
@@ -83,7 +84,47 @@ class BaseRepository:
             cursor.execute(query, params or ())
             conn.commit()
             return cursor.lastrowid
+
+    def execute_many(self, query: str, params_list: List[tuple], batch_size: int = 500) -> int:
+        """Ejecuta INSERT/UPDATE por lotes con executemany en una sola transacción"""
+        if not params_list:
+            return 0
+        with self.get_connection() as conn:
+            conn.start_transaction()
+            cursor = conn.cursor()
+            affected_rows = 0
+            for start in range(0, len(params_list), batch_size):
+                cursor.executemany(query, params_list[start:start + batch_size])
+                affected_rows += cursor.rowcount
+            conn.commit()
+            return affected_rows
     
+    def insert_con_contador(self, query: str, params: tuple, clave: str, monto: Decimal) -> int:
+        """INSERT que suma el monto al contador global en la misma transacción"""
+        with self.get_connection() as conn:
+            conn.start_transaction()
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            nuevo_id = cursor.lastrowid
+            ContadoresRepository.incrementar(cursor, {clave: monto})
+            conn.commit()
+            return nuevo_id
+
+    def delete_con_contador(self, entity_id: int, clave: str) -> bool:
+        """DELETE que resta el monto de la fila del contador global en la misma transacción"""
+        with self.get_connection() as conn:
+            conn.start_transaction()
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT monto FROM {self.table_name} WHERE id = %s FOR UPDATE", (entity_id,))
+            fila = cursor.fetchone()
+            if not fila:
+                conn.rollback()
+                return False
+            cursor.execute(f"DELETE FROM {self.table_name} WHERE id = %s", (entity_id,))
+            ContadoresRepository.incrementar(cursor, {clave: -Decimal(str(fila[0]))})
+            conn.commit()
+            return True
+
     def find_by_id(self, entity_id: int) -> Optional[Any]:
         """Busca una entidad por ID"""
         query = f"SELECT * FROM {self.table_name} WHERE id = %s"
@@ -355,7 +396,11 @@ class IngresoRepository(BaseRepository):
             ingreso.numero_referencia, ingreso.notas, ingreso.adjunto_url,
             ingreso.created_by
         )
-        return self.execute_insert(query, params)
+        return self.insert_con_contador(query, params, ContadoresRepository.INGRESOS, ingreso.monto)
+
+    def delete(self, entity_id: int) -> bool:
+        """Elimina el ingreso y descuenta su monto del total global"""
+        return self.delete_con_contador(entity_id, ContadoresRepository.INGRESOS)
     
     def _build_ingresos_with_relations(self, results: List[Dict]) -> List[Ingreso]:
         """Construye objetos Ingreso con relaciones"""
@@ -470,7 +515,11 @@ class GastoRepository(BaseRepository):
             gasto.requiere_aprobacion, gasto.estado_aprobacion_id,
             gasto.notas, gasto.adjunto_url, gasto.created_by
         )
-        return self.execute_insert(query, params)
+        return self.insert_con_contador(query, params, ContadoresRepository.GASTOS, gasto.monto)
+
+    def delete(self, entity_id: int) -> bool:
+        """Elimina el gasto y descuenta su monto del total global"""
+        return self.delete_con_contador(entity_id, ContadoresRepository.GASTOS)
     
     def _build_gastos_with_relations(self, results: List[Dict]) -> List[Gasto]:
         """Construye objetos Gasto con relaciones"""
@@ -507,9 +556,18 @@ class ObjetivoRepository(BaseRepository):
     def find_by_user(self, user_id: int, activos_solo: bool = True) -> List[Objetivo]:
         """Busca objetivos por usuario"""
         query = """
-            SELECT o.*, p.nombre as prioridad_nombre, p.color as prioridad_color
+            SELECT o.*, p.nombre as prioridad_nombre, p.color as prioridad_color,
+                   pr.velocidad_diaria as proy_velocidad_diaria,
+                   pr.velocidad_mensual as proy_velocidad_mensual,
+                   pr.fecha_proyectada as proy_fecha_proyectada,
+                   pr.aporte_mensual_requerido as proy_aporte_mensual_requerido,
+                   pr.en_camino as proy_en_camino,
+                   pr.completado as proy_completado,
+                   pr.total_movimientos as proy_total_movimientos,
+                   pr.calculado_at as proy_calculado_at
             FROM objetivos o
             JOIN prioridades p ON o.prioridad_id = p.id
+            LEFT JOIN objetivos_proyecciones pr ON pr.objetivo_id = o.id
             WHERE o.user_id = %s
         """
         params = [user_id]
@@ -582,6 +640,50 @@ class ObjetivoRepository(BaseRepository):
         affected = self.execute_non_query(query, (nuevo_ahorro, datetime.now(), objetivo_id))
         return affected > 0
     
+    def registrar_movimiento(self, objetivo_id: int, user_id: int, monto: Decimal,
+                             es_aporte: bool, descripcion: str = "") -> Optional[Tuple[Decimal, int]]:
+        """
+        Aplica un aporte o retiro y registra su movimiento en una sola transacción.
+
+        El UPDATE condicional suma/resta sobre el valor actual de la fila, por lo
+        que dos dispositivos aportando a la vez no pierden actualizaciones, y un
+        retiro solo se aplica si hay fondos suficientes. El nuevo saldo (en
+        centavos) se devuelve con LAST_INSERT_ID(expr), sin releer la fila.
+
+        Retorna (nuevo_ahorro, movimiento_id), o None si el objetivo no existe,
+        no pertenece al usuario o no tiene fondos suficientes.
+        """
+        operador = '+' if es_aporte else '-'
+        query_update = f"""
+            UPDATE objetivos
+            SET ahorro_actual = LAST_INSERT_ID(ROUND((COALESCE(ahorro_actual, 0) {operador} %s) * 100)) / 100,
+                updated_at = %s
+            WHERE id = %s AND (user_id = %s OR empresa_id = %s) AND es_activo = 1
+        """
+        params_update = [monto, datetime.now(), objetivo_id, user_id, user_id]
+        if not es_aporte:
+            query_update += " AND ahorro_actual >= %s"
+            params_update.append(monto)
+
+        query_movimiento = """
+            INSERT INTO objetivos_movimientos (objetivo_id, monto, es_aporte, descripcion)
+            VALUES (%s, %s, %s, %s)
+        """
+
+        with self.get_connection() as conn:
+            conn.start_transaction()
+            cursor = conn.cursor()
+            cursor.execute(query_update, tuple(params_update))
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return None
+            nuevo_ahorro = (Decimal(cursor.lastrowid) / 100).quantize(Decimal('0.01'))
+
+            cursor.execute(query_movimiento, (objetivo_id, monto, es_aporte, descripcion))
+            movimiento_id = cursor.lastrowid
+            conn.commit()
+            return nuevo_ahorro, movimiento_id
+
     def _build_objetivos_with_relations(self, results: List[Dict]) -> List[Objetivo]:
         """Construye objetos Objetivo con relaciones"""
         objetivos = []
@@ -595,6 +697,19 @@ class ObjetivoRepository(BaseRepository):
                     nombre=row['prioridad_nombre'],
                     color=row.get('prioridad_color')
                 )
+            # Agregar proyección precalculada (si el job ya la generó)
+            if row.get('proy_calculado_at') is not None:
+                objetivo.proyeccion = ProyeccionObjetivo(
+                    objetivo_id=row['id'],
+                    velocidad_diaria=row['proy_velocidad_diaria'],
+                    velocidad_mensual=row['proy_velocidad_mensual'],
+                    fecha_proyectada=row.get('proy_fecha_proyectada'),
+                    aporte_mensual_requerido=row.get('proy_aporte_mensual_requerido'),
+                    en_camino=None if row.get('proy_en_camino') is None else bool(row['proy_en_camino']),
+                    completado=bool(row.get('proy_completado')),
+                    total_movimientos=int(row.get('proy_total_movimientos') or 0),
+                    calculado_at=row['proy_calculado_at']
+                )
             objetivos.append(objetivo)
         return objetivos
 
@@ -615,6 +730,52 @@ class ObjetivoMovimientoRepository(BaseRepository):
         results = self.execute_query(query, (objetivo_id, limit))
         return [self.entity_class.from_dict(row) for row in results]
     
+    def find_page_con_saldo(self, objetivo_id: int, limit: int,
+                            cursor: Optional[Tuple[datetime, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Página de movimientos (más recientes primero) con el saldo acumulado
+        calculado en SQL. El saldo se calcula sobre todo el historial del
+        objetivo y la paginación es por keyset (created_at, id)
+        """
+        query = """
+            SELECT h.* FROM (
+                SELECT m.id, m.monto, m.es_aporte, m.descripcion, m.created_at,
+                       SUM(CASE WHEN m.es_aporte = 1 THEN m.monto ELSE -m.monto END)
+                           OVER (ORDER BY m.created_at, m.id
+                                 ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS saldo_acumulado
+                FROM objetivos_movimientos m
+                WHERE m.objetivo_id = %s
+            ) h
+        """
+        params: List[Any] = [objetivo_id]
+
+        if cursor:
+            cursor_fecha, cursor_id = cursor
+            query += " WHERE h.created_at < %s OR (h.created_at = %s AND h.id < %s)"
+            params.extend([cursor_fecha, cursor_fecha, cursor_id])
+
+        query += " ORDER BY h.created_at DESC, h.id DESC LIMIT %s"
+        params.append(limit)
+
+        return self.execute_query(query, tuple(params))
+
+    def get_resumen_mensual(self, objetivo_id: int) -> List[Dict[str, Any]]:
+        """Totales y conteos de aportes/retiros por mes, con el saldo al cierre de cada mes"""
+        query = """
+            SELECT DATE_FORMAT(created_at, '%Y-%m') AS mes,
+                   SUM(CASE WHEN es_aporte = 1 THEN monto ELSE 0 END) AS total_aportes,
+                   SUM(CASE WHEN es_aporte = 0 THEN monto ELSE 0 END) AS total_retiros,
+                   SUM(CASE WHEN es_aporte = 1 THEN 1 ELSE 0 END) AS cantidad_aportes,
+                   SUM(CASE WHEN es_aporte = 0 THEN 1 ELSE 0 END) AS cantidad_retiros,
+                   SUM(SUM(CASE WHEN es_aporte = 1 THEN monto ELSE -monto END))
+                       OVER (ORDER BY DATE_FORMAT(created_at, '%Y-%m')) AS saldo_cierre
+            FROM objetivos_movimientos
+            WHERE objetivo_id = %s
+            GROUP BY DATE_FORMAT(created_at, '%Y-%m')
+            ORDER BY mes
+        """
+        return self.execute_query(query, (objetivo_id,))
+
     def create(self, movimiento: ObjetivoMovimiento) -> int:
         """Crea un nuevo movimiento de objetivo"""
         query = """
@@ -628,6 +789,79 @@ class ObjetivoMovimientoRepository(BaseRepository):
         return self.execute_insert(query, params)
 
 
+class ProyeccionObjetivoRepository(BaseRepository):
+    """Repositorio de proyecciones precalculadas de objetivos"""
+
+    def __init__(self):
+        self.table_name = "objetivos_proyecciones"
+        self.entity_class = ProyeccionObjetivo
+
+    def get_estadisticas_ahorro(self, desde: date,
+                                objetivo_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Agrega el historial de movimientos de todos los objetivos activos
+        (o de los indicados) en una sola consulta
+        """
+        query = """
+            SELECT o.id AS objetivo_id, o.meta_total, o.ahorro_actual, o.fecha_limite,
+                   o.created_at AS objetivo_created_at,
+                   COUNT(m.id) AS total_movimientos,
+                   COALESCE(SUM(CASE
+                       WHEN m.created_at >= %s AND m.es_aporte = 1 THEN m.monto
+                       WHEN m.created_at >= %s THEN -m.monto
+                   END), 0) AS neto_ventana
+            FROM objetivos o
+            LEFT JOIN objetivos_movimientos m ON m.objetivo_id = o.id
+            WHERE o.es_activo = 1
+        """
+        params: List[Any] = [desde, desde]
+
+        if objetivo_ids:
+            placeholders = ", ".join(["%s"] * len(objetivo_ids))
+            query += f" AND o.id IN ({placeholders})"
+            params.extend(objetivo_ids)
+
+        query += """
+            GROUP BY o.id, o.meta_total, o.ahorro_actual, o.fecha_limite, o.created_at
+        """
+        return self.execute_query(query, tuple(params))
+
+    def guardar_lote(self, proyecciones: List[ProyeccionObjetivo]) -> int:
+        """Inserta o actualiza un lote de proyecciones con executemany"""
+        query = """
+            INSERT INTO objetivos_proyecciones
+            (objetivo_id, velocidad_diaria, velocidad_mensual, fecha_proyectada,
+             aporte_mensual_requerido, en_camino, completado, total_movimientos, calculado_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                velocidad_diaria = VALUES(velocidad_diaria),
+                velocidad_mensual = VALUES(velocidad_mensual),
+                fecha_proyectada = VALUES(fecha_proyectada),
+                aporte_mensual_requerido = VALUES(aporte_mensual_requerido),
+                en_camino = VALUES(en_camino),
+                completado = VALUES(completado),
+                total_movimientos = VALUES(total_movimientos),
+                calculado_at = VALUES(calculado_at)
+        """
+        params_list = [
+            (
+                p.objetivo_id, p.velocidad_diaria, p.velocidad_mensual, p.fecha_proyectada,
+                p.aporte_mensual_requerido, p.en_camino, p.completado,
+                p.total_movimientos, p.calculado_at
+            )
+            for p in proyecciones
+        ]
+        return self.execute_many(query, params_list)
+
+    def find_by_objetivo(self, objetivo_id: int) -> Optional[ProyeccionObjetivo]:
+        """Obtiene la proyección cacheada de un objetivo"""
+        query = "SELECT * FROM objetivos_proyecciones WHERE objetivo_id = %s"
+        results = self.execute_query(query, (objetivo_id,))
+        if results:
+            return self.entity_class.from_dict(results[0])
+        return None
+
+
 class EstadoFacturaRepository(CatalogRepository):
     """Repository para gestionar estados de facturas"""
 
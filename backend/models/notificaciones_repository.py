@@ -0,0 +1,111 @@
+"""
+Acceso a la tabla notificaciones
+Cada evento del bus (utils/event_bus.py) se guarda como una notificación del
+usuario destinatario: es el historial para ponerse al día al reconectar y,
+con el backend 'database', el canal compartido entre workers.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_NOTIFICACION = "id, user_id, tipo, titulo, mensaje, leida, fecha_envio, metadata"
+
+
+def _decodificar(fila: Dict[str, Any]) -> Dict[str, Any]:
+    if fila.get('metadata') and isinstance(fila['metadata'], (str, bytes)):
+        try:
+            fila['metadata'] = json.loads(fila['metadata'])
+        except ValueError:
+            pass
+    return fila
+
+
+class NotificacionesRepository:
+    """Inserción y lectura incremental (por id) de notificaciones"""
+
+    @classmethod
+    def insertar(cls, notificaciones: List[Dict[str, Any]]) -> List[int]:
+        """
+        Inserta las notificaciones en una transacción; retorna sus ids en orden.
+        Una sentencia por fila: los ids de un INSERT multi-fila no son
+        consecutivos con innodb_autoinc_lock_mode=2.
+        """
+        query = """
+            INSERT INTO notificaciones (user_id, tipo, titulo, mensaje, leida, metadata)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """
+        ids = []
+        with get_db().get_db_cursor() as (cursor, connection):
+            try:
+                connection.start_transaction()
+                for notificacion in notificaciones:
+                    cursor.execute(query, (
+                        notificacion['user_id'],
+                        notificacion['tipo'],
+                        notificacion['titulo'],
+                        notificacion.get('mensaje'),
+                        bool(notificacion.get('leida', False)),
+                        json.dumps(notificacion.get('metadata'), default=str)
+                        if notificacion.get('metadata') is not None else None
+                    ))
+                    ids.append(cursor.lastrowid)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        return ids
+
+    @classmethod
+    def del_usuario_desde(cls, user_id: int, desde_id: int, limite: int = 100) -> List[Dict[str, Any]]:
+        """Notificaciones del usuario posteriores a desde_id (ponerse al día)"""
+        filas = get_db().fetch_all(f"""
+            SELECT {CAMPOS_NOTIFICACION} FROM notificaciones
+            WHERE user_id = %s AND id > %s
+            ORDER BY id
+            LIMIT %s
+        """, (user_id, desde_id, limite)) or []
+        return [_decodificar(fila) for fila in filas]
+
+    @classmethod
+    def todas_desde(cls, desde_id: int, limite: int = 500) -> List[Dict[str, Any]]:
+        """Notificaciones de todos los usuarios posteriores a desde_id (recorre la PK)"""
+        filas = get_db().fetch_all(f"""
+            SELECT {CAMPOS_NOTIFICACION} FROM notificaciones
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+        """, (desde_id, limite)) or []
+        return [_decodificar(fila) for fila in filas]
+
+    @classmethod
+    def por_ids(cls, ids: List[int]) -> List[Dict[str, Any]]:
+        """Notificaciones con los ids indicados (huecos pendientes del poller)"""
+        if not ids:
+            return []
+        filas = get_db().fetch_all(f"""
+            SELECT {CAMPOS_NOTIFICACION} FROM notificaciones
+            WHERE id IN ({", ".join(["%s"] * len(ids))})
+            ORDER BY id
+        """, tuple(ids)) or []
+        return [_decodificar(fila) for fila in filas]
+
+    @classmethod
+    def ultimo_id(cls) -> int:
+        fila = get_db().fetch_one("SELECT COALESCE(MAX(id), 0) AS ultimo FROM notificaciones")
+        return fila['ultimo'] if fila else 0
+
+    @classmethod
+    def marcar_leidas(cls, user_id: int, ids: Optional[List[int]] = None) -> int:
+        """Marca como leídas las notificaciones indicadas (o todas) del usuario"""
+        if ids:
+            return get_db().execute_query(f"""
+                UPDATE notificaciones SET leida = 1
+                WHERE user_id = %s AND leida = 0 AND id IN ({", ".join(["%s"] * len(ids))})
+            """, (user_id, *ids)) or 0
+        return get_db().execute_query(
+            "UPDATE notificaciones SET leida = 1 WHERE user_id = %s AND leida = 0", (user_id,)
+        ) or 0
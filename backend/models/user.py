@@ -6,11 +6,19 @@ from utils.database import (
     create_user, update_user_last_login, update_user_verification_status,
     db_manager
 )
-from utils.auth import hash_password, verify_password, generate_jwt_token
+from utils.auth import hash_password, verify_password, generate_jwt_token, AuthUtils
+from utils.password_pool import PasswordPoolBusy
 from utils.auth import ValidationUtils
+from models.user_search_repository import UserSearchRepository, CAMPOS_BUSQUEDA
+from utils.cache import TTLCache
+from utils.availability import availability_index
+from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Campos que necesitan las verificaciones de autorización (ver find_auth_by_id)
+CAMPOS_AUTORIZACION = ('id', 'username', 'email', 'id_rol', 'is_active', 'is_verified', 'profile_picture')
+
 class User:
     """Modelo de usuario para operaciones de base de datos y autenticación"""
     
@@ -95,6 +103,8 @@ class User:
         try:
             self.password_hash = hash_password(password)
             return True
+        except PasswordPoolBusy:
+            raise
         except Exception as e:
             logger.error(f"Error estableciendo contraseña: {e}")
             return False
@@ -105,6 +115,22 @@ class User:
             return False
         return verify_password(password, self.password_hash)
     
+    def rehash_password(self, password: str) -> bool:
+        """Regenerar el hash con el costo actual (la contraseña ya fue verificada)"""
+        try:
+            password_hash = hash_password(password)
+            db_manager.execute_query(
+                "UPDATE users SET password_hash = %s WHERE id = %s",
+                (password_hash, self.id)
+            )
+            self.password_hash = password_hash
+            logger.info(f"Hash de contraseña actualizado al costo vigente para usuario {self.id}")
+            return True
+        except Exception as e:
+            # No debe impedir el login: se reintenta en el próximo
+            logger.warning(f"No se pudo re-hashear la contraseña del usuario {self.id}: {e}")
+            return False
+    
     def generate_auth_token(self) -> str:
         """Generar token JWT para el usuario"""
         return generate_jwt_token(self.to_dict())
@@ -127,6 +153,7 @@ class User:
             if self.id:
                 update_user_verification_status(self.id, True)
                 self.is_verified = True
+                User.invalidate_cache(self.id)
                 return True
             return False
         except Exception as e:
@@ -166,6 +193,12 @@ class User:
             
             db_manager.execute_query(query, params)
             self.updated_at = datetime.utcnow()
+            User.invalidate_cache(self.id)
+            if 'username' in kwargs:
+                availability_index.add(username=self.username)
+
+            if any(field in CAMPOS_BUSQUEDA for field in kwargs):
+                UserSearchRepository.reindexar_usuario(self.id)
             
             logger.info(f"Perfil actualizado para usuario {self.username}")
             return True
@@ -195,6 +228,9 @@ class User:
                 )
                 db_manager.execute_query(query, params)
                 self.updated_at = datetime.utcnow()
+                User.invalidate_cache(self.id)
+                availability_index.add(self.username, self.email)
+                UserSearchRepository.reindexar_usuario(self.id)
             else:
                 # Crear nuevo usuario
                 user_data = {
@@ -255,6 +291,30 @@ class User:
             logger.error(f"Error buscando usuario por ID: {e}")
             return None
     
+    @classmethod
+    def find_auth_by_id(cls, user_id: int) -> Optional['User']:
+        """
+        Buscar usuario por ID con solo los campos de autorización, desde un
+        caché de TTL corto. Para el registro completo usar find_by_id.
+        """
+        try:
+            datos = user_auth_cache.get(user_id)
+            if datos is None:
+                user_data = find_user_by_id(user_id)
+                if not user_data:
+                    return None
+                datos = {campo: user_data.get(campo) for campo in CAMPOS_AUTORIZACION}
+                user_auth_cache.set(user_id, datos)
+            return cls(datos)
+        except Exception as e:
+            logger.error(f"Error buscando usuario (autorización) por ID: {e}")
+            return None
+
+    @staticmethod
+    def invalidate_cache(user_id: int):
+        """Invalidar los campos de autorización cacheados de un usuario"""
+        user_auth_cache.delete(user_id)
+
     @classmethod
     def find_by_google_id(cls, google_id: str) -> Optional['User']:
         """Buscar usuario por Google ID"""
@@ -314,8 +374,11 @@ class User:
             
             # Establecer contraseña solo si se proporciona
             if password:
-                if not user.set_password(password):
-                    return False, "Error procesando contraseña", None
+                try:
+                    if not user.set_password(password):
+                        return False, "Error procesando contraseña", None
+                except PasswordPoolBusy:
+                    return False, "Servidor ocupado, intenta de nuevo en unos segundos", None
             
             # Guardar en base de datos
             if user.save():
@@ -351,9 +414,15 @@ class User:
             
             # Actualizar último login
             user.update_last_login()
+
+            # Re-hash transparente si cambió BCRYPT_ROUNDS
+            if AuthUtils.password_needs_rehash(user.password_hash):
+                user.rehash_password(password)
             
             return True, "Autenticación exitosa", user
         
+        except PasswordPoolBusy:
+            raise
         except Exception as e:
             logger.error(f"Error autenticando usuario: {e}")
             return False, "Error interno de autenticación", None
@@ -406,4 +475,12 @@ class User:
             return not existing_user or existing_user.id == self.id
         except Exception as e:
             logger.error(f"Error verificando disponibilidad de username: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+# Instancia global del caché de campos de autorización por user_id
+user_auth_cache = TTLCache(
+    max_size=Config.USER_CACHE_SIZE,
+    ttl=Config.USER_CACHE_TTL_SECONDS,
+    name='user_auth'
+)
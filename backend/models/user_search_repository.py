@@ -0,0 +1,297 @@
+"""
+Búsqueda indexada de usuarios para la consola de administración
+Mantiene un índice de trigramas (users_search_ngrams) en cada escritura de
+usuario y resuelve las búsquedas con índices: coincidencia exacta y de prefijo
+sobre las columnas de users, y de subcadena a través de los trigramas.
+Paginación por keyset y conteo acotado en lugar de COUNT(*) completo.
+"""
+import base64
+import logging
+import unicodedata
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_BUSQUEDA = ('username', 'email', 'first_name', 'last_name')
+
+# Rango de relevancia (menor = mejor)
+RANGO_EXACTO = 0
+RANGO_PREFIJO = 1
+RANGO_SUBCADENA = 2
+
+
+def normalizar(texto: Optional[str]) -> str:
+    """Minúsculas y sin acentos, igual al texto indexado"""
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', texto.strip().lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def trigramas(texto: Optional[str]) -> Set[str]:
+    """Trigramas de un texto normalizado"""
+    texto = normalizar(texto)
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _escapar_like(texto: str) -> str:
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class UserSearchRepository:
+    """Índice de trigramas de usuarios y consultas de búsqueda"""
+
+    # Para términos largos basta con un subconjunto de trigramas repartidos:
+    # la verificación con LIKE sobre los candidatos descarta falsos positivos
+    MAX_TRIGRAMAS_CONSULTA = 6
+    LIMITE_CONTEO = 1000
+    # Términos de 1-2 caracteres no tienen trigramas: la subcadena se busca con
+    # LIKE recorriendo users desde los más recientes hasta juntar este tope
+    MAX_COINCIDENCIAS_CORTAS = 1000
+
+    @staticmethod
+    def trigramas_usuario(datos: Dict[str, Any]) -> Set[str]:
+        """Trigramas de todos los campos buscables de un usuario"""
+        resultado: Set[str] = set()
+        for campo in CAMPOS_BUSQUEDA:
+            resultado |= trigramas(datos.get(campo))
+        return resultado
+
+    @classmethod
+    def indexar(cls, cursor, user_id: int, datos: Dict[str, Any]):
+        """
+        Reemplaza los trigramas del usuario usando el cursor de la
+        transacción en curso (no hace commit)
+        """
+        cursor.execute("DELETE FROM users_search_ngrams WHERE user_id = %s", (user_id,))
+        filas = [(ngrama, user_id) for ngrama in sorted(cls.trigramas_usuario(datos))]
+        if filas:
+            cursor.executemany(
+                "INSERT INTO users_search_ngrams (ngram, user_id) VALUES (%s, %s)",
+                filas
+            )
+
+    @classmethod
+    def indexar_nuevos(cls, cursor, usuarios: Dict[int, Dict[str, Any]]):
+        """
+        Trigramas de usuarios recién insertados (user_id -> datos) en un solo
+        executemany, con el cursor de la transacción en curso (no hace commit)
+        """
+        filas = [
+            (ngrama, user_id)
+            for user_id, datos in usuarios.items()
+            for ngrama in sorted(cls.trigramas_usuario(datos))
+        ]
+        if filas:
+            cursor.executemany(
+                "INSERT INTO users_search_ngrams (ngram, user_id) VALUES (%s, %s)",
+                filas
+            )
+
+    @classmethod
+    def reindexar_usuario(cls, user_id: int):
+        """Reindexa un usuario leyendo sus datos actuales (tras un UPDATE)"""
+        db = get_db()
+        campos = ", ".join(CAMPOS_BUSQUEDA)
+        try:
+            with db.get_db_cursor() as (cursor, connection):
+                connection.start_transaction()
+                cursor.execute(f"SELECT {campos} FROM users WHERE id = %s", (user_id,))
+                datos = cursor.fetchone()
+                if datos:
+                    cls.indexar(cursor, user_id, datos)
+                connection.commit()
+        except Exception as e:
+            # La búsqueda queda desactualizada para este usuario hasta reconstruir el índice
+            logger.error(f"Error reindexando usuario {user_id} para búsqueda: {e}")
+
+    @classmethod
+    def reconstruir(cls, batch_size: int = 1000) -> int:
+        """Reconstruye el índice completo por lotes de IDs (keyset)"""
+        db = get_db()
+        campos = ", ".join(CAMPOS_BUSQUEDA)
+        ultimo_id = 0
+        total = 0
+        while True:
+            usuarios = db.fetch_all(
+                f"SELECT id, {campos} FROM users WHERE id > %s ORDER BY id LIMIT %s",
+                (ultimo_id, batch_size)
+            )
+            if not usuarios:
+                break
+            with db.get_db_cursor() as (cursor, connection):
+                connection.start_transaction()
+                for usuario in usuarios:
+                    cls.indexar(cursor, usuario['id'], usuario)
+                connection.commit()
+            ultimo_id = usuarios[-1]['id']
+            total += len(usuarios)
+            logger.info(f"Índice de búsqueda de usuarios: {total} usuarios indexados")
+        return total
+
+    @classmethod
+    def _trigramas_consulta(cls, termino: str) -> List[str]:
+        """Trigramas del término, repartidos a lo largo de él si son muchos"""
+        ordenados = [termino[i:i + 3] for i in range(len(termino) - 2)]
+        ordenados = list(dict.fromkeys(ordenados))
+        if len(ordenados) <= cls.MAX_TRIGRAMAS_CONSULTA:
+            return ordenados
+        paso = (len(ordenados) - 1) / (cls.MAX_TRIGRAMAS_CONSULTA - 1)
+        return list(dict.fromkeys(ordenados[round(i * paso)] for i in range(cls.MAX_TRIGRAMAS_CONSULTA)))
+
+    @classmethod
+    def _candidatos(cls, termino: str) -> Tuple[str, List[Any]]:
+        """
+        Subconsulta (user_id, rango) con una rama por índice: igualdad,
+        prefijo en cada columna y subcadena: vía trigramas verificada con LIKE
+        solo sobre los candidatos para términos de 3+ caracteres, o con un LIKE
+        acotado a MAX_COINCIDENCIAS_CORTAS usuarios para términos más cortos
+        """
+        prefijo = _escapar_like(termino) + '%'
+        ramas = [f"SELECT id AS user_id, {RANGO_EXACTO} AS rango FROM users WHERE username = %s",
+                 f"SELECT id, {RANGO_EXACTO} FROM users WHERE email = %s"]
+        params: List[Any] = [termino, termino]
+        for campo in CAMPOS_BUSQUEDA:
+            ramas.append(f"SELECT id, {RANGO_PREFIJO} FROM users WHERE {campo} LIKE %s")
+            params.append(prefijo)
+
+        ngramas = cls._trigramas_consulta(termino)
+        if ngramas:
+            placeholders = ", ".join(["%s"] * len(ngramas))
+            ramas.append(f"""
+                SELECT u.id, {RANGO_SUBCADENA}
+                FROM (
+                    SELECT user_id
+                    FROM users_search_ngrams
+                    WHERE ngram IN ({placeholders})
+                    GROUP BY user_id
+                    HAVING COUNT(*) = %s
+                ) n
+                JOIN users u ON u.id = n.user_id
+                WHERE CONCAT_WS(' ', u.username, u.email, u.first_name, u.last_name) LIKE %s
+            """)
+            params.extend(ngramas)
+            params.append(len(ngramas))
+            params.append('%' + _escapar_like(termino) + '%')
+        else:
+            ramas.append(f"""
+                SELECT cortos.id, {RANGO_SUBCADENA}
+                FROM (
+                    SELECT id
+                    FROM users
+                    WHERE CONCAT_WS(' ', username, email, first_name, last_name) LIKE %s
+                    ORDER BY id DESC
+                    LIMIT %s
+                ) cortos
+            """)
+            params.append('%' + _escapar_like(termino) + '%')
+            params.append(cls.MAX_COINCIDENCIAS_CORTAS)
+
+        return " UNION ALL ".join(ramas), params
+
+    @classmethod
+    def buscar(cls, termino: str = '', status: Optional[str] = None, id_rol: int = 4,
+               limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Página de usuarios ordenada por relevancia (exacto, prefijo, subcadena)
+        y luego por más recientes. Retorna users, siguiente_cursor y tiene_mas.
+        """
+        db = get_db()
+        termino = normalizar(termino)
+        posicion = cls.decodificar_cursor(cursor) if cursor else None
+
+        filtros = ["u.id_rol = %s"]
+        params_filtro: List[Any] = [id_rol]
+        if status:
+            filtros.append("u.status = %s")
+            params_filtro.append(status)
+
+        if termino:
+            candidatos, params = cls._candidatos(termino)
+            query = f"""
+                SELECT u.id, u.username, u.email, u.first_name, u.last_name,
+                       u.status, u.profile_picture, MIN(c.rango) AS rango
+                FROM ({candidatos}) c
+                JOIN users u ON u.id = c.user_id
+                WHERE {" AND ".join(filtros)}
+                GROUP BY u.id
+            """
+            params = params + params_filtro
+            if posicion:
+                query += " HAVING rango > %s OR (rango = %s AND u.id < %s)"
+                params.extend([posicion[0], posicion[0], posicion[1]])
+            query += " ORDER BY rango, u.id DESC LIMIT %s"
+        else:
+            # Sin término: los más recientes primero (el id crece con created_at)
+            query = f"""
+                SELECT u.id, u.username, u.email, u.first_name, u.last_name,
+                       u.status, u.profile_picture, 0 AS rango
+                FROM users u
+                WHERE {" AND ".join(filtros)}
+            """
+            params = list(params_filtro)
+            if posicion:
+                query += " AND u.id < %s"
+                params.append(posicion[1])
+            query += " ORDER BY u.id DESC LIMIT %s"
+
+        params.append(limit + 1)
+        filas = db.fetch_all(query, tuple(params)) or []
+
+        tiene_mas = len(filas) > limit
+        filas = filas[:limit]
+        siguiente = cls.codificar_cursor(filas[-1]['rango'], filas[-1]['id']) if tiene_mas else None
+        for fila in filas:
+            fila.pop('rango', None)
+
+        return {'users': filas, 'siguiente_cursor': siguiente, 'tiene_mas': tiene_mas}
+
+    @classmethod
+    def contar(cls, termino: str = '', status: Optional[str] = None, id_rol: int = 4,
+               limite: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Conteo acotado: deja de contar al llegar al límite, así el costo no
+        crece con la tabla. Retorna {'total', 'exacto'}.
+        """
+        db = get_db()
+        limite = limite or cls.LIMITE_CONTEO
+        termino = normalizar(termino)
+
+        filtros = ["u.id_rol = %s"]
+        params: List[Any] = [id_rol]
+        if status:
+            filtros.append("u.status = %s")
+            params.append(status)
+
+        if termino:
+            candidatos, params_candidatos = cls._candidatos(termino)
+            subconsulta = f"""
+                SELECT DISTINCT u.id
+                FROM ({candidatos}) c
+                JOIN users u ON u.id = c.user_id
+                WHERE {" AND ".join(filtros)}
+                LIMIT %s
+            """
+            params = params_candidatos + params
+        else:
+            subconsulta = f"SELECT 1 FROM users u WHERE {' AND '.join(filtros)} LIMIT %s"
+        params.append(limite + 1)
+
+        fila = db.fetch_one(f"SELECT COUNT(*) AS total FROM ({subconsulta}) limitado", tuple(params))
+        total = int(fila['total']) if fila else 0
+        return {'total': min(total, limite), 'exacto': total <= limite}
+
+    @staticmethod
+    def codificar_cursor(rango: int, user_id: int) -> str:
+        """Cursor opaco con la posición (rango, id) del último usuario entregado"""
+        return base64.urlsafe_b64encode(f"{rango}|{user_id}".encode()).decode()
+
+    @staticmethod
+    def decodificar_cursor(cursor: str) -> Tuple[int, int]:
+        try:
+            rango, user_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return int(rango), int(user_id)
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("Cursor inválido")
@@ -7,8 +7,11 @@ import logging
 from utils.auth import token_required, create_response
 from models.user import User
 from utils.database import db_manager
+from models.contadores_repository import ContadoresRepository
+from models.user_search_repository import UserSearchRepository
 from utils.security import SecurityUtils
 from utils.email import send_generic_code
+from utils.audit import audit_writer
 
 
 from utils.action_verification import ActionVerificationManager
@@ -20,16 +23,9 @@ admin_bp = Blueprint('admin', __name__, url_prefix='/api/v1/admin')
 
 # --- Decorador de Seguridad: Solo para Admins ---
 def log_audit(user_id, action, target_type=None, target_id=None, details=None):
-    try:
-        query = """
-            INSERT INTO audit_logs (user_id, action, target_type, target_id, details)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        # Convertir details a JSON string si es un dict
-        details_json = json.dumps(details) if isinstance(details, dict) else None
-        db_manager.execute_query(query, (user_id, action, target_type, target_id, details_json))
-    except Exception as e:
-        logger.error(f"Error al registrar en auditoría: {e}")
+    # Solo encola: el escritor de auditoría inserta por lotes en segundo plano
+    if not audit_writer.record(user_id, action, target_type, target_id, details):
+        logger.error(f"Auditoría descartada (cola llena): {action} sobre {target_type} {target_id}")
 
 
 def admin_required(f):
@@ -51,13 +47,12 @@ def admin_required(f):
 @admin_required
 def get_dashboard_stats(current_user):
     try:
-        # Total de usuarios
-        users_count = db_manager.fetch_one("SELECT COUNT(*) as total FROM users")['total']
+        # Contadores globales mantenidos incrementalmente (sin recorrer tablas)
+        contadores = ContadoresRepository.obtener()
+        users_count = int(contadores[ContadoresRepository.USUARIOS])
         
         # Balance total (suma de todos los ingresos menos todos los gastos)
-        total_ingresos = db_manager.fetch_one("SELECT SUM(monto) as total FROM ingresos")['total'] or 0
-        total_gastos = db_manager.fetch_one("SELECT SUM(monto) as total FROM gastos")['total'] or 0
-        total_balance = float(total_ingresos) - float(total_gastos)
+        total_balance = float(contadores[ContadoresRepository.INGRESOS] - contadores[ContadoresRepository.GASTOS])
         
         stats = {
             'totalUsers': users_count,
@@ -123,18 +118,36 @@ def update_user_status(current_user, user_id):
             if not is_valid:
                 return create_response(False, "El código de verificación es inválido o ha expirado.", status_code=403)
         
-        query = "UPDATE users SET status = %s, updated_at = NOW() WHERE id = %s"
-        affected_rows = db_manager.execute_query(query, (new_status, user_id))
-
-        if affected_rows == 0:
-            return create_response(False, "Usuario no encontrado.", status_code=404)
+        # Cambio de estado y contador de baneados en la misma transacción
+        with db_manager.get_db_cursor() as (cursor, connection):
+            try:
+                connection.start_transaction()
+                cursor.execute("SELECT status FROM users WHERE id = %s FOR UPDATE", (user_id,))
+                user_row = cursor.fetchone()
+                if not user_row:
+                    connection.rollback()
+                    return create_response(False, "Usuario no encontrado.", status_code=404)
+
+                old_status = user_row['status']
+                cursor.execute(
+                    "UPDATE users SET status = %s, updated_at = NOW() WHERE id = %s",
+                    (new_status, user_id)
+                )
+                banned_delta = (new_status == 'banned') - (old_status == 'banned')
+                ContadoresRepository.incrementar(cursor, {ContadoresRepository.USUARIOS_BANEADOS: banned_delta})
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+
+        User.invalidate_cache(user_id)
 
         log_audit(
             current_user['user_id'],
             'USER_STATUS_CHANGED',
             target_type='User',
             target_id=user_id,
-            details={'old_status': 'unknown', 'new_status': new_status}
+            details={'old_status': old_status, 'new_status': new_status}
         )
 
         return create_response(True, "El estado del usuario ha sido actualizado exitosamente.")
@@ -150,44 +163,42 @@ def update_user_status(current_user, user_id):
 @admin_required
 def get_users(current_user):
     """
-    Obtiene una lista de usuarios con filtros y paginación.
+    Obtiene una lista de usuarios con búsqueda indexada y paginación por cursor.
+    Los resultados se ordenan por relevancia (exacto, prefijo, subcadena).
+    Con términos de 1-2 caracteres la subcadena se busca solo entre las
+    primeras 1000 coincidencias más recientes. El total es un conteo acotado; con count=false no se calcula.
     """
     try:
-        search = request.args.get('search', '')
+        search = request.args.get('search', '').strip()
         status = request.args.get('status', 'all')
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 10))
-        offset = (page - 1) * limit
-
-        query = "SELECT id, username, email, first_name, last_name, status, profile_picture FROM users WHERE id_rol = 4"
-        params = []
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        cursor = request.args.get('cursor')
+        include_count = request.args.get('count', 'true').lower() != 'false'
 
-        if search:
-            query += " AND (username LIKE %s OR email LIKE %s OR first_name LIKE %s OR last_name LIKE %s)"
-            search_param = f"%{search}%"
-            params.extend([search_param, search_param, search_param, search_param])
+        status_filter = None if status == 'all' else status
 
-        if status != 'all':
-            query += " AND status = %s"
-            params.append(status)
+        try:
+            result = UserSearchRepository.buscar(search, status_filter, limit=limit, cursor=cursor)
+        except ValueError as e:
+            return create_response(False, str(e), status_code=400)
 
-        total_query = query.replace("SELECT id, username, email, first_name, last_name, status, profile_picture", "SELECT COUNT(*)")
-        total_results = db_manager.fetch_one(total_query, tuple(params))
-        total_users = total_results['COUNT(*)'] if total_results else 0
-
-        query += " ORDER BY created_at DESC LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
+        pagination = {
+            'limit': limit,
+            'nextCursor': result['siguiente_cursor'],
+            'hasMore': result['tiene_mas']
+        }
+        if not cursor:
+            pagination['page'] = 1
 
-        users = db_manager.fetch_all(query, tuple(params))
+        if include_count:
+            count = UserSearchRepository.contar(search, status_filter)
+            pagination['total'] = count['total']
+            pagination['totalIsApproximate'] = not count['exacto']
+            pagination['totalPages'] = (count['total'] + limit - 1) // limit
 
         return create_response(True, "Usuarios obtenidos", {
-            'users': users,
-            'pagination': {
-                'page': page,
-                'limit': limit,
-                'total': total_users,
-                'totalPages': (total_users + limit - 1) // limit
-            }
+            'users': result['users'],
+            'pagination': pagination
         })
 
     except Exception as e:
@@ -229,6 +240,9 @@ def update_user(current_user, user_id):
 
     if affected_rows == 0:
         return create_response(False, "Usuario no encontrado o sin cambios", status_code=404)
+
+    User.invalidate_cache(user_id)
+    UserSearchRepository.reindexar_usuario(user_id)
         
     return create_response(True, "Usuario actualizado exitosamente")
 
@@ -375,20 +389,13 @@ def get_companies(current_user):
 @admin_required
 def get_reports_summary(current_user):
     try:
-        new_users_query = "SELECT COUNT(*) as total FROM users WHERE MONTH(created_at) = MONTH(NOW()) AND YEAR(created_at) = YEAR(NOW())"
-        new_users_this_month = db_manager.fetch_one(new_users_query)['total']
-
-        total_income_query = "SELECT SUM(monto) as total FROM ingresos"
-        total_income = float(db_manager.fetch_one(total_income_query)['total'] or 0)
-
-        total_expenses_query = "SELECT SUM(monto) as total FROM gastos"
-        total_expenses = float(db_manager.fetch_one(total_expenses_query)['total'] or 0)
+        contadores = ContadoresRepository.obtener()
 
         summary = {
-            'newUsersThisMonth': new_users_this_month,
-            'totalIncomeProcessed': total_income,
-            'totalExpensesProcessed': total_expenses,
-            'bannedUsers': db_manager.fetch_one("SELECT COUNT(*) as total FROM users WHERE status = 'banned'")['total']
+            'newUsersThisMonth': int(contadores[ContadoresRepository.clave_usuarios_mes()]),
+            'totalIncomeProcessed': float(contadores[ContadoresRepository.INGRESOS]),
+            'totalExpensesProcessed': float(contadores[ContadoresRepository.GASTOS]),
+            'bannedUsers': int(contadores[ContadoresRepository.USUARIOS_BANEADOS])
         }
         return create_response(True, "Resumen de reporte obtenido", summary)
     except Exception as e:
@@ -1,13 +1,16 @@
 from flask import Blueprint, request, jsonify
 import logging
-from datetime import datetime
 from models.user import User
-from utils.auth import token_required, create_response, decode_jwt_token, get_token_from_request
+from utils.auth import token_required, create_response, verify_jwt_token, get_token_from_request, verified_token_cache
+from utils.token_revocation import token_revocation_list
+from utils.availability import availability_index
+from utils.password_pool import PasswordPoolBusy
 from utils.email import send_verification_code
 from utils.verification import VerificationTokenManager
 from utils.security import (
     validate_and_sanitize_user_input, check_rate_limit, record_failed_login,
-    rate_limiter, security_event_logger
+    rate_limiter, security_event_logger, reserve_verification_email,
+    release_verification_email
 )
 
 # Configurar logging
@@ -16,9 +19,22 @@ logger = logging.getLogger(__name__)
 # Crear blueprint para rutas de autenticación
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+def _verification_throttled_response(email: str, reason: str, retry_after: int):
+    """Respuesta 429 para envíos de código limitados por email"""
+    if reason == 'cooldown':
+        logger.info(f"Cooldown activo para {email}: {retry_after}s restantes")
+        message = f"Debes esperar {retry_after} segundos antes de solicitar otro código."
+    else:
+        logger.warning(f"Rate limit de códigos excedido para {email}")
+        message = f"Demasiadas solicitudes de código. Espera {max(1, -(-retry_after // 60))} minutos antes de intentar nuevamente."
+    response, status_code = create_response(False, message, status_code=429)
+    response.headers['Retry-After'] = str(retry_after)
+    return response, status_code
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Endpoint para iniciar proceso de registro (envía código por email)"""
+    reservado = False
     try:
         # NUEVA PROTECCIÓN: Rate limiting por IP
         is_limited, retry_after = check_rate_limit('register', max_requests=5, window_seconds=300)  # 5 requests per 5 minutes
@@ -73,48 +89,37 @@ def register():
             logger.warning(f"Datos inválidos: {error_msg}")
             return create_response(False, error_msg, status_code=400)
         
+        # RATE LIMITING: cooldown y ventana por email, reservados de forma atómica
+        # antes de tocar la base de datos; se devuelven si no se envía el código
+        is_limited, reason, retry_after = reserve_verification_email(email)
+        if is_limited:
+            return _verification_throttled_response(email, reason, retry_after)
+        reservado = True
+        
         # Verificar que no exista usuario con mismo email o username
         if User.find_by_email(email):
             logger.warning(f"Email ya existe: {email}")
+            release_verification_email(email)
             return create_response(False, "Ya existe un usuario con este email", status_code=400)
         
         if User.find_by_username(username):
             logger.warning(f"Username ya existe: {username}")
+            release_verification_email(email)
             return create_response(False, "Ya existe un usuario con este nombre de usuario", status_code=400)
         
-        # RATE LIMITING: Verificar límites de solicitudes
-        recent_requests = VerificationTokenManager.get_recent_token_requests(email, minutes=15)
-        if recent_requests >= 3:
-            logger.warning(f"Rate limit excedido para {email}: {recent_requests} requests en 15 min")
-            return create_response(
-                False,
-                "Demasiadas solicitudes de código. Espera 15 minutos antes de intentar nuevamente.",
-                status_code=429
-            )
-        
-        # COOLDOWN: Verificar tiempo entre solicitudes (60 segundos)
-        last_token_time = VerificationTokenManager.get_last_token_time(email)
-        if last_token_time:
-            time_since_last = datetime.now() - last_token_time
-            if time_since_last.total_seconds() < 60:
-                remaining_seconds = 60 - int(time_since_last.total_seconds())
-                logger.info(f"Cooldown activo para {email}: {remaining_seconds}s restantes")
-                return create_response(
-                    False,
-                    f"Debes esperar {remaining_seconds} segundos antes de solicitar otro código.",
-                    status_code=429
-                )
-        
         # Enviar código de verificación por email
         success, message, verification_code = send_verification_code(email, username)
         
         if not success:
             logger.error(f"Error enviando código a {email}: {message}")
+            release_verification_email(email)
             return create_response(
                 False,
                 "Error enviando código de verificación. Inténtalo más tarde.",
                 status_code=500
             )
+        # El código salió: la reserva queda consumida
+        reservado = False
         
         # Guardar token en base de datos con datos adicionales del usuario
         token_saved = VerificationTokenManager.create_verification_token(email, verification_code, {
@@ -261,6 +266,8 @@ def verify_email():
     
     except Exception as e:
         logger.error(f"💥 Error interno en verificación: {e}")
+        if reservado:
+            release_verification_email(email)
         return create_response(
             False,
             "Error interno del servidor",
@@ -270,6 +277,7 @@ def verify_email():
 @auth_bp.route('/resend-verification', methods=['POST'])
 def resend_verification():
     """Endpoint para reenviar código de verificación"""
+    reservado = False
     try:
         data = request.get_json()
         
@@ -292,19 +300,24 @@ def resend_verification():
                 status_code=400
             )
         
+        # Cooldown y ventana por email, reservados antes de tocar la base de datos
+        is_limited, reason, retry_after = reserve_verification_email(email)
+        if is_limited:
+            return _verification_throttled_response(email, reason, retry_after)
+        reservado = True
+        
         # Verificar que no exista usuario con este email
         if User.find_by_email(email):
+            release_verification_email(email)
             return create_response(
                 False,
                 "Ya existe una cuenta con este email",
                 status_code=400
             )
         
-        # Limpiar tokens expirados antes de verificar
-        VerificationTokenManager.cleanup_expired_tokens_for_email(email)
-        
-        # Verificar si ya tiene un token válido
+        # Verificar si ya tiene un token válido (la tabla es la fuente de verdad de los códigos emitidos)
         if VerificationTokenManager.has_valid_token(email):
+            release_verification_email(email)
             return create_response(
                 False,
                 "Ya tienes un código válido. Espera a que expire antes de solicitar uno nuevo.",
@@ -316,11 +329,13 @@ def resend_verification():
         
         if not success:
             logger.error(f"Error reenviando código a {email}: {message}")
+            release_verification_email(email)
             return create_response(
                 False,
                 "Error enviando código de verificación",
                 status_code=500
             )
+        reservado = False
         
         # Guardar nuevo token
         token_saved = VerificationTokenManager.create_verification_token(email, verification_code)
@@ -344,6 +359,8 @@ def resend_verification():
     
     except Exception as e:
         logger.error(f"💥 Error en reenvío: {e}")
+        if reservado:
+            release_verification_email(email)
         return create_response(
             False,
             "Error interno del servidor",
@@ -411,8 +428,17 @@ def login():
                     status_code=423  # Locked
                 )
         
-        # Autenticar usuario
-        success, message, user = User.authenticate(login_field, password)
+        # Autenticar usuario (con el pool de bcrypt saturado se rechaza sin contar como fallo)
+        try:
+            success, message, user = User.authenticate(login_field, password)
+        except PasswordPoolBusy as e:
+            response, status_code = create_response(
+                False,
+                "Servidor ocupado, intenta de nuevo en unos segundos",
+                status_code=503
+            )
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, status_code
         
         if not success:
             client_ip = request.remote_addr or "unknown"
@@ -566,10 +592,11 @@ def logout(current_user):
         username = current_user.get('username', 'Unknown')
         logger.info(f"🚪 Logout de usuario: {username}")
         
-        # En una implementación más avanzada, aquí se podría:
-        # 1. Agregar el token a una blacklist
-        # 2. Invalidar refresh tokens
-        # 3. Limpiar sesiones en caché
+        # Revocar el jti (efectivo de inmediato) y sacar el token del caché
+        token_revocation_list.revoke(current_user)
+        token = get_token_from_request()
+        if token:
+            verified_token_cache.invalidate(token)
         
         logger.info(f"✅ Logout completado: {username}")
         return create_response(
@@ -608,7 +635,7 @@ def validate_token():
         
         # Decodificar token
         try:
-            payload = decode_jwt_token(token)
+            payload = verify_jwt_token(token)
             user_id = payload.get('user_id')
             logger.info(f"🔍 Validando token para usuario ID: {user_id}")
         except ValueError as e:
@@ -683,9 +710,8 @@ def check_username():
                 status_code=400
             )
         
-        # Verificar disponibilidad
-        user = User.find_by_username(username)
-        available = user is None
+        # Verificar disponibilidad (Bloom en memoria; solo los posibles choques van a MySQL)
+        available = availability_index.is_username_available(username)
         
         response_data = {
             'username': username,
@@ -737,9 +763,8 @@ def check_email():
                 status_code=400
             )
         
-        # Verificar disponibilidad
-        user = User.find_by_email(email)
-        available = user is None
+        # Verificar disponibilidad (Bloom en memoria; solo los posibles choques van a MySQL)
+        available = availability_index.is_email_available(email)
         
         response_data = {
             'email': email,
@@ -769,10 +794,10 @@ def google_auth():
     """Endpoint para autenticación con Google usando Firebase"""
     try:
         # Importar verificación de Firebase
-        from utils.firebase import verify_firebase_token, initialize_firebase
+        from utils.firebase import verify_firebase_token, firebase_auth
         
-        # Asegurar que Firebase esté inicializado
-        if not initialize_firebase():
+        # Las credenciales se leen una sola vez; la verificación no usa el SDK
+        if firebase_auth.get_verifier() is None:
             logger.error("Error inicializando Firebase")
             return create_response(
                 False,
@@ -7,7 +7,8 @@ from flask import Blueprint, request, jsonify
 from functools import wraps
 import logging
 
-from services.empresa_service import empresa_service
+from config import Config
+from services.empresa_service import empresa_service, leer_csv_empleados
 from services.empleado_service import empleado_service
 from utils.auth import token_required, create_response
 from utils.security import SecurityUtils
@@ -105,6 +106,47 @@ def obtener_empleados(current_user):
         logger.error(f"Error obteniendo empleados: {e}")
         return create_response(False, "Error interno del servidor", status_code=500)
 
+
+@empresa_bp.route('/empleados/lote', methods=['POST'])
+@token_required
+@require_role(2)  # Solo empresas
+def crear_empleados_lote(current_user):
+    """
+    Alta masiva de empleados: JSON ({'empleados': [...]}) o CSV con cabecera
+    (archivo 'archivo' en multipart o cuerpo text/csv). Retorna un resultado por fila.
+    """
+    try:
+        limite = Config.EMPRESA_EMPLEADOS_CSV_MAX_BYTES
+        if request.mimetype == 'text/csv':
+            if (request.content_length or 0) > limite:
+                return create_response(False, "El archivo CSV es demasiado grande", status_code=413)
+            contenido = request.stream.read(limite + 1)
+        elif 'archivo' in request.files:
+            contenido = request.files['archivo'].read(limite + 1)
+        else:
+            contenido = None
+
+        if contenido is not None:
+            if len(contenido) > limite:
+                return create_response(False, "El archivo CSV es demasiado grande", status_code=413)
+            try:
+                filas = leer_csv_empleados(contenido.decode('utf-8'))
+            except UnicodeDecodeError:
+                return create_response(False, "El CSV debe estar codificado en UTF-8", status_code=400)
+        else:
+            data = request.get_json(silent=True)
+            filas = data.get('empleados') if isinstance(data, dict) else data
+
+        empresa_id = current_user['user_id']
+        success, message, resultado = empresa_service.crear_empleados_lote(empresa_id, filas)
+
+        return handle_service_response(success, message, resultado)
+
+    except Exception as e:
+        logger.error(f"Error en alta masiva de empleados: {e}")
+        return create_response(False, "Error interno del servidor", status_code=500)
+
+
 @empresa_bp.route('/empleados/<int:empleado_id>', methods=['DELETE'])
 @token_required
 @require_role(2) # Solo empresas
@@ -182,6 +224,31 @@ def rechazar_gasto(current_user, gasto_id):
         return create_response(False, "Error interno del servidor", status_code=500)
 
 
+@empresa_bp.route('/gastos/lote', methods=['POST'])
+@token_required
+@require_role(2)  # Solo empresas
+def procesar_gastos_lote(current_user):
+    """Aprobar o rechazar varios gastos de empleados en una sola operación"""
+    try:
+        data = request.get_json() or {}
+        empresa_id = current_user['user_id']
+        accion = data.get('accion')
+        comentario = SecurityUtils.sanitize_input(data.get('comentario') or data.get('motivo') or '')
+        
+        if accion == 'rechazar' and not comentario:
+            return create_response(False, "El motivo del rechazo es requerido", status_code=400)
+        
+        success, message, resultado = empresa_service.procesar_gastos_lote(
+            empresa_id, data.get('ids'), accion, comentario
+        )
+        
+        return handle_service_response(success, message, resultado)
+        
+    except Exception as e:
+        logger.error(f"Error procesando lote de gastos: {e}")
+        return create_response(False, "Error interno del servidor", status_code=500)
+
+
 @empresa_bp.route('/dashboard', methods=['GET'])
 @token_required
 @require_role(2)  # Solo empresas
@@ -3,8 +3,9 @@ API REST Controllers para el sistema financiero - Enterprise Level
 ¡Los endpoints más robustos que verás en tu vida! 🔥
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from functools import wraps
+import json
 import logging
 from decimal import Decimal, InvalidOperation
 from datetime import datetime, date
@@ -20,49 +21,12 @@ from services.financial_service import (
 
 from utils.auth import token_required
 from utils.security import SecurityUtils
+from utils.quotas import user_quota
 from models.financial_repository import ValidationError, DatabaseError
 
-import os
-import google.generativeai as genai
+from services.chat_service import chat_dispatcher, ChatCapacityError, ChatTimeoutError
+from services.chat_context_service import chat_context_service
 
-system_prompt = """
-Eres "Aureumsito", un asistente virtual en desarrollo especializado en finanzas personales y economía. 
-
-### Identidad:
-- Cuando te pregunten "¿cómo te llamas?", responde: 
-  "Me llamo Aureumsito, fui desarrollado por estudiantes del CDB y estoy aquí para ayudarte con cualquier duda sobre finanzas."
-- Cuando te pregunten "¿qué modelo eres?" o "¿quién te desarrolló?", responde: 
-  "Fui desarrollado por un grupo de visionarios estudiantes de DSW del DB. También necesitaron ayuda de otros modelos y de información recopilada para darte esta experiencia."
-- Nunca menciones que fuiste entrenado por Google ni que eres un modelo de lenguaje grande.
-
-### Reglas de operación:
-- Tu propósito exclusivo es responder preguntas y dar consejos sobre:
-  ahorro, inversión, presupuestos, economía, mercados financieros, chistes y conceptos financieros.  
-- No puedes responder sobre otros temas (historia, ciencia, entretenimiento, etc.).  
-
-### Manejo de temas fuera de alcance:
-- Si un usuario te pregunta sobre un tema no permitido, debes rechazar amablemente y redirigir la conversación hacia las finanzas.  
-  Ejemplo de respuesta:  
-  "Lo siento, no fui entrenado con ese tipo de datos, mi especialidad son las finanzas. ¿Cómo puedo ayudarte con tus ahorros o inversiones hoy?"
-"""
-
-
-try:
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        print("ERROR: La variable GEMINI_API_KEY no está en el archivo .env")
-        model = None
-    else:
-        genai.configure(api_key=api_key)
-        # Aquí pasamos las instrucciones al modelo
-        model = genai.GenerativeModel(
-            model_name='gemini-1.5-flash',
-            system_instruction=system_prompt
-        )
-        print("INFO: 🤖 Modelo de Gemini configurado con personalidad de experto financiero.")
-except Exception as e:
-    model = None
-    print(f"ERROR: No se pudo configurar el modelo de Gemini: {e}")
 
 def get_current_user_id(current_user=None):
     """Extract user ID from JWT token payload"""
@@ -150,7 +114,7 @@ def validate_date(value: str, field_name: str) -> date:
 
 @financial_bp.route('/categories/<tipo_movimiento>', methods=['GET'])
 @token_required  # Re-enabled for production
-# @rate_limit(limit=100, per=60)  # 100 requests per minute
+@user_quota('read')
 @handle_errors
 def get_categorias(current_user, tipo_movimiento: str):
     """Obtiene categorías por tipo de movimiento"""
@@ -177,7 +141,7 @@ def get_categorias(current_user, tipo_movimiento: str):
 
 @financial_bp.route('/categories', methods=['GET'])
 @token_required
-# @rate_limit(limit=50, per=60)
+@user_quota('read')
 @handle_errors
 def get_todas_categorias(current_user):
     """Obtiene todas las categorías del usuario"""
@@ -193,7 +157,7 @@ def get_todas_categorias(current_user):
 
 @financial_bp.route('/categories', methods=['POST'])
 @token_required
-# @rate_limit(limit=20, per=60)  # Máximo 20 categorías nuevas por minuto
+@user_quota('write')
 @handle_errors
 def crear_categoria(current_user):
     """Crea una nueva categoría personalizada"""
@@ -230,7 +194,7 @@ def crear_categoria(current_user):
 
 @financial_bp.route('/income', methods=['GET'])
 @token_required
-# @rate_limit(limit=100, per=60)
+@user_quota('read')
 @handle_errors
 def get_ingresos(current_user):
     """Obtiene ingresos del usuario"""
@@ -284,7 +248,7 @@ def get_ingresos(current_user):
 
 @financial_bp.route('/income/summary', methods=['GET'])
 @token_required
-# @rate_limit(limit=50, per=60)
+@user_quota('income_summary')
 @handle_errors
 def get_resumen_ingresos(current_user):
     """Obtiene resumen de ingresos"""
@@ -314,7 +278,7 @@ def get_resumen_ingresos(current_user):
 
 @financial_bp.route('/income', methods=['POST'])
 @token_required
-# @rate_limit(limit=30, per=60)  # Máximo 30 ingresos por minuto
+@user_quota('write')
 @handle_errors
 def crear_ingreso(current_user):
     """Crea un nuevo ingreso"""
@@ -362,7 +326,7 @@ def crear_ingreso(current_user):
 
 @financial_bp.route('/income/<int:ingreso_id>', methods=['DELETE'])
 @token_required
-# @rate_limit(limit=20, per=60)
+@user_quota('write')
 @handle_errors
 def eliminar_ingreso(current_user, ingreso_id: int):
     """Elimina un ingreso del usuario"""
@@ -409,7 +373,7 @@ def eliminar_ingreso(current_user, ingreso_id: int):
 
 @financial_bp.route('/expenses', methods=['GET'])
 @token_required  # Re-enabled for production
-# @rate_limit(limit=100, per=60)
+@user_quota('read')
 @handle_errors
 def get_gastos(current_user):
     """Obtiene gastos del usuario"""
@@ -430,7 +394,7 @@ def get_gastos(current_user):
 
 @financial_bp.route('/expenses/by-category', methods=['GET'])
 @token_required
-# @rate_limit(limit=50, per=60)
+@user_quota('expenses_by_category')
 @handle_errors
 def get_gastos_por_categoria(current_user):
     """Obtiene resumen de gastos por categoría"""
@@ -450,7 +414,7 @@ def get_gastos_por_categoria(current_user):
 
 @financial_bp.route('/expenses', methods=['POST'])
 @token_required  # Re-enabled for production
-# @rate_limit(limit=30, per=60)
+@user_quota('write')
 @handle_errors
 def crear_gasto(current_user):
     """Crea un nuevo gasto"""
@@ -491,7 +455,7 @@ def crear_gasto(current_user):
 
 @financial_bp.route('/expenses/<int:gasto_id>', methods=['DELETE'])
 @token_required
-# @rate_limit(limit=20, per=60)
+@user_quota('write')
 @handle_errors
 def eliminar_gasto(current_user, gasto_id: int):
     """Elimina un gasto del usuario"""
@@ -538,6 +502,7 @@ def eliminar_gasto(current_user, gasto_id: int):
 
 @financial_bp.route('/expenses/planned', methods=['GET'])
 @token_required
+@user_quota('read')
 @handle_errors
 def get_planned_expenses(current_user):
     """Obtiene todos los gastos planificados del usuario"""
@@ -553,6 +518,7 @@ def get_planned_expenses(current_user):
 
 @financial_bp.route('/expenses/planned', methods=['POST'])
 @token_required
+@user_quota('write')
 @handle_errors
 def create_planned_expense(current_user):
     """Crea un nuevo gasto planificado"""
@@ -578,6 +544,7 @@ def create_planned_expense(current_user):
 
 @financial_bp.route('/expenses/planned/<int:gasto_id>/execute', methods=['POST'])
 @token_required
+@user_quota('write')
 @handle_errors
 def execute_planned_expense(current_user, gasto_id):
     """Ejecuta un gasto planificado convirtiéndolo en gasto real"""
@@ -597,6 +564,7 @@ def execute_planned_expense(current_user, gasto_id):
 
 @financial_bp.route('/expenses/planned/<int:gasto_id>/cancel', methods=['POST'])
 @token_required
+@user_quota('write')
 @handle_errors
 def cancel_planned_expense(current_user, gasto_id):
     """Cancela un gasto planificado"""
@@ -622,7 +590,7 @@ def cancel_planned_expense(current_user, gasto_id):
 
 @financial_bp.route('/goals', methods=['GET'])
 @token_required
-# @rate_limit(limit=50, per=60)
+@user_quota('read')
 @handle_errors
 def get_objetivos(current_user):
     """Obtiene objetivos del usuario"""
@@ -641,7 +609,7 @@ def get_objetivos(current_user):
 
 @financial_bp.route('/goals/summary', methods=['GET'])
 @token_required
-# @rate_limit(limit=30, per=60)
+@user_quota('goals_summary')
 @handle_errors
 def get_resumen_objetivos(current_user):
     """Obtiene resumen de objetivos"""
@@ -657,7 +625,7 @@ def get_resumen_objetivos(current_user):
 
 @financial_bp.route('/goals', methods=['POST'])
 @token_required
-# @rate_limit(limit=10, per=60)  # Máximo 10 objetivos por minuto
+@user_quota('write')
 @handle_errors
 def crear_objetivo(current_user):
     """Crea un nuevo objetivo"""
@@ -697,7 +665,7 @@ def crear_objetivo(current_user):
 
 @financial_bp.route('/goals/<int:objetivo_id>', methods=['DELETE'])
 @token_required
-# @rate_limit(limit=20, per=60)
+@user_quota('write')
 @handle_errors
 def eliminar_objetivo(current_user, objetivo_id: int):
     """Elimina un objetivo del usuario"""
@@ -740,7 +708,7 @@ def eliminar_objetivo(current_user, objetivo_id: int):
 
 @financial_bp.route('/goals/<int:objetivo_id>/add-money', methods=['POST'])
 @token_required
-# @rate_limit(limit=20, per=60)
+@user_quota('write')
 @handle_errors
 def agregar_dinero_objetivo(current_user, objetivo_id: int):
     """Agrega dinero a un objetivo"""
@@ -757,18 +725,18 @@ def agregar_dinero_objetivo(current_user, objetivo_id: int):
     monto = validate_decimal(data['monto'], 'monto')
     descripcion = SecurityUtils.sanitize_input(data.get('descripcion', ''))
     
-    objetivo = objetivo_service.agregar_dinero_objetivo(user_id, objetivo_id, monto, descripcion)
+    resultado = objetivo_service.agregar_dinero_objetivo(user_id, objetivo_id, monto, descripcion)
     
     return jsonify({
         'success': True,
-        'data': objetivo.to_dict(),
+        'data': resultado,
         'message': 'Money added to goal successfully'
     })
 
 
 @financial_bp.route('/goals/<int:objetivo_id>/withdraw-money', methods=['POST'])
 @token_required
-# @rate_limit(limit=10, per=60)
+@user_quota('write')
 @handle_errors
 def retirar_dinero_objetivo(current_user, objetivo_id: int):
     """Retira dinero de un objetivo"""
@@ -785,31 +753,36 @@ def retirar_dinero_objetivo(current_user, objetivo_id: int):
     monto = validate_decimal(data['monto'], 'monto')
     descripcion = SecurityUtils.sanitize_input(data.get('descripcion', ''))
 
-    objetivo = objetivo_service.retirar_dinero_objetivo(user_id, objetivo_id, monto, descripcion)
+    resultado = objetivo_service.retirar_dinero_objetivo(user_id, objetivo_id, monto, descripcion)
 
     return jsonify({
         'success': True,
-        'data': objetivo.to_dict(),
+        'data': resultado,
         'message': 'Money withdrawn from goal successfully'
     })
 
 
 @financial_bp.route('/goals/<int:objetivo_id>/movements', methods=['GET'])
 @token_required
-# @rate_limit(limit=50, per=60)
+@user_quota('goal_movements')
 @handle_errors
 def get_historial_movimientos_objetivo(current_user, objetivo_id: int):
     """Obtiene el historial de movimientos de un objetivo"""
     user_id = get_current_user_id(current_user)
+    limit = request.args.get('limit', objetivo_service.HISTORIAL_LIMITE_DEFAULT, type=int)
+    cursor = request.args.get('cursor')
 
-    historial = objetivo_service.get_historial_movimientos_objetivo(user_id, objetivo_id)
+    historial = objetivo_service.get_historial_movimientos_objetivo(user_id, objetivo_id, limit, cursor)
 
     return jsonify({
         'success': True,
         'data': {
             'objetivo_id': objetivo_id,
-            'movimientos': historial,
-            'total_movimientos': len(historial)
+            'movimientos': historial['movimientos'],
+            'total_movimientos': len(historial['movimientos']),
+            'siguiente_cursor': historial['siguiente_cursor'],
+            'tiene_mas': historial['tiene_mas'],
+            'resumen': historial.get('resumen')
         }
     })
 
@@ -820,7 +793,7 @@ def get_historial_movimientos_objetivo(current_user, objetivo_id: int):
 
 @financial_bp.route('/bills', methods=['GET'])
 @token_required
-# @rate_limit(limit=100, per=60)
+@user_quota('read')
 @handle_errors
 def get_facturas(current_user):
     """Obtiene facturas del usuario"""
@@ -840,7 +813,7 @@ def get_facturas(current_user):
 
 @financial_bp.route('/bills', methods=['POST'])
 @token_required
-# @rate_limit(limit=10, per=60)
+@user_quota('write')
 @handle_errors
 def crear_factura(current_user):
     """Crea una nueva factura"""
@@ -875,7 +848,7 @@ def crear_factura(current_user):
 
 @financial_bp.route('/bills/<int:factura_id>', methods=['DELETE'])
 @token_required
-# @rate_limit(limit=20, per=60)
+@user_quota('write')
 @handle_errors
 def eliminar_factura(current_user, factura_id: int):
     """Elimina una factura del usuario"""
@@ -918,7 +891,7 @@ def eliminar_factura(current_user, factura_id: int):
 
 @financial_bp.route('/bills/<int:factura_id>/mark-paid', methods=['POST'])
 @token_required
-# @rate_limit(limit=50, per=60)
+@user_quota('write')
 @handle_errors
 def marcar_factura_pagada(current_user, factura_id: int):
     """Marca una factura como pagada"""
@@ -941,7 +914,7 @@ def marcar_factura_pagada(current_user, factura_id: int):
 
 @financial_bp.route('/bills/summary', methods=['GET'])
 @token_required
-# @rate_limit(limit=100, per=60)
+@user_quota('bills_summary')
 @handle_errors
 def get_resumen_facturas(current_user):
     """Obtiene resumen de facturas del usuario"""
@@ -970,7 +943,7 @@ def test_financial_endpoint():
 
 @financial_bp.route('/bills/types', methods=['GET'])
 @token_required
-# @rate_limit(limit=100, per=60)
+@user_quota('read')
 @handle_errors
 def get_bill_types(current_user):
     """Obtiene todos los tipos de factura disponibles"""
@@ -999,7 +972,7 @@ def get_bill_types(current_user):
 
 @financial_bp.route('/bills/statuses', methods=['GET'])
 @token_required
-# @rate_limit(limit=100, per=60)
+@user_quota('read')
 @handle_errors
 def get_bill_statuses(current_user):
     """Obtiene todos los estados de factura disponibles"""
@@ -1258,7 +1231,7 @@ def fix_user_ids():
 
 @financial_bp.route('/transactions', methods=['GET'])
 @token_required  # Re-enabled for production
-# @rate_limit(limit=100, per=60)
+@user_quota('transactions')
 @handle_errors
 def get_transacciones(current_user):
     """Obtiene todas las transacciones del usuario (ingresos y gastos combinados)"""
@@ -1311,7 +1284,7 @@ def get_transacciones(current_user):
 
 @financial_bp.route('/dashboard', methods=['GET'])
 @token_required  # Re-enabled for production
-# @rate_limit(limit=30, per=60)
+@user_quota('dashboard')
 @handle_errors
 def get_dashboard(current_user):
     """Obtiene resumen completo para el dashboard"""
@@ -1344,7 +1317,7 @@ def get_dashboard(current_user):
 
 @financial_bp.route('/catalogs/payment-types', methods=['GET'])
 @token_required
-# @rate_limit(limit=50, per=60)
+@user_quota('read')
 @handle_errors
 def get_tipos_pago(current_user):
     """Obtiene tipos de pago disponibles"""
@@ -1361,7 +1334,7 @@ def get_tipos_pago(current_user):
 
 @financial_bp.route('/catalogs/bill-types', methods=['GET'])
 @token_required
-# @rate_limit(limit=50, per=60)
+@user_quota('read')
 @handle_errors
 def get_tipos_factura_catalog(current_user):
     """Obtiene los tipos de factura disponibles (catálogo)"""
@@ -1377,7 +1350,7 @@ def get_tipos_factura_catalog(current_user):
 
 @financial_bp.route('/catalogs/income-types', methods=['GET'])
 @token_required
-# @rate_limit(limit=50, per=60)
+@user_quota('read')
 @handle_errors
 def get_tipos_ingreso(current_user):
     """Obtiene tipos de ingreso disponibles"""
@@ -1394,7 +1367,7 @@ def get_tipos_ingreso(current_user):
 
 @financial_bp.route('/catalogs/priorities', methods=['GET'])
 @token_required
-# @rate_limit(limit=30, per=60)
+@user_quota('read')
 @handle_errors
 def get_prioridades(current_user):
     """Obtiene prioridades disponibles"""
@@ -1424,46 +1397,131 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
-@financial_bp.route('/chat', methods=['POST'])
-@token_required
-@handle_errors
-def handle_chat(current_user):
-    """Maneja los mensajes del chatbot con la IA de Gemini"""
-    if not model:
+def _is_quota_error(error: Exception) -> bool:
+    """Detecta el error de cuota (429) del proveedor del modelo"""
+    error_str = str(error)
+    return "429" in error_str and "quota" in error_str.lower()
+
+
+def _quota_exceeded_response():
+    return jsonify({
+        'success': False,
+        'error': 'RATE_LIMIT_EXCEEDED',
+        'message': 'Has excedido el límite de preguntas por minuto. Espera un momento antes de preguntar de nuevo.',
+        'retry_after': 60  # seconds
+    }), 429
+
+
+def _chat_capacity_response(error: ChatCapacityError):
+    response = jsonify({
+        'success': False,
+        'error': 'CHAT_BUSY',
+        'message': str(error),
+        'retry_after': error.retry_after
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+
+def _get_chat_request():
+    """Valida el cuerpo de una solicitud de chat"""
+    if not chat_dispatcher.available:
         raise BusinessLogicError("El modelo de IA no está disponible o no se pudo configurar.")
 
-    data = request.get_json()
+    data = request.get_json() or {}
     message = data.get('message')
     history = data.get('history', [])
 
     if not message:
         raise ValidationError("El mensaje es obligatorio.")
 
+    return message, history
+
+
+@financial_bp.route('/chat', methods=['POST'])
+@token_required
+@user_quota('chat')
+@handle_errors
+def handle_chat(current_user):
+    """Maneja los mensajes del chatbot con la IA de Gemini"""
+    user_id = get_current_user_id(current_user)
+    message, history = _get_chat_request()
+    history = chat_context_service.build_history(user_id, history)
+
     try:
-        chat_session = model.start_chat(history=history)
-        response = chat_session.send_message(message)
+        reply = chat_dispatcher.reply(user_id, message, history)
 
         return jsonify({
             'success': True,
-            'data': {'reply': response.text}
+            'data': {'reply': reply}
         })
 
+    except ChatCapacityError as e:
+        return _chat_capacity_response(e)
+    except ChatTimeoutError as e:
+        return jsonify({
+            'success': False,
+            'error': 'CHAT_TIMEOUT',
+            'message': str(e)
+        }), 504
     except Exception as e:
-        error_str = str(e)
-        if "429" in error_str and "quota" in error_str.lower():
+        if _is_quota_error(e):
             # Rate limit exceeded
             logger.warning(f"Gemini API quota exceeded: {e}")
-            return jsonify({
-                'success': False,
-                'error': 'RATE_LIMIT_EXCEEDED',
-                'message': 'Has excedido el límite de preguntas por minuto. Espera un momento antes de preguntar de nuevo.',
-                'retry_after': 60  # seconds
-            }), 429
+            return _quota_exceeded_response()
         else:
             # Other errors
             logger.error(f"Chat error: {e}")
             raise
 
 
+@financial_bp.route('/chat/stream', methods=['POST'])
+@token_required
+@user_quota('chat')
+@handle_errors
+def handle_chat_stream(current_user):
+    """
+    Chat en streaming mediante server-sent events.
+    Eventos: 'token' con cada fragmento, 'done' al terminar y 'error' si falla
+    """
+    user_id = get_current_user_id(current_user)
+    message, history = _get_chat_request()
+    history = chat_context_service.build_history(user_id, history)
+
+    try:
+        fragments = chat_dispatcher.stream(user_id, message, history)
+    except ChatCapacityError as e:
+        return _chat_capacity_response(e)
+
+    def sse(event: str, payload: Dict[str, Any]) -> str:
+        return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    def event_stream():
+        try:
+            for fragment in fragments:
+                yield sse('token', {'text': fragment})
+            yield sse('done', {})
+        except ChatTimeoutError as e:
+            yield sse('error', {'error': 'CHAT_TIMEOUT', 'message': str(e)})
+        except Exception as e:
+            if _is_quota_error(e):
+                logger.warning(f"Gemini API quota exceeded: {e}")
+                yield sse('error', {'error': 'RATE_LIMIT_EXCEEDED', 'retry_after': 60})
+            else:
+                logger.error(f"Chat stream error: {e}")
+                yield sse('error', {'error': 'INTERNAL_ERROR', 'message': 'An unexpected error occurred'})
+        finally:
+            fragments.close()
+
+    return Response(
+        stream_with_context(event_stream()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Evita que nginx acumule el stream
+        }
+    )
+
+
 # Registrar blueprint en el módulo
 __all__ = ['financial_bp']
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Rutas de notificaciones en tiempo real
+Las empresas y empleados reciben los cambios de aprobación de gastos por
+server-sent events en lugar de consultar las listas periódicamente. Al
+reconectar, el cliente envía Last-Event-ID y recibe lo que se perdió desde la
+tabla notificaciones.
+"""
+
+from flask import Blueprint, request, Response, stream_with_context
+import json
+import logging
+import time
+
+from config import Config
+from models.notificaciones_repository import NotificacionesRepository
+from utils.auth import token_required, create_response
+from utils.event_bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+notificaciones_bp = Blueprint('notificaciones', __name__, url_prefix='/api/notificaciones')
+
+# Eventos por lectura del historial al reconectar
+CATCH_UP_PAGINA = 100
+
+
+def _desde_id() -> int:
+    """Último id recibido por el cliente (Last-Event-ID o ?desde=)"""
+    valor = request.headers.get('Last-Event-ID') or request.args.get('desde') or 0
+    try:
+        return max(0, int(valor))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _sse(evento: dict) -> str:
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+
+@notificaciones_bp.route('/stream', methods=['GET'])
+@token_required
+def stream_notificaciones(current_user):
+    """
+    Stream SSE de eventos del usuario autenticado (al menos una vez: al
+    reconectar pueden repetirse eventos ya recibidos, con el mismo id).
+    Cierra tras EVENT_BUS_STREAM_MAX_SECONDS (o si el cliente no consume) para
+    que el cliente reconecte con Last-Event-ID sin perder eventos.
+    """
+    user_id = current_user['user_id']
+    desde = _desde_id()
+
+    subscription = event_bus.subscribe(user_id)
+    if subscription is None:
+        return create_response(False, "Demasiadas conexiones abiertas", status_code=429)
+
+    def event_stream():
+        limite = time.monotonic() + Config.EVENT_BUS_STREAM_MAX_SECONDS
+        enviados = subscription.enviados
+        try:
+            yield f"retry: {Config.EVENT_BUS_RETRY_MS}\n\n"
+            # Suscrito antes de leer el historial: lo que llegue mientras tanto
+            # queda en la cola. El historial se relee desde un margen anterior a
+            # Last-Event-ID (un id menor puede haberse confirmado después) y por
+            # páginas hasta agotarlo; todo se deduplica por id, nunca por "mayor
+            # que el último", así un evento confirmado tarde no se descarta.
+            if desde:
+                cursor = event_bus.inicio_lookback(desde)
+                while True:
+                    pagina = event_bus.catch_up(user_id, cursor, CATCH_UP_PAGINA)
+                    for evento in pagina:
+                        cursor = evento['id']
+                        # Los ids <= Last-Event-ID del margen pueden repetir
+                        # eventos ya recibidos: el cliente los descarta por id
+                        if enviados.add(evento['id']):
+                            yield _sse(evento)
+                    if len(pagina) < CATCH_UP_PAGINA:
+                        break
+
+            while time.monotonic() < limite:
+                evento = subscription.get(timeout=Config.EVENT_BUS_HEARTBEAT_SECONDS)
+                if subscription.overflowed:
+                    yield "event: reconnect\ndata: {}\n\n"
+                    return
+                if evento is None:
+                    yield ": ping\n\n"
+                elif enviados.add(evento['id']):
+                    yield _sse(evento)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(event_stream()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Evita que nginx acumule el stream
+        }
+    )
+
+
+@notificaciones_bp.route('', methods=['GET'])
+@token_required
+def obtener_notificaciones(current_user):
+    """Notificaciones posteriores a ?desde= (ponerse al día sin stream)"""
+    try:
+        eventos = event_bus.catch_up(current_user['user_id'], _desde_id(), CATCH_UP_PAGINA)
+        # Con una página completa el cliente vuelve a pedir desde el último id
+        return create_response(True, "Notificaciones obtenidas", {
+            'notificaciones': eventos,
+            'hayMas': len(eventos) == CATCH_UP_PAGINA
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo notificaciones: {e}")
+        return create_response(False, "Error interno del servidor", status_code=500)
+
+
+@notificaciones_bp.route('/leidas', methods=['POST'])
+@token_required
+def marcar_notificaciones_leidas(current_user):
+    """Marca como leídas las notificaciones indicadas en 'ids' (o todas)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        ids = data.get('ids')
+        if ids is not None:
+            try:
+                ids = [int(notificacion_id) for notificacion_id in ids]
+            except (TypeError, ValueError):
+                return create_response(False, "Los IDs deben ser números enteros", status_code=400)
+        actualizadas = NotificacionesRepository.marcar_leidas(current_user['user_id'], ids)
+        return create_response(True, "Notificaciones marcadas como leídas", {'actualizadas': actualizadas})
+    except Exception as e:
+        logger.error(f"Error marcando notificaciones: {e}")
+        return create_response(False, "Error interno del servidor", status_code=500)
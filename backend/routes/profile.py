@@ -1,5 +1,5 @@
 # routes/profile.py
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 from functools import wraps
 import os
 import uuid
@@ -9,8 +9,7 @@ from datetime import datetime
 
 # Importar modelo User y utilidades de auth
 from models.user import User
-from utils.auth import create_response
-import jwt
+from utils.auth import create_response, verified_token_cache
 
 logger = logging.getLogger(__name__)
 
@@ -43,9 +42,24 @@ def token_required(f):
             )
         
         try:
-            # Verificar token
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.find_by_id(data['user_id'])
+            # Verificar token (caché de tokens verificados + revocación tras logout)
+            data = verified_token_cache.verify(token)
+        except ValueError as e:
+            return create_response(
+                False, 
+                str(e), 
+                status_code=401
+            )
+        except Exception as e:
+            logger.error(f"Error verificando token: {e}")
+            return create_response(
+                False, 
+                "Error de autenticación", 
+                status_code=401
+            )
+        
+        try:
+            current_user = User.find_auth_by_id(data['user_id'])
             
             if not current_user:
                 return create_response(
@@ -61,18 +75,6 @@ def token_required(f):
                     status_code=403
                 )
                 
-        except jwt.ExpiredSignatureError:
-            return create_response(
-                False, 
-                "Token expirado", 
-                status_code=401
-            )
-        except jwt.InvalidTokenError:
-            return create_response(
-                False, 
-                "Token inválido", 
-                status_code=401
-            )
         except Exception as e:
             logger.error(f"Error verificando token: {e}")
             return create_response(
@@ -0,0 +1,173 @@
+"""
+Contexto financiero del chatbot
+Arma un resumen compacto de las finanzas del usuario (totales recientes,
+categorías principales, objetivos y facturas pendientes) con un presupuesto
+de tokens, lo cachea por usuario y lo invalida en cada escritura financiera
+"""
+
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import List, Dict, Any
+
+from config import Config
+from models.financial_repository import (
+    IngresoRepository, GastoRepository, ObjetivoRepository, FacturaRepository
+)
+from services.financial_service import on_financial_change
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Aproximación estándar: ~4 caracteres por token en texto latino
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación barata de tokens sin depender del tokenizador del modelo"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _money(value) -> str:
+    return f"${Decimal(str(value or 0)):,.2f}"
+
+
+class ChatContextService:
+    """Construye y cachea el resumen financiero que acompaña al chat"""
+
+    DIAS_RECIENTES = 30
+    MAX_CATEGORIAS = 5
+    MAX_OBJETIVOS = 5
+    MAX_FACTURAS = 5
+
+    def __init__(self, max_tokens: int = 400, ttl_seconds: float = 600, max_users: int = 2048):
+        self.max_tokens = max_tokens
+        self.ingreso_repo = IngresoRepository()
+        self.gasto_repo = GastoRepository()
+        self.objetivo_repo = ObjetivoRepository()
+        self.factura_repo = FacturaRepository()
+        self._cache = TTLCache(max_size=max_users, ttl=ttl_seconds, name='chat_context')
+
+    def get_context(self, user_id: int) -> str:
+        """Resumen del usuario (desde caché si no hubo escrituras desde la última vez)"""
+        return self._cache.get_or_set(user_id, lambda: self.build_context(user_id))
+
+    def invalidate(self, user_id: int):
+        """Descarta el resumen cacheado del usuario"""
+        self._cache.delete(user_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self._cache.get_stats()
+
+    def build_history(self, user_id: int, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Antepone el contexto al historial con el formato de turnos del modelo"""
+        try:
+            context = self.get_context(user_id)
+        except Exception as e:
+            # El chat sigue funcionando sin contexto si falla la base de datos
+            logger.warning(f"Could not build chat context for user {user_id}: {str(e)}")
+            return history
+
+        if not context:
+            return history
+
+        return [
+            {'role': 'user', 'parts': [{'text': context}]},
+            {'role': 'model', 'parts': [{'text': 'Entendido, tendré en cuenta tu situación financiera.'}]}
+        ] + list(history)
+
+    def build_context(self, user_id: int) -> str:
+        """
+        Arma el resumen por secciones en orden de prioridad; las secciones
+        que exceden el presupuesto de tokens se recortan o se omiten
+        """
+        hoy = date.today()
+        desde = hoy - timedelta(days=self.DIAS_RECIENTES)
+
+        secciones = [
+            self._seccion_totales(user_id, desde, hoy),
+            self._seccion_facturas(user_id, hoy),
+            self._seccion_objetivos(user_id),
+            self._seccion_categorias(user_id, desde, hoy)
+        ]
+
+        encabezado = (
+            "Contexto financiero del usuario (datos reales de la app, úsalos para "
+            f"personalizar tus consejos; fecha actual {hoy.isoformat()}):"
+        )
+        lineas = [encabezado]
+        usados = estimate_tokens(encabezado)
+
+        for seccion in secciones:
+            for linea in seccion:
+                costo = estimate_tokens(linea) + 1
+                if usados + costo > self.max_tokens:
+                    # El título de una sección no tiene sentido sin ninguna fila
+                    if lineas and lineas[-1] == seccion[0]:
+                        lineas.pop()
+                    break
+                lineas.append(linea)
+                usados += costo
+
+        return "\n".join(lineas) if len(lineas) > 1 else ""
+
+    def _seccion_totales(self, user_id: int, desde: date, hasta: date) -> List[str]:
+        ingresos = self.ingreso_repo.get_total_by_user_period(user_id, desde, hasta)
+        gastos = self.gasto_repo.get_total_by_user_period(user_id, desde, hasta)
+        return [
+            f"Últimos {self.DIAS_RECIENTES} días:",
+            f"- Ingresos {_money(ingresos)}, gastos {_money(gastos)}, balance {_money(ingresos - gastos)}"
+        ]
+
+    def _seccion_categorias(self, user_id: int, desde: date, hasta: date) -> List[str]:
+        resumen = self.gasto_repo.get_resumen_por_categoria(user_id, desde, hasta)
+        if not resumen:
+            return []
+        lineas = ["Mayores gastos por categoría:"]
+        for fila in resumen[:self.MAX_CATEGORIAS]:
+            lineas.append(
+                f"- {fila['categoria_nombre']}: {_money(fila['total_gastado'])} "
+                f"({int(fila['cantidad_gastos'])} gastos)"
+            )
+        return lineas
+
+    def _seccion_objetivos(self, user_id: int) -> List[str]:
+        objetivos = self.objetivo_repo.find_by_user(user_id)
+        if not objetivos:
+            return []
+        objetivos.sort(key=lambda o: (o.prioridad_id, -o.progreso_porcentaje))
+        lineas = ["Objetivos de ahorro:"]
+        for objetivo in objetivos[:self.MAX_OBJETIVOS]:
+            linea = (
+                f"- {objetivo.nombre}: {_money(objetivo.ahorro_actual)} de "
+                f"{_money(objetivo.meta_total)} ({objetivo.progreso_porcentaje:.0f}%)"
+            )
+            if objetivo.fecha_limite:
+                linea += f", límite {objetivo.fecha_limite.isoformat()}"
+            proyeccion = objetivo.proyeccion
+            if proyeccion and not proyeccion.completado and proyeccion.fecha_proyectada:
+                linea += f", proyectado {proyeccion.fecha_proyectada.isoformat()}"
+            lineas.append(linea)
+        return lineas
+
+    def _seccion_facturas(self, user_id: int, hoy: date) -> List[str]:
+        pendientes = [
+            f for f in self.factura_repo.find_by_user(user_id)
+            if f.estado in ('Pendiente', 'Vencida')
+        ]
+        if not pendientes:
+            return []
+        pendientes.sort(key=lambda f: f.fecha_vencimiento)
+        lineas = ["Facturas por pagar:"]
+        for factura in pendientes[:self.MAX_FACTURAS]:
+            estado = "vencida" if factura.fecha_vencimiento < hoy else f"vence {factura.fecha_vencimiento.isoformat()}"
+            lineas.append(f"- {factura.nombre}: {_money(factura.monto)}, {estado}")
+        return lineas
+
+
+# Instancia global del servicio
+chat_context_service = ChatContextService(
+    max_tokens=Config.CHAT_CONTEXT_MAX_TOKENS,
+    ttl_seconds=Config.CHAT_CONTEXT_TTL_SECONDS
+)
+on_financial_change(chat_context_service.invalidate)
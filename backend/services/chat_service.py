@@ -0,0 +1,319 @@
+"""
+Servicio del chatbot financiero (Aureumsito)
+Despacha las llamadas al modelo en un pool acotado de workers, con límite
+de cola global y de solicitudes concurrentes por usuario, y permite
+respuestas en streaming token a token
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from collections import defaultdict
+from typing import Iterator, List, Dict, Any, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = """
+Eres "Aureumsito", un asistente virtual en desarrollo especializado en finanzas personales y economía.
+
+### Identidad:
+- Cuando te pregunten "¿cómo te llamas?", responde:
+  "Me llamo Aureumsito, fui desarrollado por estudiantes del CDB y estoy aquí para ayudarte con cualquier duda sobre finanzas."
+- Cuando te pregunten "¿qué modelo eres?" o "¿quién te desarrolló?", responde:
+  "Fui desarrollado por un grupo de visionarios estudiantes de DSW del DB. También necesitaron ayuda de otros modelos y de información recopilada para darte esta experiencia."
+- Nunca menciones que fuiste entrenado por Google ni que eres un modelo de lenguaje grande.
+
+### Reglas de operación:
+- Tu propósito exclusivo es responder preguntas y dar consejos sobre:
+  ahorro, inversión, presupuestos, economía, mercados financieros, chistes y conceptos financieros.
+- No puedes responder sobre otros temas (historia, ciencia, entretenimiento, etc.).
+
+### Manejo de temas fuera de alcance:
+- Si un usuario te pregunta sobre un tema no permitido, debes rechazar amablemente y redirigir la conversación hacia las finanzas.
+  Ejemplo de respuesta:
+  "Lo siento, no fui entrenado con ese tipo de datos, mi especialidad son las finanzas. ¿Cómo puedo ayudarte con tus ahorros o inversiones hoy?"
+"""
+
+
+class ChatCapacityError(Exception):
+    """El pool de chat o el cupo del usuario está lleno"""
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ChatTimeoutError(Exception):
+    """El modelo no respondió a tiempo"""
+    pass
+
+
+# ============================================================================
+# CLIENTES DE MODELO
+# ============================================================================
+
+class ChatModelClient:
+    """Interfaz de los backends de modelo usados por el chatbot"""
+
+    name = "base"
+
+    def stream_reply(self, message: str, history: List[Dict[str, Any]]) -> Iterator[str]:
+        """Genera la respuesta fragmento a fragmento"""
+        raise NotImplementedError
+
+    def reply(self, message: str, history: List[Dict[str, Any]]) -> str:
+        """Respuesta completa (por defecto, concatena el stream)"""
+        return "".join(self.stream_reply(message, history))
+
+
+class GeminiChatClient(ChatModelClient):
+    """Cliente para Google Gemini"""
+
+    name = "gemini"
+
+    def __init__(self, model):
+        self.model = model
+
+    def reply(self, message: str, history: List[Dict[str, Any]]) -> str:
+        chat_session = self.model.start_chat(history=history)
+        return chat_session.send_message(message).text
+
+    def stream_reply(self, message: str, history: List[Dict[str, Any]]) -> Iterator[str]:
+        chat_session = self.model.start_chat(history=history)
+        for chunk in chat_session.send_message(message, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Fragmentos sin texto (p. ej. bloqueados por seguridad)
+                continue
+            if text:
+                yield text
+
+
+class FakeChatClient(ChatModelClient):
+    """Backend local determinista para pruebas y benchmarks de carga"""
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.2, token_delay: float = 0.02, reply_text: Optional[str] = None):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.reply_text = reply_text
+
+    def stream_reply(self, message: str, history: List[Dict[str, Any]]) -> Iterator[str]:
+        text = self.reply_text or (
+            f"Soy Aureumsito (modo de prueba). Recibí tu mensaje: {message}"
+        )
+        time.sleep(self.latency)
+        words = text.split(' ')
+        for i, word in enumerate(words):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield word if i == len(words) - 1 else word + ' '
+
+
+def create_chat_client(backend: Optional[str] = None) -> Optional[ChatModelClient]:
+    """Crea el cliente de modelo configurado (CHAT_MODEL_BACKEND=gemini|fake)"""
+    backend = (backend or Config.CHAT_MODEL_BACKEND).lower()
+
+    if backend == 'fake':
+        logger.info("🤖 Chatbot usando backend de prueba (fake)")
+        return FakeChatClient(
+            latency=float(os.getenv('CHAT_FAKE_LATENCY', 0.2)),
+            token_delay=float(os.getenv('CHAT_FAKE_TOKEN_DELAY', 0.02))
+        )
+
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        logger.error("google-generativeai no está instalado; chatbot deshabilitado")
+        return None
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        logger.error("La variable GEMINI_API_KEY no está en el archivo .env")
+        return None
+
+    try:
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(
+            model_name='gemini-1.5-flash',
+            system_instruction=SYSTEM_PROMPT
+        )
+        logger.info("🤖 Modelo de Gemini configurado con personalidad de experto financiero.")
+        return GeminiChatClient(model)
+    except Exception as e:
+        logger.error(f"No se pudo configurar el modelo de Gemini: {e}")
+        return None
+
+
+# ============================================================================
+# DESPACHADOR
+# ============================================================================
+
+class ChatDispatcher:
+    """
+    Ejecuta las llamadas al modelo fuera del hilo de la request.
+
+    Capacidad total = workers + cola; por encima se rechaza de inmediato
+    (ChatCapacityError) en lugar de acumular requests bloqueadas.
+    """
+
+    def __init__(self, client: Optional[ChatModelClient], max_workers: int = 4,
+                 max_queue: int = 16, max_per_user: int = 1, response_timeout: float = 60):
+        self.client = client
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.response_timeout = response_timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat-worker')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._per_user: Dict[int, int] = defaultdict(int)
+        self._stats = {
+            'completed': 0,
+            'failed': 0,
+            'rejected_capacity': 0,
+            'rejected_user_limit': 0,
+            'timeouts': 0,
+            'cancelled': 0
+        }
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def set_client(self, client: Optional[ChatModelClient]):
+        """Reemplazar el backend de modelo (útil en pruebas)"""
+        self.client = client
+
+    def reply(self, user_id: int, message: str, history: List[Dict[str, Any]]) -> str:
+        """Respuesta completa, esperando como máximo response_timeout"""
+        self._acquire(user_id)
+        try:
+            future = self._executor.submit(self._run_reply, user_id, message, history)
+        except Exception:
+            self._release(user_id)
+            raise
+
+        try:
+            return future.result(timeout=self.response_timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                # Nunca llegó a ejecutarse: liberar aquí su cupo
+                self._release(user_id)
+            self._count('timeouts')
+            raise ChatTimeoutError("El asistente tardó demasiado en responder")
+
+    def stream(self, user_id: int, message: str, history: List[Dict[str, Any]]) -> Iterator[str]:
+        """
+        Reserva capacidad de inmediato (los rechazos ocurren antes de abrir el
+        stream) y retorna un generador que entrega los fragmentos según llegan
+        """
+        self._acquire(user_id)
+        fragments: queue.Queue = queue.Queue()
+        cancelled = threading.Event()
+
+        def worker():
+            terminal = ('done', None)
+            try:
+                for fragment in self.client.stream_reply(message, history):
+                    if cancelled.is_set():
+                        self._count('cancelled')
+                        return
+                    fragments.put(('token', fragment))
+                self._count('completed')
+            except Exception as e:
+                self._count('failed')
+                terminal = ('error', e)
+            finally:
+                # Liberar antes de avisar el fin, para que el usuario pueda volver a preguntar
+                self._release(user_id)
+                fragments.put(terminal)
+
+        try:
+            self._executor.submit(worker)
+        except Exception:
+            self._release(user_id)
+            raise
+
+        def generator():
+            try:
+                while True:
+                    try:
+                        kind, value = fragments.get(timeout=self.response_timeout)
+                    except queue.Empty:
+                        self._count('timeouts')
+                        raise ChatTimeoutError("El asistente tardó demasiado en responder")
+                    if kind == 'token':
+                        yield value
+                    elif kind == 'done':
+                        return
+                    else:
+                        raise value
+            finally:
+                # Si el cliente se desconecta, el worker deja de consumir el modelo
+                cancelled.set()
+
+        return generator()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['active_users'] = len(self._per_user)
+            stats['in_flight'] = sum(self._per_user.values())
+        stats['capacity'] = self.max_workers + self.max_queue
+        stats['backend'] = self.client.name if self.client else None
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def _run_reply(self, user_id: int, message: str, history: List[Dict[str, Any]]) -> str:
+        try:
+            text = self.client.reply(message, history)
+            self._count('completed')
+            return text
+        except Exception:
+            self._count('failed')
+            raise
+        finally:
+            self._release(user_id)
+
+    def _acquire(self, user_id: int):
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected_capacity')
+            raise ChatCapacityError("El asistente está atendiendo demasiadas consultas. Intenta de nuevo en unos segundos.")
+        with self._lock:
+            if self._per_user[user_id] >= self.max_per_user:
+                self._stats['rejected_user_limit'] += 1
+                self._slots.release()
+                raise ChatCapacityError("Ya tienes una consulta en curso. Espera a que termine.", retry_after=2)
+            self._per_user[user_id] += 1
+
+    def _release(self, user_id: int):
+        with self._lock:
+            self._per_user[user_id] -= 1
+            if self._per_user[user_id] <= 0:
+                del self._per_user[user_id]
+        self._slots.release()
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+
+# Instancia global del despachador
+chat_dispatcher = ChatDispatcher(
+    create_chat_client(),
+    max_workers=Config.CHAT_MAX_WORKERS,
+    max_queue=Config.CHAT_MAX_QUEUE,
+    max_per_user=Config.CHAT_MAX_PER_USER,
+    response_timeout=Config.CHAT_RESPONSE_TIMEOUT
+)
@@ -13,6 +13,7 @@ from models.financial_base import Gasto
 from services.financial_service import gasto_service
 from utils.database import db_manager
 from utils.security import SecurityUtils
+from utils.event_bus import event_bus
 
 logger = logging.getLogger(__name__)
 
@@ -75,6 +76,21 @@ class EmpleadoService:
             
             mensaje = f"Gasto para '{gasto.concepto}' creado. Estado: {estado_texto}."
             
+            # Aviso en tiempo real a la empresa (reemplaza el sondeo de pendientes)
+            if requiere_aprobacion:
+                event_bus.publish([{
+                    'user_id': empleado.created_by_empresa_id,
+                    'tipo': 'gasto_pendiente',
+                    'titulo': 'Nuevo gasto por aprobar',
+                    'mensaje': f"{empleado.username} registró '{gasto.concepto}' por {float(gasto.monto):.2f}",
+                    'metadata': {
+                        'gasto_id': gasto.id,
+                        'empleado_id': empleado_id,
+                        'concepto': gasto.concepto,
+                        'monto': float(gasto.monto)
+                    }
+                }])
+            
             return True, mensaje, {
                 'id': gasto.id,
                 'concepto': gasto.concepto,
@@ -3,6 +3,8 @@ Servicios específicos para el rol EMPRESA
 Gestión de empleados y aprobación de gastos
 """
 
+import csv
+import io
 import logging
 from typing import List, Optional, Dict, Any
 from decimal import Decimal
@@ -10,15 +12,48 @@ from datetime import datetime, date
 
 from models.user import User
 from models.financial_base import Gasto, EstadoAprobacion
+from models.contadores_repository import ContadoresRepository
+from models.dashboard_empresa_repository import DashboardEmpresaRepository, rango_mes
+from models.user_search_repository import UserSearchRepository
 from services.financial_service import gasto_service
 from utils.database import db_manager
 from utils.auth import hash_password
+from utils.audit import audit_writer
+from utils.availability import availability_index
+from utils.password_pool import password_pool, PasswordPoolBusy
+from utils.event_bus import event_bus
+from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Columnas aceptadas en el alta masiva (JSON o cabecera del CSV)
+CAMPOS_EMPLEADO_LOTE = (
+    'username', 'email', 'password', 'first_name', 'last_name', 'phone_number',
+    'puesto', 'sueldo', 'fecha_contratacion', 'telefono', 'direccion', 'notas'
+)
+
+
+def leer_csv_empleados(contenido: str) -> List[Dict[str, Any]]:
+    """Filas de un CSV con cabecera (columnas de CAMPOS_EMPLEADO_LOTE; ',' o ';')"""
+    contenido = contenido.lstrip('\ufeff')
+    try:
+        dialecto = csv.Sniffer().sniff(contenido[:2048], delimiters=',;')
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.DictReader(io.StringIO(contenido), dialect=dialecto)
+    lector.fieldnames = [(campo or '').strip().lower() for campo in (lector.fieldnames or [])]
+    # Las líneas vacías se descartan
+    return [fila for fila in lector if any(isinstance(valor, str) and valor.strip() for valor in fila.values())]
+
+
 class EmpresaService:
     """Servicio para operaciones específicas de empresa"""
     
+    ACCION_APROBAR = 'aprobar'
+    ACCION_RECHAZAR = 'rechazar'
+    # Acción -> estado_aprobacion_id resultante
+    ESTADOS_POR_ACCION = {ACCION_APROBAR: 2, ACCION_RECHAZAR: 3}
+    
     def __init__(self):
         self.ROL_EMPRESA = 2
         self.ROL_EMPLEADO = 3
@@ -73,6 +108,213 @@ class EmpresaService:
             logger.error(f"Error creando empleado: {e}")
             return False, "Error interno creando empleado", None
 
+    def crear_empleados_lote(self, empresa_id: int,
+                             filas: List[Any]) -> tuple[bool, str, Optional[Dict[str, Any]]]:
+        """
+        Alta masiva de empleados (JSON o CSV ya leído con leer_csv_empleados)
+
+        Args:
+            empresa_id: ID de la empresa que crea los empleados
+            filas: Datos de cada empleado, con los mismos campos que crear_empleado
+
+        Returns:
+            tuple: (success, message, {'resultados': [...], 'creados': n, 'fallidos': n})
+        """
+        if not isinstance(filas, list) or not filas:
+            return False, "Se requiere una lista de empleados", None
+        if len(filas) > Config.EMPRESA_EMPLEADOS_LOTE_MAX:
+            return False, f"Máximo {Config.EMPRESA_EMPLEADOS_LOTE_MAX} empleados por lote", None
+
+        try:
+            empresa = User.find_by_id(empresa_id)
+            if not empresa or empresa.id_rol != self.ROL_EMPRESA:
+                return False, "Solo las empresas pueden crear empleados", None
+
+            resultados = [None] * len(filas)
+            candidatos = self._validar_empleados_lote(filas, resultados)
+            self._descartar_existentes(candidatos, resultados)
+
+            if candidatos:
+                try:
+                    hashes = password_pool.hash_many([datos['password'] for _, datos in candidatos])
+                except PasswordPoolBusy:
+                    return False, "Servidor ocupado, intenta de nuevo en unos segundos", None
+                for (_, datos), password_hash in zip(candidatos, hashes):
+                    datos['password_hash'] = password_hash
+
+                ids = self._insertar_empleados(empresa_id, [datos for _, datos in candidatos])
+                for indice, datos in candidatos:
+                    availability_index.add(datos['username'], datos['email'])
+                    resultados[indice] = {
+                        'fila': indice + 1,
+                        'id': ids[datos['username'].lower()],
+                        'username': datos['username'],
+                        'success': True,
+                        'message': "Empleado creado"
+                    }
+        except Exception as e:
+            logger.error(f"Error en alta masiva de empleados: {e}")
+            return False, "Error interno creando empleados; no se creó ninguno", None
+
+        creados = len(candidatos)
+        logger.info(f"Alta masiva de empresa {empresa_id}: {creados}/{len(filas)} empleados creados")
+        return True, f"{creados} de {len(filas)} empleados creados", {
+            'resultados': resultados,
+            'creados': creados,
+            'fallidos': len(filas) - creados
+        }
+
+    def _validar_empleados_lote(self, filas: List[Any],
+                                resultados: List[Optional[Dict[str, Any]]]) -> List[tuple]:
+        """
+        Valida y normaliza cada fila sin consultar la base de datos; anota los
+        errores en `resultados` y retorna [(índice, datos)] de las válidas.
+        Dentro del lote, un username o email repetido solo vale la primera vez.
+        """
+        candidatos = []
+        usernames, emails = set(), set()
+        for indice, fila in enumerate(filas):
+            def fallo(mensaje):
+                resultados[indice] = {
+                    'fila': indice + 1,
+                    'username': fila.get('username') if isinstance(fila, dict) else None,
+                    'success': False,
+                    'message': mensaje
+                }
+
+            if not isinstance(fila, dict):
+                fallo("Formato de fila inválido")
+                continue
+            datos = {
+                campo: valor.strip() if isinstance(valor, str) else valor
+                for campo, valor in fila.items()
+                if campo in CAMPOS_EMPLEADO_LOTE and valor not in (None, '')
+            }
+            faltante = next((campo for campo in ('username', 'email', 'password') if not datos.get(campo)), None)
+            if faltante:
+                fallo(f"Campo {faltante} es requerido")
+                continue
+            if not all(isinstance(datos[campo], str) for campo in ('username', 'email', 'password')):
+                fallo("username, email y password deben ser texto")
+                continue
+
+            datos['email'] = datos['email'].lower()
+            is_valid, error = User.validate_user_data(
+                datos['username'], datos['email'], datos['password'],
+                datos.get('first_name'), datos.get('last_name'), datos.get('phone_number')
+            )
+            if not is_valid:
+                fallo(error)
+                continue
+            # Un sueldo o fecha inválidos harían fallar el executemany de todo el lote
+            try:
+                if 'sueldo' in datos:
+                    datos['sueldo'] = Decimal(str(datos['sueldo']))
+                if 'fecha_contratacion' in datos:
+                    datos['fecha_contratacion'] = date.fromisoformat(str(datos['fecha_contratacion']))
+            except (ArithmeticError, ValueError):
+                fallo("sueldo o fecha_contratacion inválidos (use 1234.50 y AAAA-MM-DD)")
+                continue
+
+            username = datos['username'].lower()
+            if username in usernames:
+                fallo("Username repetido en el lote")
+                continue
+            if datos['email'] in emails:
+                fallo("Email repetido en el lote")
+                continue
+            usernames.add(username)
+            emails.add(datos['email'])
+            candidatos.append((indice, datos))
+        return candidatos
+
+    def _descartar_existentes(self, candidatos: List[tuple], resultados: List[Optional[Dict[str, Any]]]):
+        """
+        Una sola consulta para los usernames y emails de todo el lote; quita de
+        `candidatos` las filas que ya existen en users
+        """
+        if not candidatos:
+            return
+        usernames = [datos['username'] for _, datos in candidatos]
+        emails = [datos['email'] for _, datos in candidatos]
+        existentes = db_manager.fetch_all(f"""
+            SELECT username, email FROM users
+            WHERE username IN ({", ".join(["%s"] * len(usernames))})
+               OR email IN ({", ".join(["%s"] * len(emails))})
+        """, (*usernames, *emails)) or []
+        usernames_usados = {fila['username'].lower() for fila in existentes}
+        emails_usados = {fila['email'].lower() for fila in existentes}
+
+        disponibles = []
+        for indice, datos in candidatos:
+            if datos['email'] in emails_usados:
+                mensaje = "Ya existe un usuario con este email"
+            elif datos['username'].lower() in usernames_usados:
+                mensaje = "Ya existe un usuario con este nombre de usuario"
+            else:
+                disponibles.append((indice, datos))
+                continue
+            resultados[indice] = {
+                'fila': indice + 1,
+                'username': datos['username'],
+                'success': False,
+                'message': mensaje
+            }
+        candidatos[:] = disponibles
+
+    def _insertar_empleados(self, empresa_id: int, empleados: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Inserta users, empleados_details, trigramas de búsqueda y contadores en
+        una transacción con executemany. Si algo falla (p. ej. un username
+        creado en paralelo) no se crea ninguno. Retorna username en minúsculas -> id.
+        """
+        with db_manager.get_db_cursor() as (cursor, connection):
+            try:
+                connection.start_transaction()
+                cursor.executemany("""
+                    INSERT INTO users (username, email, password_hash, first_name, last_name,
+                                       phone_number, id_rol, created_by_empresa_id, is_verified)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, [
+                    (datos['username'], datos['email'], datos['password_hash'],
+                     datos.get('first_name'), datos.get('last_name'), datos.get('phone_number'),
+                     self.ROL_EMPLEADO, empresa_id, True)
+                    for datos in empleados
+                ])
+
+                # Los ids de un INSERT multi-fila no son necesariamente consecutivos
+                # (innodb_autoinc_lock_mode=2): se leen por username
+                usernames = [datos['username'] for datos in empleados]
+                cursor.execute(f"""
+                    SELECT id, username FROM users
+                    WHERE username IN ({", ".join(["%s"] * len(usernames))})
+                """, tuple(usernames))
+                ids = {fila['username'].lower(): fila['id'] for fila in cursor.fetchall()}
+
+                detalles = [
+                    (ids[datos['username'].lower()], datos.get('puesto'), datos.get('sueldo'),
+                     datos.get('fecha_contratacion'), datos.get('telefono'),
+                     datos.get('direccion'), datos.get('notas'))
+                    for datos in empleados
+                    if any(campo in datos for campo in ('puesto', 'sueldo', 'fecha_contratacion'))
+                ]
+                if detalles:
+                    cursor.executemany("""
+                        INSERT INTO empleados_details
+                        (user_id, puesto, sueldo, fecha_contratacion, telefono, direccion, notas)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """, detalles)
+
+                UserSearchRepository.indexar_nuevos(
+                    cursor, {ids[datos['username'].lower()]: datos for datos in empleados}
+                )
+                ContadoresRepository.incrementar(cursor, ContadoresRepository.delta_usuario(len(empleados)))
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        return ids
+
     def eliminar_empleado(self, empleado_id: int, empresa_id: int) -> tuple[bool, str]:
         """
         Elimina permanentemente un empleado (hard delete) y sus detalles,
@@ -80,15 +322,34 @@ class EmpresaService:
         """
         try:
             # Se utiliza una transacción para asegurar que ambas eliminaciones ocurran o ninguna.
-            with db_manager.get_db_cursor(commit=False) as (cursor, connection):
+            with db_manager.get_db_cursor() as (cursor, connection):
                 try:
+                    connection.start_transaction()
+
                     # Primero, verificar que el empleado pertenece a la empresa antes de borrar.
-                    check_query = "SELECT id FROM users WHERE id = %s AND created_by_empresa_id = %s AND id_rol = %s"
+                    check_query = """
+                        SELECT id, status, created_at FROM users
+                        WHERE id = %s AND created_by_empresa_id = %s AND id_rol = %s
+                        FOR UPDATE
+                    """
                     cursor.execute(check_query, (empleado_id, empresa_id, self.ROL_EMPLEADO))
-                    if cursor.fetchone() is None:
+                    empleado = cursor.fetchone()
+                    if empleado is None:
                         connection.rollback()
                         return False, "Empleado no encontrado o no tienes permiso para eliminarlo."
 
+                    # Montos que el borrado en cascada quitará de los totales globales
+                    cursor.execute(
+                        "SELECT COALESCE(SUM(monto), 0) AS total FROM ingresos WHERE user_id = %s OR empresa_id = %s",
+                        (empleado_id, empleado_id)
+                    )
+                    ingresos = cursor.fetchone()['total']
+                    cursor.execute(
+                        "SELECT COALESCE(SUM(monto), 0) AS total FROM gastos WHERE user_id = %s OR empresa_id = %s",
+                        (empleado_id, empleado_id)
+                    )
+                    gastos = cursor.fetchone()['total']
+
                     # Borrar de la tabla de detalles (si existe)
                     delete_details_query = "DELETE FROM empleados_details WHERE user_id = %s"
                     cursor.execute(delete_details_query, (empleado_id,))
@@ -96,8 +357,14 @@ class EmpresaService:
                     # Borrar de la tabla principal de usuarios
                     delete_user_query = "DELETE FROM users WHERE id = %s"
                     cursor.execute(delete_user_query, (empleado_id,))
+
+                    deltas = ContadoresRepository.delta_usuario(-1, empleado['status'], empleado['created_at'])
+                    deltas[ContadoresRepository.INGRESOS] = -Decimal(str(ingresos))
+                    deltas[ContadoresRepository.GASTOS] = -Decimal(str(gastos))
+                    ContadoresRepository.incrementar(cursor, deltas)
                     
                     connection.commit()
+                    User.invalidate_cache(empleado_id)
                     
                     logger.info(f"Empleado {empleado_id} eliminado permanentemente por empresa {empresa_id}")
                     return True, "Empleado eliminado correctamente."
@@ -266,33 +533,9 @@ class EmpresaService:
             tuple: (success, message)
         """
         try:
-            # Validar que el gasto pertenezca a un empleado de esta empresa
-            query_validacion = """
-                SELECT g.id, g.user_id, u.created_by_empresa_id 
-                FROM gastos g
-                JOIN users u ON g.user_id = u.id
-                WHERE g.id = %s AND u.created_by_empresa_id = %s
-                  AND g.estado_aprobacion_id = 1
-            """
-            
-            gasto_info = db_manager.fetch_one(query_validacion, (gasto_id, empresa_id))
-            if not gasto_info:
-                return False, "Gasto no encontrado o ya procesado"
-            
-            # Aprobar el gasto
-            query_aprobacion = """
-                UPDATE gastos 
-                SET estado_aprobacion_id = 2,
-                    aprobado_por = %s,
-                    fecha_aprobacion = NOW(),
-                    notas = CONCAT(IFNULL(notas, ''), %s)
-                WHERE id = %s
-            """
-            
-            comentario_completo = f"\n[APROBADO] {comentario}" if comentario else "\n[APROBADO]"
-            
-            db_manager.execute_query(query_aprobacion, (empresa_id, comentario_completo, gasto_id))
-            
+            resultado = self._procesar_gastos(empresa_id, [gasto_id], self.ACCION_APROBAR, comentario)[0]
+            if not resultado['success']:
+                return False, resultado['message']
             logger.info(f"Gasto {gasto_id} aprobado por empresa {empresa_id}")
             return True, "Gasto aprobado exitosamente"
             
@@ -313,33 +556,9 @@ class EmpresaService:
             tuple: (success, message)
         """
         try:
-            # Validar que el gasto pertenezca a un empleado de esta empresa
-            query_validacion = """
-                SELECT g.id, g.user_id, u.created_by_empresa_id 
-                FROM gastos g
-                JOIN users u ON g.user_id = u.id
-                WHERE g.id = %s AND u.created_by_empresa_id = %s
-                  AND g.estado_aprobacion_id = 1
-            """
-            
-            gasto_info = db_manager.fetch_one(query_validacion, (gasto_id, empresa_id))
-            if not gasto_info:
-                return False, "Gasto no encontrado o ya procesado"
-            
-            # Rechazar el gasto
-            query_rechazo = """
-                UPDATE gastos 
-                SET estado_aprobacion_id = 3,
-                    aprobado_por = %s,
-                    fecha_aprobacion = NOW(),
-                    notas = CONCAT(IFNULL(notas, ''), %s)
-                WHERE id = %s
-            """
-            
-            motivo_completo = f"\n[RECHAZADO] {motivo}" if motivo else "\n[RECHAZADO]"
-            
-            db_manager.execute_query(query_rechazo, (empresa_id, motivo_completo, gasto_id))
-            
+            resultado = self._procesar_gastos(empresa_id, [gasto_id], self.ACCION_RECHAZAR, motivo)[0]
+            if not resultado['success']:
+                return False, resultado['message']
             logger.info(f"Gasto {gasto_id} rechazado por empresa {empresa_id}")
             return True, "Gasto rechazado exitosamente"
             
@@ -347,6 +566,130 @@ class EmpresaService:
             logger.error(f"Error rechazando gasto: {e}")
             return False, "Error interno rechazando gasto"
     
+    def procesar_gastos_lote(self, empresa_id: int, gasto_ids: List[Any], accion: str,
+                             comentario: str = "") -> tuple[bool, str, Optional[Dict[str, Any]]]:
+        """
+        Aprobar o rechazar varios gastos de empleados en una sola transacción
+        
+        Args:
+            empresa_id: ID de la empresa
+            gasto_ids: IDs de los gastos
+            accion: 'aprobar' o 'rechazar'
+            comentario: Comentario de la aprobación o motivo del rechazo
+            
+        Returns:
+            tuple: (success, message, {'resultados': [...], 'procesados': n, 'fallidos': n})
+        """
+        if accion not in self.ESTADOS_POR_ACCION:
+            return False, "Acción inválida (use 'aprobar' o 'rechazar')", None
+        if not isinstance(gasto_ids, list) or not gasto_ids:
+            return False, "Se requiere una lista de IDs de gastos", None
+        try:
+            ids = list(dict.fromkeys(int(gasto_id) for gasto_id in gasto_ids))
+        except (TypeError, ValueError):
+            return False, "Los IDs de gastos deben ser números enteros", None
+        if len(ids) > Config.EMPRESA_GASTOS_LOTE_MAX:
+            return False, f"Máximo {Config.EMPRESA_GASTOS_LOTE_MAX} gastos por lote", None
+        
+        try:
+            resultados = self._procesar_gastos(empresa_id, ids, accion, comentario)
+        except Exception as e:
+            logger.error(f"Error procesando lote de gastos: {e}")
+            return False, "Error interno procesando gastos", None
+        
+        procesados = sum(1 for resultado in resultados if resultado['success'])
+        logger.info(f"Lote de gastos ({accion}) de empresa {empresa_id}: {procesados}/{len(ids)} procesados")
+        return True, f"{procesados} de {len(ids)} gastos procesados", {
+            'resultados': resultados,
+            'procesados': procesados,
+            'fallidos': len(ids) - procesados
+        }
+    
+    def _procesar_gastos(self, empresa_id: int, gasto_ids: List[int], accion: str,
+                         comentario: str = "") -> List[Dict[str, Any]]:
+        """
+        Verifica con una consulta que los gastos sean de empleados de la empresa
+        y sigan pendientes (bloqueándolos), los actualiza con un único UPDATE y
+        encola su auditoría. Retorna un resultado por id, en el orden recibido.
+        """
+        estado = self.ESTADOS_POR_ACCION[accion]
+        etiqueta = "[APROBADO]" if accion == self.ACCION_APROBAR else "[RECHAZADO]"
+        nota = f"\n{etiqueta} {comentario}" if comentario else f"\n{etiqueta}"
+        placeholders = ", ".join(["%s"] * len(gasto_ids))
+        
+        with db_manager.get_db_cursor() as (cursor, connection):
+            try:
+                connection.start_transaction()
+                cursor.execute(f"""
+                    SELECT g.id, g.user_id, g.concepto
+                    FROM gastos g
+                    JOIN users u ON g.user_id = u.id
+                    WHERE g.id IN ({placeholders})
+                      AND u.created_by_empresa_id = %s
+                      AND g.estado_aprobacion_id = 1
+                    FOR UPDATE
+                """, (*gasto_ids, empresa_id))
+                validos = {fila['id']: fila for fila in cursor.fetchall()}
+                
+                if validos:
+                    cursor.execute(f"""
+                        UPDATE gastos 
+                        SET estado_aprobacion_id = %s,
+                            aprobado_por = %s,
+                            fecha_aprobacion = NOW(),
+                            notas = CONCAT(IFNULL(notas, ''), %s)
+                        WHERE id IN ({", ".join(["%s"] * len(validos))})
+                    """, (estado, empresa_id, nota, *validos))
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        
+        # Auditoría: se encola todo junto y el escritor lo inserta en un lote
+        accion_auditoria = 'EXPENSE_APPROVED' if accion == self.ACCION_APROBAR else 'EXPENSE_REJECTED'
+        for gasto_id, fila in validos.items():
+            if not audit_writer.record(empresa_id, accion_auditoria, 'Gasto', gasto_id,
+                                       {'employee_id': fila['user_id'], 'comment': comentario}):
+                logger.error(f"Auditoría descartada (cola llena): {accion_auditoria} sobre Gasto {gasto_id}")
+        
+        if validos:
+            self._publicar_gastos_procesados(empresa_id, accion, comentario, list(validos.values()))
+        
+        return [
+            {'id': gasto_id, 'success': True, 'message': "Procesado"}
+            if gasto_id in validos else
+            {'id': gasto_id, 'success': False, 'message': "Gasto no encontrado o ya procesado"}
+            for gasto_id in gasto_ids
+        ]
+    
+    def _publicar_gastos_procesados(self, empresa_id: int, accion: str, comentario: str,
+                                    gastos: List[Dict[str, Any]]):
+        """
+        Un evento por gasto para su empleado y uno (ya leído) para la empresa,
+        para que sus otras sesiones quiten los gastos de la lista de pendientes
+        """
+        aprobado = accion == self.ACCION_APROBAR
+        eventos = [
+            {
+                'user_id': gasto['user_id'],
+                'tipo': 'gasto_aprobado' if aprobado else 'gasto_rechazado',
+                'titulo': 'Gasto aprobado' if aprobado else 'Gasto rechazado',
+                'mensaje': f"Tu gasto '{gasto['concepto']}' fue {'aprobado' if aprobado else 'rechazado'}"
+                           + (f": {comentario}" if comentario else ""),
+                'metadata': {'gasto_id': gasto['id'], 'estado_aprobacion_id': self.ESTADOS_POR_ACCION[accion]}
+            }
+            for gasto in gastos
+        ]
+        eventos.append({
+            'user_id': empresa_id,
+            'tipo': 'gastos_procesados',
+            'titulo': 'Gastos procesados',
+            'mensaje': f"{len(gastos)} gastos {'aprobados' if aprobado else 'rechazados'}",
+            'leida': True,
+            'metadata': {'gasto_ids': [gasto['id'] for gasto in gastos], 'accion': accion}
+        })
+        event_bus.publish(eventos)
+    
     def get_dashboard_empresa(self, empresa_id: int) -> Dict[str, Any]:
         """
         Obtener datos del dashboard para empresa
@@ -358,53 +701,27 @@ class EmpresaService:
             Dict: Datos del dashboard empresarial
         """
         try:
-            # Contar gastos pendientes
-            query_pendientes = """
-                SELECT COUNT(*) as total
-                FROM gastos g
-                JOIN users u ON g.user_id = u.id
-                WHERE u.created_by_empresa_id = %s 
-                  AND g.requiere_aprobacion = 1
-                  AND g.estado_aprobacion_id = 1
-            """
-            result_pendientes = db_manager.fetch_one(query_pendientes, (empresa_id,))
-            gastos_pendientes = result_pendientes['total'] if result_pendientes else 0
+            inicio_mes, fin_mes = rango_mes()
             
-            # Total de empleados
-            query_empleados = """
-                SELECT COUNT(*) as total
-                FROM users 
-                WHERE created_by_empresa_id = %s AND id_rol = %s AND is_active = 1
-            """
-            result_empleados = db_manager.fetch_one(query_empleados, (empresa_id, self.ROL_EMPLEADO))
-            total_empleados = result_empleados['total'] if result_empleados else 0
-            
-            # Gastos del mes actual por empleado
-            query_gastos_mes = """
-                SELECT 
-                    u.username,
-                    COALESCE(SUM(CASE WHEN g.estado_aprobacion_id = 2 THEN g.monto ELSE 0 END), 0) as gastos_aprobados,
-                    COUNT(CASE WHEN g.estado_aprobacion_id = 1 THEN 1 END) as pendientes
-                FROM users u
-                LEFT JOIN gastos g ON u.id = g.user_id 
-                    AND MONTH(g.fecha) = MONTH(CURRENT_DATE())
-                    AND YEAR(g.fecha) = YEAR(CURRENT_DATE())
-                WHERE u.created_by_empresa_id = %s AND u.id_rol = %s
-                GROUP BY u.id, u.username
-                ORDER BY gastos_aprobados DESC
-            """
-            gastos_por_empleado = db_manager.fetch_all(query_gastos_mes, (empresa_id, self.ROL_EMPLEADO))
+            # Empresas grandes: resumen precalculado del mes si está al día
+            filas = None
+            if Config.EMPRESA_DASHBOARD_ROLLUPS_ENABLED:
+                filas = DashboardEmpresaRepository.resumen_rollup(
+                    empresa_id, inicio_mes, Config.EMPRESA_DASHBOARD_ROLLUP_MAX_AGE_SECONDS
+                )
+            if filas is None:
+                filas = DashboardEmpresaRepository.resumen_en_vivo(empresa_id, inicio_mes, fin_mes)
             
             return {
-                'gastosPendientes': gastos_pendientes,
-                'totalEmpleados': total_empleados,
+                'gastosPendientes': sum(int(row['pendientes_total']) for row in filas),
+                'totalEmpleados': sum(1 for row in filas if row['is_active']),
                 'gastosPorEmpleado': [
                     {
                         'empleado': row['username'],
                         'gastosAprobados': float(row['gastos_aprobados']),
-                        'gastosPendientes': row['pendientes']
+                        'gastosPendientes': int(row['pendientes_mes'])
                     }
-                    for row in gastos_por_empleado
+                    for row in filas
                 ]
             }
             
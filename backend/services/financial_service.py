@@ -3,26 +3,48 @@ Servicios de negocio para el sistema financiero - Enterprise Architecture
 ¡La lógica de negocio más robusta que verás en tu vida! 🔥
 """
 
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Callable
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 import logging
+import math
+import base64
 from dataclasses import asdict
 import calendar
 
 from models.financial_base import *
 from models.financial_repository import *
+from utils.audit import audit_writer
 # from utils.auth import get_current_user_id  # TODO: Function doesn't exist yet
-# from utils.security import audit_log  # TODO: Function doesn't exist yet
 
 def audit_log(message: str):
-    """Temporary audit log function - logs to regular logger"""
-    logger.info(f"[AUDIT] {message}")
+    """Auditoría no bloqueante: solo encola, el hilo de auditoría escribe la línea"""
+    audit_writer.log(message)
 
 
 logger = logging.getLogger(__name__)
 
 
+# Suscriptores notificados cuando cambian los datos financieros de un usuario
+# (cachés derivados como el contexto del chatbot se invalidan aquí)
+_financial_change_listeners: List[Callable[[int], None]] = []
+
+
+def on_financial_change(listener: Callable[[int], None]) -> Callable[[int], None]:
+    """Registra un callback que recibe el user_id tras cada escritura financiera"""
+    _financial_change_listeners.append(listener)
+    return listener
+
+
+def notify_financial_change(user_id: int):
+    """Notifica a los suscriptores que cambiaron los datos financieros del usuario"""
+    for listener in _financial_change_listeners:
+        try:
+            listener(user_id)
+        except Exception as e:
+            logger.warning(f"Error notifying financial change for user {user_id}: {str(e)}")
+
+
 class BusinessLogicError(Exception):
     """Excepción para errores de lógica de negocio"""
     pass
@@ -264,6 +286,7 @@ class IngresoService(BaseFinancialService):
         
         ingreso_id = self.ingreso_repo.create(ingreso)
         ingreso.id = ingreso_id
+        notify_financial_change(user_id)
 
         # Actualizar rachas al crear ingreso
         try:
@@ -335,6 +358,7 @@ class IngresoService(BaseFinancialService):
         success = self.ingreso_repo.delete(ingreso_id)
 
         if success:
+            notify_financial_change(user_id)
             logger.info(f"Deleted income {ingreso_id} for user {user_id}")
         else:
             logger.error(f"Failed to delete income {ingreso_id} for user {user_id}")
@@ -453,6 +477,7 @@ class GastoService(BaseFinancialService):
         
         gasto_id = self.gasto_repo.create(gasto)
         gasto.id = gasto_id
+        notify_financial_change(user_id)
         
         # --- Lógica posterior (sin cambios) ---
         self.presupuesto_service.actualizar_gasto_en_presupuesto(
@@ -650,6 +675,7 @@ class GastoService(BaseFinancialService):
         success = self.gasto_repo.delete(gasto_id)
 
         if success:
+            notify_financial_change(user_id)
             logger.info(f"Deleted expense {gasto_id} for user {user_id}")
         else:
             logger.error(f"Failed to delete expense {gasto_id} for user {user_id}")
@@ -657,6 +683,91 @@ class GastoService(BaseFinancialService):
         return success
 
 
+class ProyeccionObjetivoService(BaseFinancialService):
+    """Servicio de proyecciones de cumplimiento de objetivos"""
+
+    VENTANA_DIAS = 90  # Historial considerado para la velocidad de ahorro
+    DIAS_MINIMOS_OBSERVACION = 30  # Evita velocidades infladas en objetivos recién creados
+    MAX_DIAS_PROYECCION = 365 * 100
+    DIAS_POR_MES = Decimal('30.44')
+
+    def __init__(self):
+        super().__init__()
+        self.proyeccion_repo = ProyeccionObjetivoRepository()
+
+    def recalcular_todas(self) -> int:
+        """Job batch: recalcula las proyecciones de todos los objetivos activos"""
+        return self.recalcular_objetivos()
+
+    def recalcular_objetivos(self, objetivo_ids: Optional[List[int]] = None) -> int:
+        """
+        Recalcula y cachea las proyecciones: una consulta agregada para
+        todos los objetivos y un único upsert por lotes
+        """
+        hoy = date.today()
+        desde = hoy - timedelta(days=self.VENTANA_DIAS)
+        calculado_at = datetime.now()
+
+        estadisticas = self.proyeccion_repo.get_estadisticas_ahorro(desde, objetivo_ids)
+        proyecciones = [
+            self._calcular_proyeccion(row, hoy, desde, calculado_at)
+            for row in estadisticas
+        ]
+        self.proyeccion_repo.guardar_lote(proyecciones)
+
+        logger.info(f"Recalculated {len(proyecciones)} goal projections")
+        return len(proyecciones)
+
+    def _calcular_proyeccion(self, stats: Dict[str, Any], hoy: date, desde: date,
+                             calculado_at: datetime) -> ProyeccionObjetivo:
+        """Calcula velocidad, fecha proyectada y aporte mensual requerido de un objetivo"""
+        meta_total = Decimal(str(stats['meta_total']))
+        ahorro_actual = Decimal(str(stats['ahorro_actual'] or 0))
+        restante = max(Decimal('0.00'), meta_total - ahorro_actual)
+        completado = restante == 0
+        fecha_limite = stats.get('fecha_limite')
+
+        # Días observados: desde el inicio de la ventana o la creación del objetivo
+        creado = stats.get('objetivo_created_at')
+        inicio = max(desde, creado.date()) if creado else desde
+        dias_observados = max((hoy - inicio).days, self.DIAS_MINIMOS_OBSERVACION)
+
+        neto_ventana = Decimal(str(stats['neto_ventana'] or 0))
+        velocidad_diaria = neto_ventana / dias_observados
+
+        fecha_proyectada = None
+        if completado:
+            fecha_proyectada = hoy
+        elif velocidad_diaria > 0:
+            dias_restantes = math.ceil(restante / velocidad_diaria)
+            if dias_restantes <= self.MAX_DIAS_PROYECCION:
+                fecha_proyectada = hoy + timedelta(days=dias_restantes)
+
+        aporte_mensual_requerido = None
+        en_camino = None
+        if fecha_limite:
+            if completado:
+                aporte_mensual_requerido = Decimal('0.00')
+                en_camino = True
+            else:
+                # Con la fecha límite vencida o a menos de un mes, se requiere todo ya
+                meses = max(Decimal((fecha_limite - hoy).days) / self.DIAS_POR_MES, Decimal('1'))
+                aporte_mensual_requerido = (restante / meses).quantize(Decimal('0.01'))
+                en_camino = fecha_proyectada is not None and fecha_proyectada <= fecha_limite
+
+        return ProyeccionObjetivo(
+            objetivo_id=stats['objetivo_id'],
+            velocidad_diaria=velocidad_diaria.quantize(Decimal('0.0001')),
+            velocidad_mensual=(velocidad_diaria * self.DIAS_POR_MES).quantize(Decimal('0.01')),
+            fecha_proyectada=fecha_proyectada,
+            aporte_mensual_requerido=aporte_mensual_requerido,
+            en_camino=en_camino,
+            completado=completado,
+            total_movimientos=int(stats['total_movimientos'] or 0),
+            calculado_at=calculado_at
+        )
+
+
 class ObjetivoService(BaseFinancialService):
     """Servicio para manejo de objetivos financieros"""
     
@@ -665,6 +776,14 @@ class ObjetivoService(BaseFinancialService):
         self.objetivo_repo = ObjetivoRepository()
         self.movimiento_repo = ObjetivoMovimientoRepository()
         self.racha_repo = RachaUsuarioRepository()
+        self.proyeccion_service = ProyeccionObjetivoService()
+
+    def _refrescar_proyeccion(self, objetivo_id: int):
+        """Recalcula la proyección cacheada de un objetivo tras un cambio"""
+        try:
+            self.proyeccion_service.recalcular_objetivos([objetivo_id])
+        except Exception as e:
+            logger.warning(f"Error refreshing projection for goal {objetivo_id}: {str(e)}")
     
     def get_objetivos_usuario(self, user_id: int) -> List[Objetivo]:
         """Obtiene todos los objetivos del usuario"""
@@ -748,6 +867,8 @@ class ObjetivoService(BaseFinancialService):
         
         objetivo_id = self.objetivo_repo.create(objetivo)
         objetivo.id = objetivo_id
+        self._refrescar_proyeccion(objetivo_id)
+        notify_financial_change(user_id)
 
         # Actualizar rachas al crear objetivo
         try:
@@ -760,35 +881,14 @@ class ObjetivoService(BaseFinancialService):
         return objetivo
     
     def agregar_dinero_objetivo(self, user_id: int, objetivo_id: int,
-                              monto: Decimal, descripcion: str = "") -> Objetivo:
+                              monto: Decimal, descripcion: str = "") -> Dict[str, Any]:
         """Agrega dinero a un objetivo"""
         audit_log(f"Adding money to goal {objetivo_id} for user {user_id}")
 
-        # Obtener objetivo
-        objetivo = self.objetivo_repo.find_by_id(objetivo_id)
-        if not objetivo:
-            raise BusinessLogicError("Goal not found")
-
-        self._validate_user_ownership(objetivo, user_id)
-
         if monto <= 0:
             raise BusinessLogicError("Amount must be positive")
 
-        # Actualizar objetivo
-        nuevo_ahorro = objetivo.ahorro_actual + monto
-        self.objetivo_repo.actualizar_ahorro(objetivo_id, nuevo_ahorro)
-
-        # Crear movimiento
-        movimiento = ObjetivoMovimiento(
-            objetivo_id=objetivo_id,
-            monto=monto,
-            es_aporte=True,
-            descripcion=descripcion
-        )
-        self.movimiento_repo.create(movimiento)
-
-        # Actualizar objeto en memoria
-        objetivo.ahorro_actual = nuevo_ahorro
+        resultado = self._registrar_movimiento(user_id, objetivo_id, monto, True, descripcion)
 
         # Actualizar rachas al agregar dinero al objetivo
         try:
@@ -798,10 +898,48 @@ class ObjetivoService(BaseFinancialService):
             logger.warning(f"Error updating streaks after adding money to goal: {str(e)}")
 
         logger.info(f"Added {monto} to goal {objetivo_id}")
-        return objetivo
+        return resultado
 
-    def get_historial_movimientos_objetivo(self, user_id: int, objetivo_id: int) -> List[Dict[str, Any]]:
-        """Obtiene el historial de movimientos de un objetivo específico"""
+    def _registrar_movimiento(self, user_id: int, objetivo_id: int, monto: Decimal,
+                              es_aporte: bool, descripcion: str) -> Dict[str, Any]:
+        """Aplica el movimiento de forma atómica y retorna el nuevo estado del objetivo"""
+        aplicado = self.objetivo_repo.registrar_movimiento(
+            objetivo_id, user_id, monto, es_aporte, descripcion
+        )
+
+        if not aplicado:
+            # Solo en el camino de error se lee el objetivo para explicar el rechazo
+            objetivo = self.objetivo_repo.find_by_id(objetivo_id)
+            if not objetivo or not objetivo.es_activo:
+                raise BusinessLogicError("Goal not found")
+            self._validate_user_ownership(objetivo, user_id)
+            raise BusinessLogicError("Insufficient funds in goal")
+
+        nuevo_ahorro, movimiento_id = aplicado
+        self._refrescar_proyeccion(objetivo_id)
+        notify_financial_change(user_id)
+
+        return {
+            'id': objetivo_id,
+            'ahorroActual': float(nuevo_ahorro),
+            'movimiento': {
+                'id': movimiento_id,
+                'monto': float(monto),
+                'esAporte': es_aporte,
+                'descripcion': descripcion
+            }
+        }
+
+    HISTORIAL_LIMITE_DEFAULT = 50
+    HISTORIAL_LIMITE_MAXIMO = 200
+
+    def get_historial_movimientos_objetivo(self, user_id: int, objetivo_id: int,
+                                           limit: int = HISTORIAL_LIMITE_DEFAULT,
+                                           cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Obtiene una página del historial de movimientos de un objetivo con saldo
+        acumulado. La primera página (sin cursor) incluye el resumen mensual
+        """
         audit_log(f"Getting goal movement history for goal {objetivo_id} and user {user_id}")
 
         # Verificar que el objetivo existe y pertenece al usuario
@@ -811,63 +949,90 @@ class ObjetivoService(BaseFinancialService):
 
         self._validate_user_ownership(objetivo, user_id)
 
-        # Obtener movimientos
-        movimientos = self.movimiento_repo.find_by_objetivo(objetivo_id)
+        limit = max(1, min(int(limit), self.HISTORIAL_LIMITE_MAXIMO))
+        posicion = self._decodificar_cursor(cursor) if cursor else None
+
+        # Se pide un registro extra para saber si hay más páginas
+        filas = self.movimiento_repo.find_page_con_saldo(objetivo_id, limit + 1, posicion)
+        tiene_mas = len(filas) > limit
+        filas = filas[:limit]
 
         # Formatear para el frontend
         historial = []
-        for movimiento in movimientos:
+        for fila in filas:
+            es_aporte = bool(fila['es_aporte'])
             historial.append({
-                'id': movimiento.id,
-                'monto': float(movimiento.monto),
-                'es_aporte': movimiento.es_aporte,
-                'tipo': 'aporte' if movimiento.es_aporte else 'retiro',
-                'descripcion': movimiento.descripcion or ('Aporte' if movimiento.es_aporte else 'Retiro'),
-                'fecha': movimiento.created_at.isoformat() if movimiento.created_at else datetime.now().isoformat()
+                'id': fila['id'],
+                'monto': float(fila['monto']),
+                'es_aporte': es_aporte,
+                'tipo': 'aporte' if es_aporte else 'retiro',
+                'descripcion': fila['descripcion'] or ('Aporte' if es_aporte else 'Retiro'),
+                'fecha': fila['created_at'].isoformat() if fila['created_at'] else datetime.now().isoformat(),
+                'saldo_acumulado': float(fila['saldo_acumulado'] or 0)
             })
 
-        # Ordenar por fecha descendente (más recientes primero)
-        historial.sort(key=lambda x: x['fecha'], reverse=True)
+        siguiente_cursor = None
+        if tiene_mas and filas:
+            siguiente_cursor = self._codificar_cursor(filas[-1]['created_at'], filas[-1]['id'])
+
+        resultado = {
+            'movimientos': historial,
+            'siguiente_cursor': siguiente_cursor,
+            'tiene_mas': tiene_mas
+        }
+        if not cursor:
+            resultado['resumen'] = self._get_resumen_movimientos(objetivo_id)
 
         logger.info(f"Found {len(historial)} movements for goal {objetivo_id}")
-        return historial
-    
+        return resultado
+
+    def _get_resumen_movimientos(self, objetivo_id: int) -> Dict[str, Any]:
+        """Resumen mensual y totales del historial de un objetivo"""
+        meses = [
+            {
+                'mes': fila['mes'],
+                'total_aportes': float(fila['total_aportes'] or 0),
+                'total_retiros': float(fila['total_retiros'] or 0),
+                'cantidad_aportes': int(fila['cantidad_aportes'] or 0),
+                'cantidad_retiros': int(fila['cantidad_retiros'] or 0),
+                'saldo_cierre': float(fila['saldo_cierre'] or 0)
+            }
+            for fila in self.movimiento_repo.get_resumen_mensual(objetivo_id)
+        ]
+        return {
+            'mensual': meses,
+            'total_aportes': sum(m['total_aportes'] for m in meses),
+            'total_retiros': sum(m['total_retiros'] for m in meses),
+            'cantidad_aportes': sum(m['cantidad_aportes'] for m in meses),
+            'cantidad_retiros': sum(m['cantidad_retiros'] for m in meses)
+        }
+
+    @staticmethod
+    def _codificar_cursor(fecha: datetime, movimiento_id: int) -> str:
+        """Cursor opaco con la posición (created_at, id) del último movimiento entregado"""
+        valor = f"{fecha.isoformat()}|{movimiento_id}"
+        return base64.urlsafe_b64encode(valor.encode()).decode()
+
+    @staticmethod
+    def _decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            fecha, movimiento_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return datetime.fromisoformat(fecha), int(movimiento_id)
+        except (ValueError, UnicodeDecodeError):
+            raise BusinessLogicError("Invalid cursor")
+
     def retirar_dinero_objetivo(self, user_id: int, objetivo_id: int, 
-                              monto: Decimal, descripcion: str = "") -> Objetivo:
+                              monto: Decimal, descripcion: str = "") -> Dict[str, Any]:
         """Retira dinero de un objetivo"""
         audit_log(f"Withdrawing money from goal {objetivo_id} for user {user_id}")
         
-        # Obtener objetivo
-        objetivo = self.objetivo_repo.find_by_id(objetivo_id)
-        if not objetivo:
-            raise BusinessLogicError("Goal not found")
-        
-        self._validate_user_ownership(objetivo, user_id)
-        
         if monto <= 0:
             raise BusinessLogicError("Amount must be positive")
         
-        if monto > objetivo.ahorro_actual:
-            raise BusinessLogicError("Insufficient funds in goal")
-        
-        # Actualizar objetivo
-        nuevo_ahorro = objetivo.ahorro_actual - monto
-        self.objetivo_repo.actualizar_ahorro(objetivo_id, nuevo_ahorro)
-        
-        # Crear movimiento
-        movimiento = ObjetivoMovimiento(
-            objetivo_id=objetivo_id,
-            monto=monto,
-            es_aporte=False,
-            descripcion=descripcion
-        )
-        self.movimiento_repo.create(movimiento)
-        
-        # Actualizar objeto en memoria
-        objetivo.ahorro_actual = nuevo_ahorro
+        resultado = self._registrar_movimiento(user_id, objetivo_id, monto, False, descripcion)
         
         logger.info(f"Withdrew {monto} from goal {objetivo_id}")
-        return objetivo
+        return resultado
 
     def get_objetivo_by_id(self, objetivo_id: int, user_id: int) -> Optional[Objetivo]:
         """Obtiene un objetivo específico verificando que pertenezca al usuario"""
@@ -891,6 +1056,7 @@ class ObjetivoService(BaseFinancialService):
         success = self.objetivo_repo.delete(objetivo_id)
 
         if success:
+            notify_financial_change(user_id)
             logger.info(f"Deleted goal {objetivo_id} for user {user_id}")
         else:
             logger.error(f"Failed to delete goal {objetivo_id} for user {user_id}")
@@ -1048,7 +1214,8 @@ class DashboardService(BaseFinancialService):
                     'actual': float(objetivos.get('totalAhorrado', 0)) if objetivos else 0,
                     'meta': float(objetivos.get('totalMetas', 100000)) if objetivos else 100000,
                     'nombre': objetivo_principal.get('nombre', 'Meta de ahorro') if objetivo_principal else 'Meta de ahorro',
-                    'progreso': int(float(objetivos.get('progresoGeneral', 0))) if objetivos else 0
+                    'progreso': int(float(objetivos.get('progresoGeneral', 0))) if objetivos else 0,
+                    'proyeccion': objetivo_principal.get('proyeccion') if objetivo_principal else None
                 },
                 'ingresos': {
                     'total': float(resumen['totales']['ingresos']),
@@ -1097,7 +1264,8 @@ class DashboardService(BaseFinancialService):
             return {
                 'nombre': mejor_objetivo.nombre,
                 'id': mejor_objetivo.id,
-                'progreso': mejor_progreso
+                'progreso': mejor_progreso,
+                'proyeccion': mejor_objetivo.proyeccion.to_dict() if mejor_objetivo.proyeccion else None
             } if mejor_objetivo else None
 
         except Exception as e:
@@ -1311,6 +1479,7 @@ class FacturaService(BaseFinancialService):
                 raise ValueError("Amount must be greater than 0")
             
             factura = self.factura_repo.create(factura)
+            notify_financial_change(user_id)
             audit_log(f"Created bill {factura.id} for user {user_id}")
             # Obtenemos los datos completos para devolver al frontend
             factura.tipo_factura = TipoFacturaRepository().find_by_id(factura.tipo_factura_id)
@@ -1332,6 +1501,7 @@ class FacturaService(BaseFinancialService):
             
             factura.marcar_como_pagada()
             self.factura_repo.update(factura)
+            notify_financial_change(user_id)
             audit_log(f"Marked bill {factura_id} as paid for user {user_id}")
             return True
             
@@ -1392,6 +1562,7 @@ class FacturaService(BaseFinancialService):
             success = self.factura_repo.delete(factura_id)
 
             if success:
+                notify_financial_change(user_id)
                 logger.info(f"Deleted bill {factura_id} for user {user_id}")
             else:
                 logger.error(f"Failed to delete bill {factura_id} for user {user_id}")
@@ -1423,5 +1594,6 @@ categoria_service = CategoriaService()
 ingreso_service = IngresoService()
 gasto_service = GastoService()
 objetivo_service = ObjetivoService()
+proyeccion_service = ProyeccionObjetivoService()
 dashboard_service = DashboardService()
 factura_service = FacturaService()
\ No newline at end of file
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Script para probar el despachador del chatbot con el backend local (fake):
+streaming, límite por usuario, rechazo por capacidad y una carga simple
+"""
+
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.chat_service import ChatDispatcher, FakeChatClient, ChatCapacityError
+
+
+def test_streaming():
+    print("PRUEBA 1: los fragmentos llegan antes de que termine la respuesta")
+    dispatcher = ChatDispatcher(FakeChatClient(latency=0.05, token_delay=0.05), max_workers=2, max_queue=2)
+
+    inicio = time.monotonic()
+    fragmentos = dispatcher.stream(1, "hola", [])
+    primero = next(fragmentos)
+    primer_fragmento = time.monotonic() - inicio
+    resto = list(fragmentos)
+    total = time.monotonic() - inicio
+
+    print(f"Primer fragmento: {primer_fragmento * 1000:.0f} ms | Respuesta completa: {total * 1000:.0f} ms")
+    print(f"Respuesta: {primero + ''.join(resto)}")
+    dispatcher.shutdown()
+    return primer_fragmento < total / 2
+
+
+def test_limite_por_usuario():
+    print("PRUEBA 2: un usuario no puede tener dos consultas simultáneas")
+    dispatcher = ChatDispatcher(FakeChatClient(latency=0.3, token_delay=0), max_workers=2, max_queue=2, max_per_user=1)
+
+    primera = dispatcher.stream(1, "uno", [])
+    try:
+        dispatcher.stream(1, "dos", [])
+        rechazada = False
+    except ChatCapacityError:
+        rechazada = True
+    list(primera)
+
+    # Terminada la primera, el usuario puede volver a preguntar
+    segunda = "".join(dispatcher.stream(1, "tres", []))
+    print(f"Segunda consulta rechazada: {rechazada} | Consulta posterior: {bool(segunda)}")
+    dispatcher.shutdown()
+    return rechazada and bool(segunda)
+
+
+def test_rechazo_por_capacidad():
+    print("PRUEBA 3: por encima de workers + cola se rechaza de inmediato")
+    dispatcher = ChatDispatcher(FakeChatClient(latency=0.3, token_delay=0), max_workers=2, max_queue=1)
+
+    streams = [dispatcher.stream(user_id, "hola", []) for user_id in range(3)]
+    inicio = time.monotonic()
+    try:
+        dispatcher.stream(99, "hola", [])
+        rechazada = False
+    except ChatCapacityError:
+        rechazada = True
+    espera = time.monotonic() - inicio
+    for stream in streams:
+        list(stream)
+
+    print(f"Rechazada: {rechazada} en {espera * 1000:.1f} ms | Stats: {dispatcher.get_stats()}")
+    dispatcher.shutdown()
+    return rechazada and espera < 0.05
+
+
+def benchmark_carga(usuarios=40, workers=8, cola=32):
+    print(f"BENCHMARK: {usuarios} usuarios concurrentes, {workers} workers, cola {cola}")
+    dispatcher = ChatDispatcher(FakeChatClient(latency=0.2, token_delay=0.01), max_workers=workers, max_queue=cola)
+
+    def consulta(user_id):
+        inicio = time.monotonic()
+        try:
+            "".join(dispatcher.stream(user_id, "¿cómo ahorro más?", []))
+            return time.monotonic() - inicio
+        except ChatCapacityError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=usuarios) as pool:
+        tiempos = list(pool.map(consulta, range(usuarios)))
+
+    completadas = sorted(t for t in tiempos if t is not None)
+    if completadas:
+        p50 = completadas[len(completadas) // 2]
+        p95 = completadas[int(len(completadas) * 0.95) - 1]
+        print(f"Completadas: {len(completadas)} | Rechazadas: {tiempos.count(None)}")
+        print(f"p50: {p50 * 1000:.0f} ms | p95: {p95 * 1000:.0f} ms")
+    dispatcher.shutdown()
+    return True
+
+
+if __name__ == "__main__":
+    print("Script de Prueba - Chat en streaming")
+    print("=" * 60)
+
+    try:
+        resultados = [
+            test_streaming(),
+            test_limite_por_usuario(),
+            test_rechazo_por_capacidad(),
+            benchmark_carga()
+        ]
+        if all(resultados):
+            print("✅ Pruebas completadas exitosamente!")
+        else:
+            print("❌ Algunas pruebas fallaron!")
+            sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error ejecutando pruebas: {e}")
+        sys.exit(1)
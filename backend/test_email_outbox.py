@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Script para probar la bandeja de salida de emails contra un servidor SMTP
+local de prueba: entrega de todos los mensajes, reutilización de la
+conexión y reintento con backoff cuando el servidor rechaza un envío
+"""
+
+import sys
+import os
+import socketserver
+import threading
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.email_outbox import EmailOutbox, SMTPTransport
+
+EMAILS = 25
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Subconjunto mínimo de SMTP (sin TLS ni autenticación)"""
+
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self._reply("220 localhost SMTP de prueba")
+        recipient = None
+        while True:
+            line = self.rfile.readline().decode(errors='replace').strip()
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command in ('EHLO', 'HELO'):
+                self._reply("250 localhost")
+            elif command == 'MAIL':
+                self._reply("250 OK")
+            elif command == 'RCPT':
+                recipient = line.split(':', 1)[1].strip('<> ')
+                with server.lock:
+                    rechazar = recipient in server.reject_once
+                    server.reject_once.discard(recipient)
+                self._reply("451 Intente más tarde" if rechazar else "250 OK")
+            elif command == 'DATA':
+                self._reply("354 Fin con <CRLF>.<CRLF>")
+                while self.rfile.readline().rstrip(b"\r\n") != b".":
+                    pass
+                with server.lock:
+                    server.delivered.append(recipient)
+                self._reply("250 OK")
+            elif command in ('RSET', 'NOOP'):
+                self._reply("250 OK")
+            elif command == 'QUIT':
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 No implementado")
+
+
+class SMTPDePrueba(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.delivered = []
+        self.reject_once = set()
+
+
+class RepositorioEnMemoria:
+    """Misma interfaz que EmailOutboxRepository, sin base de datos"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.emails = {}
+
+    def encolar(self, destinatario, asunto, texto, html=None):
+        with self.lock:
+            email_id = len(self.emails) + 1
+            self.emails[email_id] = {
+                'id': email_id, 'recipient': destinatario, 'subject': asunto,
+                'body_text': texto, 'body_html': html, 'attempts': 0,
+                'status': 'pending', 'next_attempt_at': 0.0
+            }
+            return email_id
+
+    def reclamar_lote(self, limite, lease_segundos):
+        ahora = time.monotonic()
+        with self.lock:
+            lote = [e for e in self.emails.values()
+                    if e['status'] in ('pending', 'sending') and e['next_attempt_at'] <= ahora][:limite]
+            for email in lote:
+                email['status'] = 'sending'
+                email['next_attempt_at'] = ahora + lease_segundos
+            return [dict(email) for email in lote]
+
+    def marcar_enviados(self, ids):
+        with self.lock:
+            for email_id in ids:
+                self.emails[email_id]['status'] = 'sent'
+                self.emails[email_id]['attempts'] += 1
+
+    def marcar_fallido(self, email_id, error, reintentar_en):
+        with self.lock:
+            email = self.emails[email_id]
+            email['attempts'] += 1
+            if reintentar_en is None:
+                email['status'] = 'failed'
+            else:
+                email['status'] = 'pending'
+                email['next_attempt_at'] = time.monotonic() + reintentar_en / 1000  # backoff acelerado
+
+
+def test_envio_y_reintento():
+    print("PRUEBA: entrega por lotes, conexión reutilizada y reintento")
+    servidor = SMTPDePrueba()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    port = servidor.server_address[1]
+    servidor.reject_once.add('usuario3@example.com')
+
+    repositorio = RepositorioEnMemoria()
+    outbox = EmailOutbox(
+        repository=repositorio,
+        transport_factory=lambda: SMTPTransport('127.0.0.1', [(port, 'none')]),
+        sender='no-reply@example.com', workers=2, batch_size=10,
+        poll_interval=0.05, backoff_seconds=30
+    )
+
+    inicio = time.perf_counter()
+    for i in range(EMAILS):
+        outbox.enqueue(f'usuario{i}@example.com', 'Código', f'Tu código es {i:06d}', '<b>código</b>')
+    encolado_ms = (time.perf_counter() - inicio) * 1000
+
+    limite = time.monotonic() + 10
+    while time.monotonic() < limite:
+        if all(e['status'] == 'sent' for e in repositorio.emails.values()):
+            break
+        time.sleep(0.05)
+    outbox.shutdown()
+    servidor.shutdown()
+
+    stats = outbox.get_stats()
+    print(f"   encolado: {encolado_ms:.1f} ms para {EMAILS} emails")
+    print(f"   entregados={len(servidor.delivered)} conexiones={servidor.connections} stats={stats}")
+
+    if sorted(set(servidor.delivered)) != sorted(f'usuario{i}@example.com' for i in range(EMAILS)):
+        print("❌ No se entregaron todos los emails")
+        return False
+    if repositorio.emails[4]['attempts'] != 2 or stats['retried'] != 1:
+        print("❌ El email rechazado no se reintentó una vez")
+        return False
+    # Una conexión por worker: el rechazo de un destinatario no reconecta
+    if servidor.connections > outbox.workers:
+        print("❌ No se reutilizaron las conexiones SMTP")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    print("Pruebas - Bandeja de salida de emails")
+    print("=" * 60)
+
+    try:
+        if test_envio_y_reintento():
+            print("✅ Pruebas completadas exitosamente!")
+        else:
+            print("❌ Algunas pruebas fallaron!")
+            sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error ejecutando pruebas: {e}")
+        sys.exit(1)
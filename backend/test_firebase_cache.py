@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Script para probar la verificación de tokens de Firebase con un verificador
+falso: caché de claims hasta la expiración y renovación anticipada de las
+claves públicas sin descargas en el camino de la request
+"""
+
+import sys
+import os
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.firebase import FirebaseAuth, GoogleKeyStore, InvalidFirebaseToken
+
+
+class VerificadorFalso:
+    """Acepta tokens 'valido-<uid>' y cuenta las verificaciones reales"""
+
+    def __init__(self, vida_segundos=3600):
+        self.llamadas = 0
+        self.vida_segundos = vida_segundos
+
+    def verify(self, token):
+        self.llamadas += 1
+        if not token.startswith('valido-'):
+            raise InvalidFirebaseToken("Token falso rechazado")
+        uid = token[len('valido-'):]
+        return {'uid': uid, 'sub': uid, 'email': f'{uid}@example.com',
+                'exp': time.time() + self.vida_segundos}
+
+
+def test_cache_de_claims():
+    print("PRUEBA: claims en caché hasta la expiración")
+    firebase = FirebaseAuth(service_account_path='/no/existe.json')
+    verificador = VerificadorFalso()
+    firebase.set_verifier(verificador)
+
+    for _ in range(50):
+        claims = firebase.verify('valido-ana')
+    if claims['email'] != 'ana@example.com' or verificador.llamadas != 1:
+        print(f"❌ Se esperaba 1 verificación real, hubo {verificador.llamadas}")
+        return False
+
+    try:
+        firebase.verify('falso')
+        print("❌ Se aceptó un token inválido")
+        return False
+    except InvalidFirebaseToken:
+        pass
+
+    # Un token ya expirado no se guarda en caché
+    expirado = VerificadorFalso(vida_segundos=-1)
+    firebase.set_verifier(expirado)
+    firebase.verify('valido-beto')
+    firebase.verify('valido-beto')
+    if expirado.llamadas != 2:
+        print("❌ Se reutilizaron claims de un token expirado")
+        return False
+    print(f"   stats={firebase.get_stats()}")
+    return True
+
+
+def test_renovacion_de_claves():
+    print("PRUEBA: precarga y renovación anticipada de claves públicas")
+    descargas = []
+
+    def fetcher():
+        descargas.append(time.time())
+        return {f'kid{len(descargas)}': 'PEM'}, 3600
+
+    claves = GoogleKeyStore(fetcher=fetcher, key_loader=lambda pem: object(), refresh_margin=600)
+    claves.refresh_if_stale()  # precarga al iniciar
+    if claves.get('kid1') is None or len(descargas) != 1:
+        print("❌ La precarga no dejó la clave disponible")
+        return False
+    claves.refresh_if_stale()  # todavía fresca: sin descarga
+    if len(descargas) != 1:
+        print("❌ Se descargaron claves todavía vigentes")
+        return False
+
+    # Entrando en el margen de vencimiento el trabajo periódico renueva
+    claves._expires_at = time.time() + 300
+    claves.refresh_if_stale()
+    if len(descargas) != 2 or claves.get('kid2') is None:
+        print("❌ No se renovaron las claves antes de vencer")
+        return False
+
+    # Un kid desconocido recién descargado no provoca otra descarga
+    if claves.get('kid-desconocido') is not None or len(descargas) != 2:
+        print("❌ Un kid desconocido forzó descargas repetidas")
+        return False
+    print(f"   stats={claves.get_stats()}")
+    return True
+
+
+if __name__ == "__main__":
+    print("Pruebas - Verificación de tokens de Firebase")
+    print("=" * 60)
+
+    try:
+        if test_cache_de_claims() and test_renovacion_de_claves():
+            print("✅ Pruebas completadas exitosamente!")
+        else:
+            print("❌ Algunas pruebas fallaron!")
+            sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error ejecutando pruebas: {e}")
+        sys.exit(1)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Script para probar que los aportes y retiros concurrentes a un objetivo
+no pierden actualizaciones ni dejan el saldo en negativo
+"""
+
+import sys
+import os
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.financial_service import ObjetivoService, BusinessLogicError
+from utils.database import get_db
+
+HILOS = 8
+OPERACIONES_POR_HILO = 25
+MONTO = Decimal('10.00')
+
+
+def _crear_objetivo_de_prueba(db, user_id):
+    objetivo_id = db.execute_query("""
+        INSERT INTO objetivos (user_id, nombre, meta_total, prioridad_id, descripcion)
+        VALUES (%s, 'Prueba concurrencia', 1000000.00, 3, 'Objetivo temporal de prueba')
+    """, (user_id,))
+    return objetivo_id
+
+
+def _contar_movimientos(db, objetivo_id):
+    fila = db.fetch_one("""
+        SELECT
+            SUM(CASE WHEN es_aporte = 1 THEN 1 ELSE 0 END) AS aportes,
+            SUM(CASE WHEN es_aporte = 0 THEN 1 ELSE 0 END) AS retiros
+        FROM objetivos_movimientos
+        WHERE objetivo_id = %s
+    """, (objetivo_id,))
+    return int(fila['aportes'] or 0), int(fila['retiros'] or 0)
+
+
+def _probar_aportes_concurrentes(service, db, user_id, objetivo_id):
+    print(f"PRUEBA 1: {HILOS} hilos x {OPERACIONES_POR_HILO} aportes de ${MONTO}")
+
+    def aportar(_):
+        for _ in range(OPERACIONES_POR_HILO):
+            service.agregar_dinero_objetivo(user_id, objetivo_id, MONTO, 'concurrencia')
+
+    with ThreadPoolExecutor(max_workers=HILOS) as pool:
+        list(pool.map(aportar, range(HILOS)))
+
+    esperado = MONTO * HILOS * OPERACIONES_POR_HILO
+    fila = db.fetch_one("SELECT ahorro_actual FROM objetivos WHERE id = %s", (objetivo_id,))
+    aportes, _ = _contar_movimientos(db, objetivo_id)
+
+    print(f"Saldo esperado: {esperado} | Saldo final: {fila['ahorro_actual']}")
+    print(f"Movimientos esperados: {HILOS * OPERACIONES_POR_HILO} | Registrados: {aportes}")
+    return Decimal(fila['ahorro_actual']) == esperado and aportes == HILOS * OPERACIONES_POR_HILO
+
+
+def _probar_retiros_concurrentes(service, db, user_id, objetivo_id):
+    print("PRUEBA 2: retiros concurrentes que superan el saldo disponible")
+
+    saldo_inicial = Decimal(db.fetch_one(
+        "SELECT ahorro_actual FROM objetivos WHERE id = %s", (objetivo_id,)
+    )['ahorro_actual'])
+    intentos = int(saldo_inicial / MONTO) + HILOS * 5
+    rechazados = []
+
+    def retirar(_):
+        try:
+            service.retirar_dinero_objetivo(user_id, objetivo_id, MONTO, 'concurrencia')
+            return True
+        except BusinessLogicError:
+            rechazados.append(1)
+            return False
+
+    with ThreadPoolExecutor(max_workers=HILOS) as pool:
+        aplicados = sum(pool.map(retirar, range(intentos)))
+
+    fila = db.fetch_one("SELECT ahorro_actual FROM objetivos WHERE id = %s", (objetivo_id,))
+    _, retiros = _contar_movimientos(db, objetivo_id)
+
+    print(f"Intentos: {intentos} | Aplicados: {aplicados} | Rechazados: {len(rechazados)}")
+    print(f"Saldo final: {fila['ahorro_actual']} | Retiros registrados: {retiros}")
+    return (
+        Decimal(fila['ahorro_actual']) == saldo_inicial - MONTO * aplicados
+        and Decimal(fila['ahorro_actual']) >= 0
+        and retiros == aplicados
+    )
+
+
+def main():
+    db = get_db()
+    usuario = db.fetch_one('SELECT id FROM users WHERE id_rol = 4 LIMIT 1')
+    if not usuario:
+        print("ERROR: No hay usuarios en la base de datos para probar")
+        return False
+
+    user_id = usuario['id']
+    objetivo_id = _crear_objetivo_de_prueba(db, user_id)
+    print(f"Objetivo temporal {objetivo_id} para el usuario {user_id}")
+    print()
+
+    service = ObjetivoService()
+    try:
+        ok_aportes = _probar_aportes_concurrentes(service, db, user_id, objetivo_id)
+        print("✅ Sin actualizaciones perdidas" if ok_aportes else "❌ Se perdieron actualizaciones")
+        print()
+        ok_retiros = _probar_retiros_concurrentes(service, db, user_id, objetivo_id)
+        print("✅ Retiros consistentes" if ok_retiros else "❌ Retiros inconsistentes")
+        return ok_aportes and ok_retiros
+    finally:
+        db.execute_query("DELETE FROM objetivos_movimientos WHERE objetivo_id = %s", (objetivo_id,))
+        db.execute_query("DELETE FROM objetivos WHERE id = %s", (objetivo_id,))
+
+
+if __name__ == "__main__":
+    print("Script de Prueba - Concurrencia en Objetivos")
+    print("=" * 60)
+
+    try:
+        if main():
+            print("✅ Pruebas completadas exitosamente!")
+        else:
+            print("❌ Algunas pruebas fallaron!")
+            sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error ejecutando pruebas: {e}")
+        sys.exit(1)
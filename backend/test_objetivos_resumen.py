@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Script para probar el resumen mensual del historial de un objetivo:
+un movimiento por mes debe dar una fila por mes con su saldo al cierre
+"""
+
+import sys
+import os
+from decimal import Decimal
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from models.financial_repository import ObjetivoMovimientoRepository
+from utils.database import get_db
+
+MOVIMIENTOS = [
+    # (created_at, monto, es_aporte)
+    ('2024-01-10 09:00:00', Decimal('100.00'), 1),
+    ('2024-01-20 09:00:00', Decimal('30.00'), 0),
+    ('2024-02-05 09:00:00', Decimal('50.00'), 1),
+    ('2024-03-15 09:00:00', Decimal('20.00'), 0),
+]
+ESPERADO = [
+    # (mes, total_aportes, total_retiros, saldo_cierre)
+    ('2024-01', Decimal('100.00'), Decimal('30.00'), Decimal('70.00')),
+    ('2024-02', Decimal('50.00'), Decimal('0.00'), Decimal('120.00')),
+    ('2024-03', Decimal('0.00'), Decimal('20.00'), Decimal('100.00')),
+]
+
+
+def test_sql_formato_mes():
+    print("PRUEBA 1: el formato de mes llega a MySQL como '%Y-%m'")
+    # mysql-connector solo sustituye %s: un '%%' llegaría literal a DATE_FORMAT
+    repo = ObjetivoMovimientoRepository()
+    consultas = []
+    repo.execute_query = lambda query, params=None: consultas.append(query) or []
+    repo.get_resumen_mensual(1)
+    query = consultas[0]
+    return '%%' not in query and query.count("'%Y-%m'") == 3
+
+
+def _probar_resumen_mensual(db, user_id):
+    print("PRUEBA 2: una fila por mes contra la base de datos")
+    objetivo_id = db.execute_query("""
+        INSERT INTO objetivos (user_id, nombre, meta_total, prioridad_id, descripcion)
+        VALUES (%s, 'Prueba resumen', 1000.00, 3, 'Objetivo temporal de prueba')
+    """, (user_id,))
+    try:
+        for created_at, monto, es_aporte in MOVIMIENTOS:
+            db.execute_query("""
+                INSERT INTO objetivos_movimientos (objetivo_id, monto, es_aporte, descripcion, created_at)
+                VALUES (%s, %s, %s, 'resumen', %s)
+            """, (objetivo_id, monto, es_aporte, created_at))
+
+        filas = ObjetivoMovimientoRepository().get_resumen_mensual(objetivo_id)
+        obtenido = [
+            (fila['mes'], Decimal(fila['total_aportes']), Decimal(fila['total_retiros']),
+             Decimal(fila['saldo_cierre']))
+            for fila in filas
+        ]
+        for fila in obtenido:
+            print(f"  {fila[0]}: aportes {fila[1]} | retiros {fila[2]} | saldo {fila[3]}")
+        return obtenido == ESPERADO
+    finally:
+        db.execute_query("DELETE FROM objetivos_movimientos WHERE objetivo_id = %s", (objetivo_id,))
+        db.execute_query("DELETE FROM objetivos WHERE id = %s", (objetivo_id,))
+
+
+def main():
+    ok_sql = test_sql_formato_mes()
+    print("✅ Formato de mes correcto" if ok_sql else "❌ El formato de mes llega escapado")
+    print()
+
+    db = get_db()
+    usuario = db.fetch_one('SELECT id FROM users WHERE id_rol = 4 LIMIT 1')
+    if not usuario:
+        print("ERROR: No hay usuarios en la base de datos para probar")
+        return False
+
+    ok_resumen = _probar_resumen_mensual(db, usuario['id'])
+    print("✅ Resumen mensual correcto" if ok_resumen else "❌ Resumen mensual incorrecto")
+    return ok_sql and ok_resumen
+
+
+if __name__ == "__main__":
+    print("Script de Prueba - Resumen mensual de objetivos")
+    print("=" * 60)
+
+    try:
+        if main():
+            print("✅ Pruebas completadas exitosamente!")
+        else:
+            print("❌ Algunas pruebas fallaron!")
+            sys.exit(1)
+    except Exception as e:
+        print(f"❌ Error ejecutando pruebas: {e}")
+        sys.exit(1)
@@ -30,6 +30,7 @@ from .auth import (
     verify_password,
     generate_jwt_token,
     decode_jwt_token,
+    verify_jwt_token,
     get_token_from_request
 )
 
@@ -55,6 +56,7 @@ __all__ = [
     'verify_password',
     'generate_jwt_token',
     'decode_jwt_token',
+    'verify_jwt_token',
     'get_token_from_request'
 ]
 
@@ -0,0 +1,196 @@
+"""
+Escritor asíncrono de auditoría
+Las requests solo encolan el evento (cola acotada, sin I/O); un hilo en
+segundo plano inserta los registros en audit_logs por lotes con executemany
+cada N ms o N filas, y vacía la cola al apagar la aplicación.
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+audit_logger = logging.getLogger('audit')
+
+
+class AuditEvent(NamedTuple):
+    """Evento de auditoría; persist=False solo se registra en el log"""
+    user_id: Optional[int]
+    action: Optional[str]
+    target_type: Optional[str]
+    target_id: Optional[int]
+    details: Optional[str]
+    message: Optional[str]
+    created_at: datetime
+    persist: bool
+
+
+def insert_audit_rows(rows: List[tuple]):
+    """Inserta un lote de filas en audit_logs en una sola llamada"""
+    from utils.database import db_manager
+    db_manager.execute_many("""
+        INSERT INTO audit_logs (user_id, action, target_type, target_id, details, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, rows)
+
+
+class AuditWriter:
+    """Cola acotada + hilo que escribe la auditoría por lotes"""
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 200,
+                 flush_interval_ms: int = 500,
+                 writer: Callable[[List[tuple]], Any] = insert_audit_rows):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.writer = writer
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'logged': 0,
+            'dropped': 0,
+            'failed': 0,
+            'batches': 0
+        }
+
+    def record(self, user_id: Optional[int], action: str, target_type: Optional[str] = None,
+               target_id: Optional[int] = None, details: Optional[Dict[str, Any]] = None) -> bool:
+        """Encola un registro para audit_logs. Retorna False si se descartó (cola llena)."""
+        details_json = json.dumps(details, default=str) if isinstance(details, dict) else None
+        return self._enqueue(AuditEvent(
+            user_id, action, target_type, target_id, details_json, None, datetime.now(), True
+        ))
+
+    def log(self, message: str, user_id: Optional[int] = None):
+        """Encola una línea de auditoría que solo va al log (sin fila en la base de datos)"""
+        return self._enqueue(AuditEvent(
+            user_id, None, None, None, None, message, datetime.now(), False
+        ))
+
+    def start(self):
+        """Iniciar el hilo escritor (idempotente)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def flush(self) -> int:
+        """Escribe de inmediato todo lo encolado; retorna las filas escritas"""
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Detiene el hilo y garantiza el vaciado de la cola"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        stats['capacity'] = self._queue.maxsize
+        stats['running'] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+    def _enqueue(self, event: AuditEvent) -> bool:
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            return False
+        with self._lock:
+            self._stats['enqueued'] += 1
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+    def _collect(self) -> List[AuditEvent]:
+        """Espera el primer evento y acumula hasta batch_size o flush_interval"""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self, limit: int) -> List[AuditEvent]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[AuditEvent]) -> int:
+        rows = []
+        logged = 0
+        for event in batch:
+            if event.persist:
+                rows.append((event.user_id, event.action, event.target_type,
+                             event.target_id, event.details, event.created_at))
+            else:
+                audit_logger.info(f"[AUDIT] {event.message}")
+                logged += 1
+
+        written = 0
+        if rows:
+            # Un solo escritor a la vez (hilo de fondo o flush al apagar)
+            with self._flush_lock:
+                try:
+                    self.writer(rows)
+                    written = len(rows)
+                except Exception as e:
+                    logger.error(f"Error escribiendo lote de auditoría ({len(rows)} registros): {e}")
+
+        with self._lock:
+            self._stats['logged'] += logged
+            self._stats['written'] += written
+            self._stats['failed'] += len(rows) - written
+            if rows:
+                self._stats['batches'] += 1
+        return written
+
+
+# Instancia global del escritor de auditoría
+audit_writer = AuditWriter(
+    max_queue=Config.AUDIT_QUEUE_SIZE,
+    batch_size=Config.AUDIT_BATCH_SIZE,
+    flush_interval_ms=Config.AUDIT_FLUSH_INTERVAL_MS
+)
+atexit.register(audit_writer.shutdown)
@@ -1,12 +1,17 @@
-import bcrypt
 import jwt
 import re
+import hashlib
+import threading
+import time
 from datetime import datetime, timedelta
 from functools import wraps
+from typing import Callable, List
 from flask import request, jsonify, current_app
 import secrets
 import logging
 from config import Config
+from utils.cache import TTLCache
+from utils.password_pool import password_pool, PasswordPoolBusy
 
 logger = logging.getLogger(__name__)
 
@@ -15,27 +20,30 @@ class AuthUtils:
     
     @staticmethod
     def hash_password(password: str) -> str:
-        """Generar hash de contraseña usando bcrypt"""
+        """Generar hash de contraseña usando bcrypt (en el pool de procesos)"""
         try:
-            # Generar salt y hash
-            salt = bcrypt.gensalt()
-            password_hash = bcrypt.hashpw(password.encode('utf-8'), salt)
-            return password_hash.decode('utf-8')
+            return password_pool.hash(password)
+        except PasswordPoolBusy:
+            raise
         except Exception as e:
             logger.error(f"Error hasheando contraseña: {e}")
             raise
     
     @staticmethod
     def verify_password(password: str, password_hash: str) -> bool:
-        """Verificar contraseña contra su hash"""
+        """Verificar contraseña contra su hash (en el pool de procesos)"""
         try:
-            return bcrypt.checkpw(
-                password.encode('utf-8'), 
-                password_hash.encode('utf-8')
-            )
+            return password_pool.verify(password, password_hash)
+        except PasswordPoolBusy:
+            raise
         except Exception as e:
             logger.error(f"Error verificando contraseña: {e}")
             return False
+
+    @staticmethod
+    def password_needs_rehash(password_hash: str) -> bool:
+        """El hash usa un costo bcrypt distinto al configurado (BCRYPT_ROUNDS)"""
+        return password_pool.needs_rehash(password_hash)
     
     @staticmethod
     def generate_jwt_token(user_data: dict) -> str:
@@ -171,6 +179,69 @@ class ValidationUtils:
         
         return True, ""
 
+class VerifiedTokenCache:
+    """
+    Caché LRU de tokens JWT ya verificados
+    La clave es el hash SHA-256 del token (el token no se guarda en claro) y
+    cada entrada expira en el 'exp' del token. La revocación se consulta en
+    cada uso, también en los aciertos, para que el logout sea inmediato.
+    """
+
+    def __init__(self, max_size: int = 10000, max_ttl: float = 900):
+        self.max_ttl = max_ttl
+        self._cache = TTLCache(max_size=max_size, ttl=max_ttl, name='jwt_verified')
+        self._revocation_checks: List[Callable[[dict], bool]] = []
+        self._lock = threading.Lock()
+        self._revoked_rejections = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def register_revocation_check(self, check: Callable[[dict], bool]):
+        """Registrar una función payload -> bool que indica si el token está revocado"""
+        self._revocation_checks.append(check)
+
+    def is_revoked(self, payload: dict) -> bool:
+        return any(check(payload) for check in self._revocation_checks)
+
+    def verify(self, token: str) -> dict:
+        """Claims del token verificado (desde caché o con verificación completa)"""
+        key = self._key(token)
+        payload = self._cache.get(key)
+        if payload is not None and payload.get('exp', 0) <= time.time():
+            # El reloj de pared manda sobre el TTL monotónico del caché
+            self._cache.delete(key)
+            payload = None
+
+        if payload is None:
+            payload = AuthUtils.decode_jwt_token(token)
+            ttl = min(self.max_ttl, payload.get('exp', 0) - time.time())
+            if ttl > 0:
+                self._cache.set(key, payload, ttl)
+
+        if self.is_revoked(payload):
+            self._cache.delete(key)
+            with self._lock:
+                self._revoked_rejections += 1
+            raise ValueError("Token revocado")
+
+        # Copia: las rutas no deben poder modificar la entrada cacheada
+        return dict(payload)
+
+    def invalidate(self, token: str) -> bool:
+        """Quitar un token del caché (logout)"""
+        return self._cache.delete(self._key(token))
+
+    def clear(self):
+        self._cache.clear()
+
+    def get_stats(self) -> dict:
+        stats = self._cache.get_stats()
+        with self._lock:
+            stats['revoked_rejections'] = self._revoked_rejections
+        return stats
+
 def token_required(f):
     """Decorador para rutas que requieren autenticación JWT con logging de seguridad"""
     @wraps(f)
@@ -212,9 +283,8 @@ def token_required(f):
             }), 401
         
         try:
-            # Decodificar token
-            payload = AuthUtils.decode_jwt_token(token)
-            current_user = payload
+            # Verificar token (caché de tokens verificados + revocación)
+            current_user = verified_token_cache.verify(token)
             
         except ValueError as e:
             # NUEVO: Log token inválido con detalles
@@ -274,6 +344,12 @@ def create_response(success: bool, message: str, data: dict = None, status_code:
 auth_utils = AuthUtils()
 validation_utils = ValidationUtils()
 
+# Instancia global del caché de tokens verificados
+verified_token_cache = VerifiedTokenCache(
+    max_size=Config.JWT_CACHE_SIZE,
+    max_ttl=Config.JWT_CACHE_MAX_TTL_SECONDS
+)
+
 def hash_password(password: str) -> str:
     """Función de conveniencia para hash de contraseña"""
     return auth_utils.hash_password(password)
@@ -288,4 +364,8 @@ def generate_jwt_token(user_data: dict) -> str:
 
 def decode_jwt_token(token: str) -> dict:
     """Función de conveniencia para decodificar JWT"""
-    return auth_utils.decode_jwt_token(token)
\ No newline at end of file
+    return auth_utils.decode_jwt_token(token)
+
+def verify_jwt_token(token: str) -> dict:
+    """Función de conveniencia para verificar JWT (con caché y revocación)"""
+    return verified_token_cache.verify(token)
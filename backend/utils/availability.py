@@ -0,0 +1,191 @@
+"""
+Índice de disponibilidad de usernames y emails
+/check-username y /check-email se llaman en cada tecla del formulario de
+registro. Un filtro de Bloom por campo con los valores ya tomados responde
+"definitivamente disponible" sin tocar MySQL; solo los posibles choques se
+confirman con un SELECT 1 sobre el índice único, y los falsos positivos
+confirmados se recuerdan unos segundos en un caché negativo.
+
+El Bloom no admite borrados: un username liberado sigue marcado hasta la
+próxima reconstrucción y solo cuesta una consulta. Las altas de otros
+workers se traen con una sincronización incremental por id.
+"""
+import logging
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+from config import Config
+from utils.bloom import BloomFilter
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_INDEXADOS = ('username', 'email')
+
+
+def normalize_key(value: str) -> str:
+    """
+    Clave comparable con la colación utf8mb4_general_ci de users: sin
+    mayúsculas, sin acentos y sin espacios al final
+    """
+    value = unicodedata.normalize('NFKD', value.strip().lower())
+    return ''.join(char for char in value if not unicodedata.combining(char))
+
+
+class AvailabilityIndex:
+    """Bloom de valores tomados por campo + caché de disponibles confirmados"""
+
+    def __init__(self, bloom_capacity: int = 200000, error_rate: float = 0.01,
+                 negative_cache_size: int = 10000, negative_cache_ttl: int = 30,
+                 batch_size: int = 5000):
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._blooms: Dict[str, BloomFilter] = {}
+        self._ready = False
+        self._last_id = 0
+        self._last_build: Optional[float] = None
+        self._negative = TTLCache(max_size=negative_cache_size, ttl=negative_cache_ttl,
+                                  name='availability_negative')
+        self._stats = {
+            'checks': 0,
+            'bloom_negatives': 0,
+            'negative_cache_hits': 0,
+            'db_lookups': 0,
+            'bloom_false_positives': 0
+        }
+
+    def is_available(self, field: str, value: str) -> bool:
+        """True si ningún usuario tiene ese username/email"""
+        if field not in CAMPOS_INDEXADOS:
+            raise ValueError(f"Campo no indexado: {field}")
+        key = normalize_key(value)
+        cache_key = f"{field}:{key}"
+
+        with self._lock:
+            self._stats['checks'] += 1
+            bloom = self._blooms.get(field) if self._ready else None
+            if bloom is not None and key not in bloom:
+                self._stats['bloom_negatives'] += 1
+                return True
+        if self._negative.get(cache_key):
+            with self._lock:
+                self._stats['negative_cache_hits'] += 1
+            return True
+
+        available = not self._exists(field, value.strip())
+        with self._lock:
+            self._stats['db_lookups'] += 1
+            if available and bloom is not None:
+                self._stats['bloom_false_positives'] += 1
+        if available:
+            self._negative.set(cache_key, True)
+        return available
+
+    def is_username_available(self, username: str) -> bool:
+        return self.is_available('username', username)
+
+    def is_email_available(self, email: str) -> bool:
+        return self.is_available('email', email)
+
+    def add(self, username: Optional[str] = None, email: Optional[str] = None):
+        """Marca como tomados los valores de un usuario creado o actualizado"""
+        values = {'username': username, 'email': email}
+        with self._lock:
+            for field, value in values.items():
+                if not value:
+                    continue
+                key = normalize_key(value)
+                bloom = self._blooms.get(field)
+                if bloom is not None:
+                    bloom.add(key)
+                self._negative.delete(f"{field}:{key}")
+
+    def build(self) -> int:
+        """Reconstruye los Bloom desde users recorriendo la tabla por id en lotes"""
+        from utils.database import db_manager
+
+        started = time.monotonic()
+        total_row = db_manager.fetch_one("SELECT COUNT(*) AS total FROM users")
+        total = total_row['total'] if total_row else 0
+        capacity = max(self.bloom_capacity, total * 2)
+        blooms = {field: BloomFilter(capacity, self.error_rate) for field in CAMPOS_INDEXADOS}
+
+        last_id = 0
+        loaded = 0
+        while True:
+            rows = db_manager.fetch_all("""
+                SELECT id, username, email FROM users
+                WHERE id > %s ORDER BY id LIMIT %s
+            """, (last_id, self.batch_size)) or []
+            for row in rows:
+                for field in CAMPOS_INDEXADOS:
+                    if row[field]:
+                        blooms[field].add(normalize_key(row[field]))
+            loaded += len(rows)
+            if rows:
+                last_id = rows[-1]['id']
+            if len(rows) < self.batch_size:
+                break
+
+        with self._lock:
+            self._blooms = blooms
+            self._last_id = last_id
+            self._last_build = time.time()
+            self._ready = True
+        self._negative.clear()
+        logger.info(f"🔎 Índice de disponibilidad construido con {loaded} usuarios "
+                    f"en {(time.monotonic() - started) * 1000:.0f} ms")
+        return loaded
+
+    def sync(self) -> int:
+        """Agrega los usuarios creados por otros workers desde la última carga"""
+        from utils.database import db_manager
+
+        if not self._ready:
+            return self.build()
+        rows = db_manager.fetch_all("""
+            SELECT id, username, email FROM users
+            WHERE id > %s ORDER BY id
+        """, (self._last_id,)) or []
+        for row in rows:
+            self.add(row['username'], row['email'])
+        saturated = False
+        with self._lock:
+            if rows:
+                self._last_id = max(self._last_id, rows[-1]['id'])
+            saturated = any(bloom.is_saturated() for bloom in self._blooms.values())
+        if saturated:
+            self.build()
+        return len(rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['ready'] = self._ready
+            stats['indexed'] = {field: bloom.count for field, bloom in self._blooms.items()}
+            stats['bloom_bits'] = {field: bloom.num_bits for field, bloom in self._blooms.items()}
+            stats['last_build'] = self._last_build
+        stats['negative_cache'] = self._negative.get_stats()
+        return stats
+
+    @staticmethod
+    def _exists(field: str, value: str) -> bool:
+        from utils.database import db_manager
+
+        # field sale de CAMPOS_INDEXADOS; la consulta usa el índice único
+        row = db_manager.fetch_one(f"SELECT 1 AS existe FROM users WHERE {field} = %s LIMIT 1", (value,))
+        return row is not None
+
+
+# Instancia global del índice (se construye al iniciar la app; hasta entonces
+# todas las consultas van a la base de datos)
+availability_index = AvailabilityIndex(
+    bloom_capacity=Config.AVAILABILITY_BLOOM_CAPACITY,
+    error_rate=Config.AVAILABILITY_BLOOM_ERROR_RATE,
+    negative_cache_size=Config.AVAILABILITY_NEGATIVE_CACHE_SIZE,
+    negative_cache_ttl=Config.AVAILABILITY_NEGATIVE_CACHE_TTL_SECONDS
+)
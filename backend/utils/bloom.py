@@ -0,0 +1,47 @@
+"""
+Filtro de Bloom en memoria
+Responde "definitivamente no está" sin falsos negativos; un acierto solo
+significa "posiblemente está" y debe confirmarse con la fuente exacta.
+"""
+import hashlib
+import math
+from typing import Iterable
+
+
+class BloomFilter:
+    """Filtro de Bloom con tamaño calculado a partir de capacidad y tasa de error"""
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # m = -n·ln(p) / ln(2)^2 bits, k = m/n·ln(2) funciones hash
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Doble hashing (Kirsch-Mitzenmacher) sobre un solo digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[str]):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+    def is_saturated(self) -> bool:
+        """Se superó la capacidad: la tasa de falsos positivos ya no se garantiza"""
+        return self.count > self.capacity
@@ -184,7 +184,21 @@ def create_user(user_data: dict) -> bool:
             user_data.get('is_verified', False)
         )
         
-        db_manager.execute_query(query, params)
+        # El alta, su índice de búsqueda y los contadores globales en una sola transacción
+        from models.contadores_repository import ContadoresRepository
+        from models.user_search_repository import UserSearchRepository
+        with db_manager.get_db_cursor() as (cursor, connection):
+            try:
+                connection.start_transaction()
+                cursor.execute(query, params)
+                UserSearchRepository.indexar(cursor, cursor.lastrowid, user_data)
+                ContadoresRepository.incrementar(cursor, ContadoresRepository.delta_usuario(1))
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        from utils.availability import availability_index
+        availability_index.add(user_data['username'], user_data['email'])
         return True
         
     except Exception as e:
@@ -7,6 +7,8 @@ from email.mime.text import MIMEText as MimeText
 from email.mime.multipart import MIMEMultipart as MimeMultipart
 from datetime import datetime, timedelta
 import logging
+from config import Config
+from utils.email_outbox import email_outbox
 
 logger = logging.getLogger(__name__)
 
@@ -29,32 +31,43 @@ class EmailService:
         """Generar código de verificación de 6 dígitos"""
         return ''.join(random.choices(string.digits, k=6))
     
+    def build_verification_email(self, recipient_email: str, verification_code: str,
+                                 username: str = None) -> tuple[str, str, str]:
+        """Asunto, texto plano y HTML del email de verificación"""
+        subject = "🔐 Código de verificación - Aureum"
+        
+        # Plantilla HTML del email
+        html_content = self._get_verification_email_template(verification_code, username or recipient_email)
+        
+        # Plantilla texto plano (fallback)
+        text_content = f"""
+        Hola{' ' + username if username else ''},
+        
+        Tu código de verificación para Aureum es: {verification_code}
+        
+        Este código expira en 5 minutos.
+        
+        Si no solicitaste este código, ignora este mensaje.
+        
+        Saludos,
+        Equipo de Aureum
+        """
+        
+        return subject, text_content, html_content
+    
     def send_verification_email(self, recipient_email: str, verification_code: str, username: str = None) -> bool:
         """Enviar email de verificación con código"""
         try:
+            subject, text_content, html_content = self.build_verification_email(
+                recipient_email, verification_code, username
+            )
+            
             # Crear mensaje
             message = MimeMultipart("alternative")
-            message["Subject"] = "🔐 Código de verificación - Aureum"
+            message["Subject"] = subject
             message["From"] = f"Aureum App <{self.email}>"
             message["To"] = recipient_email
             
-            # Plantilla HTML del email
-            html_content = self._get_verification_email_template(verification_code, username or recipient_email)
-            
-            # Plantilla texto plano (fallback)
-            text_content = f"""
-            Hola{' ' + username if username else ''},
-            
-            Tu código de verificación para Aureum es: {verification_code}
-            
-            Este código expira en 5 minutos.
-            
-            Si no solicitaste este código, ignora este mensaje.
-            
-            Saludos,
-            Equipo de Aureum
-            """
-            
             # Adjuntar partes
             part1 = MimeText(text_content, "plain")
             part2 = MimeText(html_content, "html")
@@ -259,6 +272,11 @@ def send_verification_code(email: str, username: str = None) -> tuple[bool, str,
 
     try:
         code = email_service.generate_verification_code()
+        if Config.EMAIL_OUTBOX_ENABLED:
+            # La request no espera al SMTP: el email sale desde la bandeja de salida
+            email_outbox.enqueue(email, *email_service.build_verification_email(email, code, username))
+            return True, "Email encolado para envío", code
+
         success = email_service.send_verification_email(email, code, username)
 
         if success:
@@ -270,6 +288,68 @@ def send_verification_code(email: str, username: str = None) -> tuple[bool, str,
         logger.error(f"Error en send_verification_code: {e}")
         return False, "Error interno enviando email", ""
 
+def build_generic_email(code: str, subject: str = "Código de verificación") -> tuple[str, str, str]:
+    """Asunto, texto plano y HTML del email con código genérico"""
+    # Plantilla HTML para código genérico
+    html_content = f"""
+    <!DOCTYPE html>
+    <html lang="es">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>{subject}</title>
+        <style>
+            body {{ font-family: 'Segoe UI', sans-serif; background-color: #f8fafc; margin: 0; padding: 20px; }}
+            .container {{ max-width: 600px; margin: 0 auto; background-color: white; border-radius: 16px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); }}
+            .header {{ background: linear-gradient(135deg, #f59e0b, #d97706); color: white; padding: 30px; text-align: center; }}
+            .header h1 {{ margin: 0; font-size: 28px; font-weight: bold; }}
+            .content {{ padding: 40px 30px; text-align: center; }}
+            .message {{ color: #64748b; font-size: 16px; margin-bottom: 30px; }}
+            .code-container {{ background-color: #f1f5f9; border: 2px dashed #f59e0b; border-radius: 12px; padding: 25px; margin: 30px 0; }}
+            .code {{ font-family: 'Courier New', monospace; font-size: 32px; font-weight: bold; color: #f59e0b; letter-spacing: 8px; margin: 0; }}
+            .expiry {{ color: #ef4444; font-size: 14px; margin-top: 15px; font-weight: 500; }}
+            .footer {{ background-color: #f8fafc; padding: 20px; text-align: center; color: #94a3b8; font-size: 14px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🔐 Aureum</h1>
+            </div>
+            <div class="content">
+                <div class="message">
+                    Para completar la acción solicitada, usa el siguiente código de verificación:
+                </div>
+                <div class="code-container">
+                    <div class="code">{code}</div>
+                    <div class="expiry">⏰ Este código expira en 5 minutos</div>
+                </div>
+            </div>
+            <div class="footer">
+                <p>Este es un mensaje automático, por favor no respondas a este email.</p>
+                <p>&copy; 2025 Aureum. Todos los derechos reservados.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+    # Plantilla texto plano
+    text_content = f"""
+    {subject}
+
+    Tu código de verificación es: {code}
+
+    Este código expira en 5 minutos.
+
+    Si no solicitaste este código, ignora este mensaje.
+
+    Saludos,
+    Equipo de Aureum
+    """
+
+    return f"🔐 {subject} - Aureum", text_content, html_content
+
 def send_generic_code(email: str, code: str, subject: str = "Código de verificación") -> bool:
     """
     Función para enviar un código genérico por email (para acciones administrativas)
@@ -280,70 +360,17 @@ def send_generic_code(email: str, code: str, subject: str = "Código de verifica
         return False
 
     try:
+        full_subject, text_content, html_content = build_generic_email(code, subject)
+        if Config.EMAIL_OUTBOX_ENABLED:
+            email_outbox.enqueue(email, full_subject, text_content, html_content)
+            return True
+
         # Crear mensaje personalizado para códigos genéricos
         message = MimeMultipart("alternative")
-        message["Subject"] = f"🔐 {subject} - Aureum"
+        message["Subject"] = full_subject
         message["From"] = f"Aureum App <{email_service.email}>"
         message["To"] = email
 
-        # Plantilla HTML para código genérico
-        html_content = f"""
-        <!DOCTYPE html>
-        <html lang="es">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>{subject}</title>
-            <style>
-                body {{ font-family: 'Segoe UI', sans-serif; background-color: #f8fafc; margin: 0; padding: 20px; }}
-                .container {{ max-width: 600px; margin: 0 auto; background-color: white; border-radius: 16px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); }}
-                .header {{ background: linear-gradient(135deg, #f59e0b, #d97706); color: white; padding: 30px; text-align: center; }}
-                .header h1 {{ margin: 0; font-size: 28px; font-weight: bold; }}
-                .content {{ padding: 40px 30px; text-align: center; }}
-                .message {{ color: #64748b; font-size: 16px; margin-bottom: 30px; }}
-                .code-container {{ background-color: #f1f5f9; border: 2px dashed #f59e0b; border-radius: 12px; padding: 25px; margin: 30px 0; }}
-                .code {{ font-family: 'Courier New', monospace; font-size: 32px; font-weight: bold; color: #f59e0b; letter-spacing: 8px; margin: 0; }}
-                .expiry {{ color: #ef4444; font-size: 14px; margin-top: 15px; font-weight: 500; }}
-                .footer {{ background-color: #f8fafc; padding: 20px; text-align: center; color: #94a3b8; font-size: 14px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🔐 Aureum</h1>
-                </div>
-                <div class="content">
-                    <div class="message">
-                        Para completar la acción solicitada, usa el siguiente código de verificación:
-                    </div>
-                    <div class="code-container">
-                        <div class="code">{code}</div>
-                        <div class="expiry">⏰ Este código expira en 5 minutos</div>
-                    </div>
-                </div>
-                <div class="footer">
-                    <p>Este es un mensaje automático, por favor no respondas a este email.</p>
-                    <p>&copy; 2025 Aureum. Todos los derechos reservados.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-
-        # Plantilla texto plano
-        text_content = f"""
-        {subject}
-
-        Tu código de verificación es: {code}
-
-        Este código expira en 5 minutos.
-
-        Si no solicitaste este código, ignora este mensaje.
-
-        Saludos,
-        Equipo de Aureum
-        """
-
         # Adjuntar partes
         part1 = MimeText(text_content, "plain")
         part2 = MimeText(html_content, "html")
@@ -0,0 +1,247 @@
+"""
+Envío de emails en segundo plano
+Las requests encolan el email en email_outbox y responden de inmediato; un
+pool de hilos reclama lotes de la tabla y los envía reutilizando una
+conexión SMTP por worker, con reintentos y backoff exponencial. La entrega
+es al-menos-una-vez: si un worker muere a mitad de lote, el lease vence y
+otro worker reenvía los emails no marcados.
+"""
+import atexit
+import logging
+import smtplib
+import ssl
+import threading
+import time
+from email.mime.text import MIMEText as MimeText
+from email.mime.multipart import MIMEMultipart as MimeMultipart
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from models.email_outbox_repository import EmailOutboxRepository
+
+logger = logging.getLogger(__name__)
+
+# (puerto, seguridad) en orden de preferencia; seguridad: 'ssl', 'starttls' o 'none'
+GMAIL_ENDPOINTS = [(465, 'ssl'), (587, 'starttls')]
+
+
+class SMTPTransport:
+    """Conexión SMTP persistente (una por worker, no es thread-safe)"""
+
+    def __init__(self, host: str, endpoints: List[Tuple[int, str]], username: Optional[str] = None,
+                 password: Optional[str] = None, timeout: float = 10.0):
+        self.host = host
+        self.endpoints = list(endpoints)
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def send(self, sender: str, recipient: str, message: str):
+        if self._server is None:
+            self._server = self._connect()
+        try:
+            self._server.sendmail(sender, recipient, message)
+        except smtplib.SMTPServerDisconnected:
+            # El servidor cerró la conexión ociosa: reconectar una vez
+            self._server = self._connect()
+            self._server.sendmail(sender, recipient, message)
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self, idle_seconds: float):
+        if self._server is not None and time.monotonic() - self._last_used > idle_seconds:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    def _connect(self) -> smtplib.SMTP:
+        last_error: Optional[Exception] = None
+        for index, (port, security) in enumerate(self.endpoints):
+            try:
+                if security == 'ssl':
+                    server = smtplib.SMTP_SSL(self.host, port, context=ssl.create_default_context(),
+                                              timeout=self.timeout)
+                else:
+                    server = smtplib.SMTP(self.host, port, timeout=self.timeout)
+                    if security == 'starttls':
+                        server.starttls(context=ssl.create_default_context())
+                if self.username and self.password:
+                    server.login(self.username, self.password)
+                if index:
+                    # Recordar el endpoint que funcionó para las próximas conexiones
+                    self.endpoints.insert(0, self.endpoints.pop(index))
+                logger.info(f"📧 Conexión SMTP abierta en {self.host}:{port} ({security})")
+                return server
+            except Exception as e:
+                logger.warning(f"❌ Fallo conectando a {self.host}:{port} ({security}): {e}")
+                last_error = e
+        raise last_error or smtplib.SMTPException("Sin endpoints SMTP configurados")
+
+
+def create_smtp_transport() -> SMTPTransport:
+    """Transporte según Config (Gmail 465/587 si no se fija EMAIL_SMTP_PORT)"""
+    if Config.EMAIL_SMTP_PORT:
+        endpoints = [(Config.EMAIL_SMTP_PORT, Config.EMAIL_SMTP_SECURITY)]
+    else:
+        endpoints = GMAIL_ENDPOINTS
+    return SMTPTransport(Config.EMAIL_SMTP_HOST, endpoints,
+                         Config.EMAIL_SMTP_USER, Config.EMAIL_SMTP_PASSWORD)
+
+
+def build_mime_message(sender: str, recipient: str, subject: str, text: str,
+                       html: Optional[str] = None) -> str:
+    message = MimeMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = f"Aureum App <{sender}>"
+    message["To"] = recipient
+    message.attach(MimeText(text, "plain"))
+    if html:
+        message.attach(MimeText(html, "html"))
+    return message.as_string()
+
+
+class EmailOutbox:
+    """Workers que vacían email_outbox por lotes"""
+
+    MAX_BACKOFF_SECONDS = 3600
+
+    def __init__(self, repository=EmailOutboxRepository,
+                 transport_factory: Callable[[], Any] = create_smtp_transport,
+                 sender: Optional[str] = None, workers: int = 2, batch_size: int = 20,
+                 poll_interval: float = 5.0, max_attempts: int = 5, backoff_seconds: int = 30,
+                 lease_seconds: int = 300, smtp_idle_seconds: float = 60.0):
+        self.repository = repository
+        self.transport_factory = transport_factory
+        self.sender = sender
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.smtp_idle_seconds = smtp_idle_seconds
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._stats = {
+            'enqueued': 0,
+            'sent': 0,
+            'retried': 0,
+            'failed': 0,
+            'batches': 0
+        }
+
+    def enqueue(self, recipient: str, subject: str, text: str, html: Optional[str] = None) -> int:
+        """Guarda el email en la bandeja de salida y despierta a los workers"""
+        email_id = self.repository.encolar(recipient, subject, text, html)
+        with self._lock:
+            self._stats['enqueued'] += 1
+        self.start()
+        self._wake.set()
+        return email_id
+
+    def start(self):
+        """Iniciar los workers (idempotente)"""
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            if self._threads or self.workers <= 0:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'email-outbox-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"📧 Bandeja de salida iniciada con {self.workers} workers")
+
+    def shutdown(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def drain_once(self, transport) -> int:
+        """Reclama y envía un lote; retorna cuántos emails procesó"""
+        batch = self.repository.reclamar_lote(self.batch_size, self.lease_seconds)
+        if batch:
+            self._send_batch(transport, batch)
+        return len(batch)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['workers'] = sum(1 for thread in self._threads if thread.is_alive())
+        return stats
+
+    def _run(self):
+        transport = self.transport_factory()
+        try:
+            while not self._stop.is_set():
+                try:
+                    processed = self.drain_once(transport)
+                except Exception as e:
+                    logger.error(f"Error reclamando emails de la bandeja de salida: {e}")
+                    processed = 0
+                if processed:
+                    continue
+                transport.close_if_idle(self.smtp_idle_seconds)
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        finally:
+            transport.close()
+
+    def _send_batch(self, transport, batch: List[Dict[str, Any]]):
+        sent = []
+        for email in batch:
+            try:
+                message = build_mime_message(self.sender, email['recipient'], email['subject'],
+                                             email['body_text'], email.get('body_html'))
+                transport.send(self.sender, email['recipient'], message)
+                sent.append(email['id'])
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                # Rechazo del mensaje: la conexión sigue siendo válida
+                self._record_failure(email, e)
+            except Exception as e:
+                # Conexión posiblemente inválida: el siguiente envío reconecta
+                transport.close()
+                self._record_failure(email, e)
+
+        self.repository.marcar_enviados(sent)
+        with self._lock:
+            self._stats['sent'] += len(sent)
+            self._stats['batches'] += 1
+        if sent:
+            logger.info(f"✅ {len(sent)} emails enviados desde la bandeja de salida")
+
+    def _record_failure(self, email: Dict[str, Any], error: Exception):
+        attempts = email['attempts'] + 1
+        if attempts >= self.max_attempts:
+            retry_in = None
+            logger.error(f"❌ Email {email['id']} a {email['recipient']} descartado tras {attempts} intentos: {error}")
+        else:
+            retry_in = min(self.MAX_BACKOFF_SECONDS, self.backoff_seconds * 2 ** (attempts - 1))
+            logger.warning(f"⚠️ Email {email['id']} falló (intento {attempts}), reintento en {retry_in}s: {error}")
+        self.repository.marcar_fallido(email['id'], str(error), retry_in)
+        with self._lock:
+            self._stats['failed' if retry_in is None else 'retried'] += 1
+
+
+# Instancia global de la bandeja de salida (los workers arrancan con la app
+# o con el primer email encolado)
+email_outbox = EmailOutbox(
+    sender=Config.EMAIL_SMTP_USER,
+    workers=Config.EMAIL_OUTBOX_WORKERS,
+    batch_size=Config.EMAIL_OUTBOX_BATCH_SIZE,
+    poll_interval=Config.EMAIL_OUTBOX_POLL_SECONDS,
+    max_attempts=Config.EMAIL_OUTBOX_MAX_ATTEMPTS,
+    backoff_seconds=Config.EMAIL_OUTBOX_BACKOFF_SECONDS
+)
+atexit.register(email_outbox.shutdown)
@@ -0,0 +1,276 @@
+"""
+Bus de eventos de aprobación de gastos
+Los servicios publican eventos (gasto pendiente, aprobado, rechazado); cada
+evento se guarda en notificaciones y se entrega a las conexiones SSE del
+usuario destinatario abiertas en este worker.
+
+Backends:
+- memory: solo entrega local (un worker); notificaciones sirve para ponerse
+  al día al reconectar
+- database: además, un hilo por worker lee las notificaciones nuevas por id y
+  entrega las publicadas por otros workers
+
+Los ids se asignan al insertar pero las transacciones pueden confirmarse en
+otro orden (el 10 visible después del 11), así que ni el stream ni el poller
+usan el último id como marca: se deduplica por id y se vuelve a leer un margen
+hacia atrás (lookback_ids al reconectar, huecos pendientes en el poller).
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from config import Config
+from models.notificaciones_repository import NotificacionesRepository
+
+logger = logging.getLogger(__name__)
+
+
+def _a_evento(notificacion: Dict[str, Any]) -> Dict[str, Any]:
+    fecha = notificacion.get('fecha_envio')
+    return {
+        'id': notificacion['id'],
+        'tipo': notificacion['tipo'],
+        'titulo': notificacion['titulo'],
+        'mensaje': notificacion.get('mensaje'),
+        'leida': bool(notificacion.get('leida')),
+        'fecha': fecha.isoformat() if hasattr(fecha, 'isoformat') else fecha,
+        'metadata': notificacion.get('metadata')
+    }
+
+
+class _IdsRecientes:
+    """Conjunto acotado de ids (olvida los más antiguos)"""
+
+    def __init__(self, maxlen: int):
+        self._ids: Set[int] = set()
+        self._orden: deque = deque(maxlen=maxlen)
+
+    def __contains__(self, notificacion_id: int) -> bool:
+        return notificacion_id in self._ids
+
+    def add(self, notificacion_id: int) -> bool:
+        """Agrega el id; False si ya estaba"""
+        if notificacion_id in self._ids:
+            return False
+        if len(self._orden) == self._orden.maxlen:
+            self._ids.discard(self._orden[0])
+        self._orden.append(notificacion_id)
+        self._ids.add(notificacion_id)
+        return True
+
+
+class Subscription:
+    """Cola acotada de eventos de una conexión SSE"""
+
+    def __init__(self, user_id: int, max_queue: int = 100):
+        self.user_id = user_id
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        # Ids ya enviados por esta conexión (historial + en vivo)
+        self.enviados = _IdsRecientes(maxlen=10000)
+        self.overflowed = False
+
+    def push(self, evento: Dict[str, Any]):
+        try:
+            self.queue.put_nowait(evento)
+        except queue.Full:
+            # Cliente lento: se le cierra el stream y se pone al día al reconectar
+            self.overflowed = True
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """Publicación persistente en notificaciones y entrega a suscriptores locales"""
+
+    # Un salto de ids mayor se toma como hueco del auto_increment, no como
+    # transacciones en curso
+    MAX_HUECOS = 1000
+
+    def __init__(self, backend: str = 'memory', repository=NotificacionesRepository,
+                 poll_interval: float = 1.0, max_queue: int = 100,
+                 max_subscriptions_per_user: int = 5, lookback_ids: int = 1000,
+                 gap_seconds: float = 30.0):
+        self.backend = backend
+        self.repository = repository
+        self.poll_interval = poll_interval
+        self.max_queue = max_queue
+        self.max_subscriptions_per_user = max_subscriptions_per_user
+        self.lookback_ids = lookback_ids
+        self.gap_seconds = gap_seconds
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        # Ids ya entregados por este worker (publicados aquí o traídos por el poller)
+        self._entregados = _IdsRecientes(maxlen=50000)
+        self._last_polled_id: Optional[int] = None
+        # Ids saltados por el poller que pueden confirmarse tarde -> desde cuándo
+        self._huecos: Dict[int, float] = {}
+        self._poller: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stats = {
+            'published': 0,
+            'delivered': 0,
+            'remote_delivered': 0,
+            'publish_errors': 0,
+            'overflows': 0
+        }
+
+    def publish(self, eventos: List[Dict[str, Any]]) -> List[int]:
+        """
+        Guarda y entrega eventos {user_id, tipo, titulo, mensaje, metadata, leida}.
+        Nunca lanza: un fallo al notificar no debe deshacer la operación que lo originó.
+        """
+        if not eventos:
+            return []
+        try:
+            ids = self.repository.insertar(eventos)
+        except Exception as e:
+            with self._lock:
+                self._stats['publish_errors'] += 1
+            logger.error(f"Error guardando {len(eventos)} notificaciones: {e}")
+            return []
+
+        with self._lock:
+            self._stats['published'] += len(ids)
+            for notificacion_id in ids:
+                self._entregados.add(notificacion_id)
+        ahora = datetime.now()
+        for notificacion_id, evento in zip(ids, eventos):
+            self._dispatch(evento['user_id'], _a_evento({**evento, 'id': notificacion_id, 'fecha_envio': ahora}))
+        return ids
+
+    def subscribe(self, user_id: int) -> Optional[Subscription]:
+        """Registra una conexión; None si el usuario ya tiene demasiadas abiertas"""
+        with self._lock:
+            subscriptions = self._subscriptions.setdefault(user_id, set())
+            if len(subscriptions) >= self.max_subscriptions_per_user:
+                return None
+            subscription = Subscription(user_id, self.max_queue)
+            subscriptions.add(subscription)
+        if self.backend == 'database':
+            self.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def catch_up(self, user_id: int, desde_id: int, limite: int = 100) -> List[Dict[str, Any]]:
+        """Eventos guardados del usuario posteriores a desde_id"""
+        return [_a_evento(fila) for fila in self.repository.del_usuario_desde(user_id, desde_id, limite)]
+
+    def inicio_lookback(self, ultimo_id: int) -> int:
+        """
+        Id desde el que releer al reconectar con Last-Event-ID: un evento con id
+        menor confirmado después del último recibido sigue dentro del margen
+        """
+        return max(0, ultimo_id - self.lookback_ids) if ultimo_id else 0
+
+    def start(self):
+        """Inicia el hilo que trae los eventos de otros workers (idempotente)"""
+        with self._lock:
+            if self._poller is not None and self._poller.is_alive():
+                return
+            self._stop.clear()
+            self._poller = threading.Thread(target=self._run, name='event-bus-poller', daemon=True)
+            self._poller.start()
+
+    def shutdown(self, timeout: float = 2.0):
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join(timeout)
+
+    def poll_once(self) -> int:
+        """
+        Entrega a los suscriptores locales las notificaciones nuevas de otros
+        workers. Además de las posteriores al último id leído, vuelve a buscar
+        los ids saltados (huecos) que aún pueden confirmarse, y descarta por id
+        lo ya entregado; un hueco se abandona tras gap_seconds (rollback o id
+        no usado). Si aun así se pierde uno en vivo, el cliente lo recupera al
+        reconectar porque el historial se relee con un margen de ids.
+        """
+        if self._last_polled_id is None:
+            self._last_polled_id = self.repository.ultimo_id()
+            return 0
+        ahora = time.monotonic()
+        for notificacion_id, desde in list(self._huecos.items()):
+            if ahora - desde > self.gap_seconds:
+                del self._huecos[notificacion_id]
+
+        filas = self.repository.todas_desde(self._last_polled_id)
+        if self._huecos:
+            filas = self.repository.por_ids(sorted(self._huecos)) + filas
+        entregadas = 0
+        esperado = self._last_polled_id + 1
+        for fila in filas:
+            notificacion_id = fila['id']
+            self._huecos.pop(notificacion_id, None)
+            if notificacion_id > self._last_polled_id:
+                # Ids entre el último leído y este que todavía no son visibles
+                if notificacion_id - esperado <= self.MAX_HUECOS:
+                    for faltante in range(esperado, notificacion_id):
+                        self._huecos.setdefault(faltante, ahora)
+                self._last_polled_id = notificacion_id
+                esperado = notificacion_id + 1
+            with self._lock:
+                nueva = self._entregados.add(notificacion_id)
+            if nueva and self._dispatch(fila['user_id'], _a_evento(fila)):
+                entregadas += 1
+        if entregadas:
+            with self._lock:
+                self._stats['remote_delivered'] += entregadas
+        return entregadas
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['backend'] = self.backend
+            stats['subscribers'] = sum(len(subs) for subs in self._subscriptions.values())
+            stats['pending_gaps'] = len(self._huecos)
+        return stats
+
+    def _dispatch(self, user_id: int, evento: Dict[str, Any]) -> bool:
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.push(evento)
+            if subscription.overflowed:
+                with self._lock:
+                    self._stats['overflows'] += 1
+        if subscriptions:
+            with self._lock:
+                self._stats['delivered'] += len(subscriptions)
+        return bool(subscriptions)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Error leyendo notificaciones nuevas: {e}")
+            self._stop.wait(self.poll_interval)
+
+
+# Instancia global del bus de eventos
+event_bus = EventBus(
+    backend=Config.EVENT_BUS_BACKEND,
+    poll_interval=Config.EVENT_BUS_POLL_SECONDS,
+    max_queue=Config.EVENT_BUS_MAX_QUEUE,
+    max_subscriptions_per_user=Config.EVENT_BUS_MAX_STREAMS_PER_USER,
+    lookback_ids=Config.EVENT_BUS_LOOKBACK_IDS,
+    gap_seconds=Config.EVENT_BUS_GAP_SECONDS
+)
+
+atexit.register(event_bus.shutdown)
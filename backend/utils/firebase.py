@@ -1,66 +1,288 @@
-import firebase_admin
-from firebase_admin import credentials, auth
-import os
+"""
+Integración con Firebase (login con Google)
+Los ID tokens se verifican localmente: firma RS256 contra las claves públicas
+de Google (precargadas y renovadas en segundo plano antes de que venzan) y
+validación de aud/iss/exp/auth_time. Los claims verificados se guardan en
+caché hasta que el token expira. El Admin SDK se inicializa una sola vez, de
+forma perezosa, y solo se usa para consultar usuarios.
+
+El verificador es intercambiable (set_token_verifier) para que las pruebas
+usen uno falso sin red ni credenciales.
+"""
+import hashlib
+import json
 import logging
+import os
+import re
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import jwt
+
+from config import Config
+from utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
-# Variable global para controlar la inicialización
-_firebase_initialized = False
+SERVICE_ACCOUNT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'firebase-service-account.json')
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
 
-def initialize_firebase():
-    """Inicializa Firebase Admin SDK"""
-    global _firebase_initialized
-    
-    if _firebase_initialized:
-        return True
-        
-    try:
-        # Ruta al archivo de credenciales
-        service_account_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'firebase-service-account.json')
-        
-        if not os.path.exists(service_account_path):
-            logger.error(f"Archivo de credenciales no encontrado: {service_account_path}")
-            return False
-        
-        # Inicializar Firebase Admin SDK
-        cred = credentials.Certificate(service_account_path)
-        firebase_admin.initialize_app(cred)
-        
-        _firebase_initialized = True
-        logger.info("✅ Firebase Admin SDK inicializado correctamente")
-        return True
-        
-    except ValueError as e:
-        if "already exists" in str(e):
-            _firebase_initialized = True
-            logger.info("✅ Firebase Admin SDK ya estaba inicializado")
+
+class InvalidFirebaseToken(Exception):
+    """El ID token no es válido (firma, claims o expiración)"""
+
+
+def _fetch_google_certs(url: str = GOOGLE_CERTS_URL, timeout: float = 5.0) -> Tuple[Dict[str, str], int]:
+    """Descarga los certificados {kid: PEM} y su max-age de Cache-Control"""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        certs = json.loads(response.read().decode('utf-8'))
+        match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+    return certs, int(match.group(1)) if match else 3600
+
+
+def _load_public_key(cert_pem: str):
+    from cryptography.x509 import load_pem_x509_certificate
+    return load_pem_x509_certificate(cert_pem.encode('utf-8')).public_key()
+
+
+class GoogleKeyStore:
+    """Claves públicas de firma de Google con renovación anticipada"""
+
+    # Un kid desconocido fuerza una descarga como máximo cada este intervalo
+    MIN_FORCED_REFRESH_SECONDS = 60
+
+    def __init__(self, fetcher: Callable[[], Tuple[Dict[str, str], int]] = _fetch_google_certs,
+                 key_loader: Callable[[str], Any] = _load_public_key, refresh_margin: int = 600):
+        self.fetcher = fetcher
+        self.key_loader = key_loader
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._keys: Dict[str, Any] = {}
+        self._expires_at = 0.0
+        self._last_fetch = 0.0
+        self._stats = {'refreshes': 0, 'forced_refreshes': 0, 'errors': 0}
+
+    def get(self, kid: str):
+        """Clave pública del kid; descarga en línea solo si no hay claves o el kid es nuevo"""
+        with self._lock:
+            key = self._keys.get(kid)
+            stale = time.time() >= self._expires_at
+            can_force = time.monotonic() - self._last_fetch >= self.MIN_FORCED_REFRESH_SECONDS
+        if key is not None and not stale:
+            return key
+        if key is None and not can_force and not stale:
+            return None
+        # Rotación no anticipada o claves vencidas: descarga síncrona
+        with self._lock:
+            self._stats['forced_refreshes'] += 1
+        self.refresh()
+        with self._lock:
+            return self._keys.get(kid)
+
+    def refresh(self) -> int:
+        """Descarga y reemplaza el juego de claves; retorna cuántas hay"""
+        try:
+            certs, max_age = self.fetcher()
+            keys = {kid: self.key_loader(pem) for kid, pem in certs.items()}
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+                self._last_fetch = time.monotonic()
+            logger.error(f"❌ Error descargando claves públicas de Firebase: {e}")
+            return 0
+        with self._lock:
+            self._keys = keys
+            self._expires_at = time.time() + max_age
+            self._last_fetch = time.monotonic()
+            self._stats['refreshes'] += 1
+        logger.info(f"🔑 Claves públicas de Firebase actualizadas ({len(keys)}, vigentes {max_age}s)")
+        return len(keys)
+
+    def refresh_if_stale(self) -> int:
+        """Trabajo periódico: renueva antes de entrar en el margen de vencimiento"""
+        with self._lock:
+            fresh = time.time() < self._expires_at - self.refresh_margin
+        return 0 if fresh else self.refresh()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['keys'] = len(self._keys)
+            stats['expires_in'] = max(0, round(self._expires_at - time.time()))
+        return stats
+
+
+class LocalTokenVerifier:
+    """Verifica ID tokens de Firebase con PyJWT y las claves de GoogleKeyStore"""
+
+    def __init__(self, project_id: str, key_store: GoogleKeyStore, clock_skew: int = 30):
+        self.project_id = project_id
+        self.issuer = f'https://securetoken.google.com/{project_id}'
+        self.key_store = key_store
+        self.clock_skew = clock_skew
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise InvalidFirebaseToken(f"Token mal formado: {e}")
+        if header.get('alg') != 'RS256' or not header.get('kid'):
+            raise InvalidFirebaseToken("Algoritmo o kid inválido")
+
+        key = self.key_store.get(header['kid'])
+        if key is None:
+            raise InvalidFirebaseToken("Clave de firma desconocida")
+
+        try:
+            claims = jwt.decode(
+                token, key, algorithms=['RS256'], audience=self.project_id, issuer=self.issuer,
+                leeway=self.clock_skew, options={'require': ['exp', 'iat', 'aud', 'iss', 'sub']}
+            )
+        except jwt.ExpiredSignatureError:
+            raise InvalidFirebaseToken("Token expirado")
+        except jwt.PyJWTError as e:
+            raise InvalidFirebaseToken(str(e))
+
+        if not isinstance(claims['sub'], str) or not claims['sub'] or len(claims['sub']) > 128:
+            raise InvalidFirebaseToken("sub inválido")
+        if claims.get('auth_time', 0) > time.time() + self.clock_skew:
+            raise InvalidFirebaseToken("auth_time en el futuro")
+        claims['uid'] = claims['sub']
+        return claims
+
+
+class FirebaseAuth:
+    """Inicialización perezosa del SDK, verificador intercambiable y caché de claims"""
+
+    def __init__(self, service_account_path: str = SERVICE_ACCOUNT_PATH,
+                 key_store: Optional[GoogleKeyStore] = None,
+                 cache_size: int = 2000, clock_skew: int = 30):
+        self.service_account_path = service_account_path
+        self.key_store = key_store or GoogleKeyStore()
+        self.clock_skew = clock_skew
+        self._init_lock = threading.Lock()
+        self._sdk_initialized = False
+        self._verifier = None
+        self._claims = TTLCache(max_size=cache_size, ttl=3600, name='firebase_claims')
+        self._stats = {'verified': 0, 'rejected': 0}
+        self._stats_lock = threading.Lock()
+
+    def is_configured(self) -> bool:
+        return self._verifier is not None or os.path.exists(self.service_account_path)
+
+    def initialize_sdk(self) -> bool:
+        """Inicializa Firebase Admin SDK una sola vez (thread-safe)"""
+        if self._sdk_initialized:
             return True
-        logger.error(f"❌ Error inicializando Firebase: {e}")
-        return False
-    except Exception as e:
-        logger.error(f"❌ Error inicializando Firebase: {e}")
-        return False
+        with self._init_lock:
+            if self._sdk_initialized:
+                return True
+            if not os.path.exists(self.service_account_path):
+                logger.error(f"Archivo de credenciales no encontrado: {self.service_account_path}")
+                return False
+            try:
+                import firebase_admin
+                from firebase_admin import credentials
+
+                firebase_admin.initialize_app(credentials.Certificate(self.service_account_path))
+                logger.info("✅ Firebase Admin SDK inicializado correctamente")
+            except ValueError as e:
+                if "already exists" not in str(e):
+                    logger.error(f"❌ Error inicializando Firebase: {e}")
+                    return False
+                logger.info("✅ Firebase Admin SDK ya estaba inicializado")
+            except Exception as e:
+                logger.error(f"❌ Error inicializando Firebase: {e}")
+                return False
+            self._sdk_initialized = True
+            return True
+
+    def get_verifier(self):
+        """Verificador configurado o el local construido con el project_id de las credenciales"""
+        if self._verifier is not None:
+            return self._verifier
+        with self._init_lock:
+            if self._verifier is None:
+                try:
+                    with open(self.service_account_path, encoding='utf-8') as f:
+                        project_id = json.load(f)['project_id']
+                except Exception as e:
+                    logger.error(f"❌ No se pudo leer el project_id de Firebase: {e}")
+                    return None
+                self._verifier = LocalTokenVerifier(project_id, self.key_store, self.clock_skew)
+            return self._verifier
+
+    def set_verifier(self, verifier):
+        """Reemplaza el verificador (pruebas) y vacía el caché de claims"""
+        with self._init_lock:
+            self._verifier = verifier
+        self._claims.clear()
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Claims del token; InvalidFirebaseToken si no es válido"""
+        cache_key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        claims = self._claims.get(cache_key)
+        if claims is not None and claims['exp'] > time.time():
+            return dict(claims)
+
+        verifier = self.get_verifier()
+        if verifier is None:
+            raise InvalidFirebaseToken("Firebase no configurado")
+        try:
+            claims = verifier.verify(token)
+        except InvalidFirebaseToken:
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            raise
+
+        with self._stats_lock:
+            self._stats['verified'] += 1
+        ttl = claims['exp'] - time.time()
+        if ttl > 0:
+            self._claims.set(cache_key, dict(claims), ttl=ttl)
+        return claims
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['claims_cache'] = self._claims.get_stats()
+        stats['keys'] = self.key_store.get_stats()
+        return stats
+
+
+# Instancia global (el planificador precarga y renueva las claves públicas)
+firebase_auth = FirebaseAuth(
+    key_store=GoogleKeyStore(refresh_margin=Config.FIREBASE_KEYS_REFRESH_MARGIN_SECONDS),
+    cache_size=Config.FIREBASE_CLAIMS_CACHE_SIZE,
+    clock_skew=Config.FIREBASE_CLOCK_SKEW_SECONDS
+)
+
+
+def set_token_verifier(verifier):
+    """Instala un verificador con método verify(token) -> claims (p. ej. uno falso en pruebas)"""
+    firebase_auth.set_verifier(verifier)
+
+
+def initialize_firebase():
+    """Inicializa Firebase Admin SDK (una sola vez)"""
+    return firebase_auth.initialize_sdk()
+
 
 def verify_firebase_token(firebase_token):
     """
     Verifica un token de Firebase y extrae la información del usuario
-    
+
     Args:
         firebase_token (str): Token ID de Firebase
-    
+
     Returns:
         dict: Información del usuario si el token es válido, None si no
     """
     try:
-        # Asegurar que Firebase esté inicializado
-        if not initialize_firebase():
-            logger.error("Firebase no inicializado")
-            return None
-            
-        # Verificar el token
-        decoded_token = auth.verify_id_token(firebase_token)
-        
+        decoded_token = firebase_auth.verify(firebase_token)
+
         # Extraer información del usuario
         user_info = {
             'uid': decoded_token['uid'],
@@ -70,15 +292,12 @@ def verify_firebase_token(firebase_token):
             'email_verified': decoded_token.get('email_verified', False),
             'firebase_uid': decoded_token['uid']
         }
-        
+
         logger.info(f"✅ Token Firebase verificado para: {user_info['email']}")
         return user_info
-        
-    except auth.InvalidIdTokenError:
-        logger.warning("❌ Token Firebase inválido")
-        return None
-    except auth.ExpiredIdTokenError:
-        logger.warning("❌ Token Firebase expirado")
+
+    except InvalidFirebaseToken as e:
+        logger.warning(f"❌ Token Firebase inválido: {e}")
         return None
     except Exception as e:
         logger.error(f"❌ Error verificando token Firebase: {e}")
@@ -87,19 +306,21 @@ def verify_firebase_token(firebase_token):
 def get_firebase_user(uid):
     """
     Obtiene información de un usuario de Firebase por su UID
-    
+
     Args:
         uid (str): UID del usuario en Firebase
-    
+
     Returns:
         dict: Información del usuario si existe, None si no
     """
+    if not initialize_firebase():
+        return None
+
+    from firebase_admin import auth
+
     try:
-        if not initialize_firebase():
-            return None
-            
         user_record = auth.get_user(uid)
-        
+
         user_info = {
             'uid': user_record.uid,
             'email': user_record.email,
@@ -110,12 +331,12 @@ def get_firebase_user(uid):
             'creation_timestamp': user_record.user_metadata.creation_timestamp,
             'last_sign_in_timestamp': user_record.user_metadata.last_sign_in_timestamp
         }
-        
+
         return user_info
-        
+
     except auth.UserNotFoundError:
         logger.warning(f"Usuario no encontrado en Firebase: {uid}")
         return None
     except Exception as e:
         logger.error(f"Error obteniendo usuario de Firebase: {e}")
-        return None
\ No newline at end of file
+        return None
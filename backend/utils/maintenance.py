@@ -0,0 +1,127 @@
+"""
+Purga periódica de filas expiradas
+Borra en trozos (DELETE ... LIMIT n con autocommit y una pausa entre trozos)
+para que cada sentencia retenga los bloqueos de las tablas calientes solo
+unos milisegundos. Cada corrida tiene un tope de tiempo para no acaparar
+el hilo del planificador.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeTarget(NamedTuple):
+    """Tabla y condición de expiración (debe poder usar un índice)"""
+    name: str
+    table: str
+    where: str
+    params: Tuple = ()
+
+
+def default_purge_targets(retention_minutes: int, outbox_retention_days: int) -> List[PurgeTarget]:
+    """
+    Los tokens y códigos se conservan `retention_minutes` después de expirar:
+    VerificationTokenManager.verify_token todavía encuentra el código y puede
+    responder "ha expirado" en lugar de "inválido" a quien llega tarde.
+    """
+    return [
+        PurgeTarget('email_verification_tokens', 'email_verification_tokens',
+                    'expires_at < NOW() - INTERVAL %s MINUTE', (retention_minutes,)),
+        PurgeTarget('password_reset_tokens', 'password_reset_tokens',
+                    'expires_at < NOW() - INTERVAL %s MINUTE', (retention_minutes,)),
+        PurgeTarget('action_verification_codes', 'action_verification_codes',
+                    'expires_at < NOW() - INTERVAL %s MINUTE', (retention_minutes,)),
+        # revoked_tokens.expires_at está en UTC (ver utils/token_revocation.py)
+        PurgeTarget('revoked_tokens', 'revoked_tokens', 'expires_at <= UTC_TIMESTAMP()'),
+        PurgeTarget('email_outbox', 'email_outbox',
+                    "status IN ('sent', 'failed') AND created_at < NOW() - INTERVAL %s DAY",
+                    (outbox_retention_days,)),
+    ]
+
+
+class ChunkedPurger:
+    """Ejecuta la purga por trozos de cada tabla y guarda métricas por tabla"""
+
+    def __init__(self, targets: List[PurgeTarget], chunk_size: int = 1000,
+                 pause_seconds: float = 0.05, max_seconds_per_run: float = 30.0):
+        self.targets = targets
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+        self.max_seconds_per_run = max_seconds_per_run
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {target.name: self._new_stats() for target in targets}
+
+    @staticmethod
+    def _new_stats() -> Dict[str, Any]:
+        return {
+            'total_purged': 0,
+            'last_purged': 0,
+            'last_chunks': 0,
+            'last_duration_ms': 0.0,
+            'last_error': None,
+            'runs': 0
+        }
+
+    def purge_all(self) -> Dict[str, int]:
+        """Purga todas las tablas dentro del tope de tiempo de la corrida"""
+        deadline = time.monotonic() + self.max_seconds_per_run
+        purged = {}
+        for target in self.targets:
+            if time.monotonic() >= deadline:
+                logger.info("🧹 Tope de tiempo de la purga alcanzado; se continúa en la próxima corrida")
+                break
+            purged[target.name] = self.purge(target, deadline)
+        return purged
+
+    def purge(self, target: PurgeTarget, deadline: Optional[float] = None) -> int:
+        from utils.database import db_manager
+
+        query = f"DELETE FROM {target.table} WHERE {target.where} LIMIT %s"
+        started = time.monotonic()
+        total = 0
+        chunks = 0
+        error = None
+        try:
+            while True:
+                deleted = db_manager.execute_query(query, (*target.params, self.chunk_size)) or 0
+                total += deleted
+                chunks += 1
+                if deleted < self.chunk_size:
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                # Pausa: deja pasar a las transacciones que esperan estas páginas
+                time.sleep(self.pause_seconds)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Error purgando {target.table}: {e}")
+
+        with self._lock:
+            stats = self._stats.setdefault(target.name, self._new_stats())
+            stats['runs'] += 1
+            stats['total_purged'] += total
+            stats['last_purged'] = total
+            stats['last_chunks'] = chunks
+            stats['last_duration_ms'] = round((time.monotonic() - started) * 1000, 2)
+            stats['last_error'] = error
+        if total:
+            logger.info(f"🧹 {target.table}: {total} filas expiradas purgadas en {chunks} trozos")
+        return total
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+# Instancia global del purgador (el planificador llama a purge_all)
+expired_rows_purger = ChunkedPurger(
+    default_purge_targets(Config.PURGE_TOKEN_RETENTION_MINUTES, Config.PURGE_OUTBOX_RETENTION_DAYS),
+    chunk_size=Config.PURGE_CHUNK_SIZE,
+    pause_seconds=Config.PURGE_PAUSE_MS / 1000,
+    max_seconds_per_run=Config.PURGE_MAX_SECONDS_PER_RUN
+)
@@ -3,11 +3,11 @@ Middleware de seguridad para Flask
 Aplica headers de seguridad, CORS avanzado, y otras protecciones
 """
 import logging
-from flask import request, g, current_app
+from flask import request, g, current_app, jsonify
 from functools import wraps
 import time
-import re
 from utils.security import security_event_logger
+from utils.request_screening import RequestScreener
 
 logger = logging.getLogger(__name__)
 
@@ -16,11 +16,18 @@ class SecurityMiddleware:
     
     def __init__(self, app=None):
         self.app = app
+        self.screener = RequestScreener()
         if app is not None:
             self.init_app(app)
     
     def init_app(self, app):
         """Inicializar middleware con la aplicación Flask"""
+        # Compilar firmas (por defecto + adicionales de configuración) una sola vez
+        self.screener = RequestScreener(
+            extra_user_agent_signatures=app.config.get('SCREENING_EXTRA_USER_AGENT_SIGNATURES', []),
+            extra_path_signatures=app.config.get('SCREENING_EXTRA_PATH_SIGNATURES', []),
+            ua_cache_size=app.config.get('SCREENING_UA_CACHE_SIZE', 4096)
+        )
         app.before_request(self.before_request)
         app.after_request(self.after_request)
         
@@ -32,6 +39,17 @@ class SecurityMiddleware:
         # Registrar tiempo de inicio
         g.start_time = time.time()
         
+        # IP bloqueada automáticamente por exceso de eventos de seguridad
+        blocked_for = security_event_logger.ip_blocked_for(request.remote_addr or "unknown")
+        if blocked_for is not None:
+            response = jsonify({
+                'success': False,
+                'message': f'Demasiada actividad sospechosa. Intenta en {blocked_for} segundos.'
+            })
+            response.status_code = 429
+            response.headers['Retry-After'] = str(blocked_for)
+            return response
+        
         # Verificar User-Agent sospechoso
         user_agent = request.headers.get('User-Agent', '')
         if self._is_suspicious_user_agent(user_agent):
@@ -91,47 +109,11 @@ class SecurityMiddleware:
     
     def _is_suspicious_user_agent(self, user_agent: str) -> bool:
         """Detectar User-Agents sospechosos"""
-        if not user_agent:
-            return True
-        
-        # Patrones sospechosos comunes
-        suspicious_patterns = [
-            r'sqlmap',
-            r'nikto',
-            r'nmap',
-            r'burp',
-            r'scanner',
-            r'bot.*scanner',
-            r'hack',
-            r'exploit'
-        ]
-        
-        user_agent_lower = user_agent.lower()
-        for pattern in suspicious_patterns:
-            if re.search(pattern, user_agent_lower, re.IGNORECASE):
-                return True
-        
-        return False
+        return self.screener.is_suspicious_user_agent(user_agent)
     
     def _detect_path_traversal(self, path: str) -> bool:
         """Detectar intentos de path traversal"""
-        suspicious_patterns = [
-            r'\.\.',
-            r'%2e%2e',
-            r'%252e%252e',
-            r'\.%2e',
-            r'%2e\.',
-            r'etc/passwd',
-            r'boot\.ini',
-            r'windows/system32'
-        ]
-        
-        path_lower = path.lower()
-        for pattern in suspicious_patterns:
-            if re.search(pattern, path_lower, re.IGNORECASE):
-                return True
-        
-        return False
+        return self.screener.is_path_traversal(path)
 
 def require_https(f):
     """Decorador para requerir HTTPS en producción"""
@@ -0,0 +1,201 @@
+"""
+Pool de procesos para bcrypt
+El hash y la verificación de contraseñas se ejecutan en procesos dedicados
+para no bloquear los hilos que atienden requests. La cola es acotada: con
+el pool saturado se rechaza de inmediato (PasswordPoolBusy) en lugar de
+acumular esperas.
+"""
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+import bcrypt
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordPoolBusy(Exception):
+    """El pool de bcrypt está saturado; reintentar más tarde"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("Servidor ocupado procesando contraseñas")
+        self.retry_after = retry_after
+
+
+def _hash_in_worker(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _verify_in_worker(password: bytes, password_hash: bytes) -> bool:
+    return bcrypt.checkpw(password, password_hash)
+
+
+def bcrypt_rounds(password_hash: str) -> Optional[int]:
+    """Costo de un hash bcrypt ($2b$12$...) o None si no tiene ese formato"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasherPool:
+    """ProcessPoolExecutor con profundidad de cola limitada"""
+
+    def __init__(self, workers: int = 2, max_pending: int = 32, rounds: int = 12,
+                 timeout: float = 10.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # Trabajos en ejecución + en espera
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._stats = {
+            'hashed': 0,
+            'verified': 0,
+            'rejected': 0,
+            'timeouts': 0,
+            'total_ms': 0.0
+        }
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash_in_worker, password.encode('utf-8'), self.rounds, stat='hashed').decode('utf-8')
+
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        """
+        Hashea un lote en paralelo, en orden. Como máximo `workers` trabajos
+        del lote ocupan el pool a la vez: el resto de la cola queda libre para
+        logins y registros, y el lote espera su turno en lugar de rechazarse.
+        """
+        if self.workers <= 0:
+            return [self.hash(password) for password in passwords]
+
+        batch_slots = threading.BoundedSemaphore(self.workers)
+        start = time.perf_counter()
+        futures = []
+        try:
+            for password in passwords:
+                if not batch_slots.acquire(timeout=self.timeout):
+                    raise PasswordPoolBusy()
+                if not self._slots.acquire(timeout=self.timeout):
+                    batch_slots.release()
+                    with self._lock:
+                        self._stats['rejected'] += 1
+                    raise PasswordPoolBusy()
+                try:
+                    future = self._get_executor().submit(_hash_in_worker, password.encode('utf-8'), self.rounds)
+                except Exception:
+                    self._slots.release()
+                    batch_slots.release()
+                    raise
+                future.add_done_callback(lambda _: (self._slots.release(), batch_slots.release()))
+                futures.append(future)
+            results = [future.result(timeout=self.timeout).decode('utf-8') for future in futures]
+        except FutureTimeout:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PasswordPoolBusy()
+        except BrokenProcessPool:
+            logger.error("Pool de bcrypt roto, se recreará")
+            self.shutdown()
+            raise PasswordPoolBusy()
+        finally:
+            for future in futures:
+                future.cancel()
+
+        with self._lock:
+            self._stats['hashed'] += len(results)
+            self._stats['total_ms'] += (time.perf_counter() - start) * 1000
+        return results
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        return self._run(_verify_in_worker, password.encode('utf-8'),
+                         password_hash.encode('utf-8'), stat='verified')
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """El hash se generó con un costo distinto al configurado"""
+        rounds = bcrypt_rounds(password_hash)
+        return rounds is not None and rounds != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        operations = stats['hashed'] + stats['verified']
+        stats['avg_ms'] = round(stats.pop('total_ms') / operations, 2) if operations else 0.0
+        stats['workers'] = self.workers
+        stats['max_pending'] = self.max_pending
+        stats['rounds'] = self.rounds
+        return stats
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # fork: los hijos no reimportan la app (ni abren otro pool MySQL)
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def _run(self, func, *args, stat: str):
+        if self.workers <= 0:
+            # Pool deshabilitado: bcrypt en el hilo de la request
+            start = time.perf_counter()
+            result = func(*args)
+            self._record(stat, start)
+            return result
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise PasswordPoolBusy()
+
+        start = time.perf_counter()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PasswordPoolBusy()
+        except BrokenProcessPool:
+            # Un worker murió: el próximo uso crea un pool nuevo
+            logger.error("Pool de bcrypt roto, se recreará")
+            self.shutdown()
+            raise PasswordPoolBusy()
+        self._record(stat, start)
+        return result
+
+    def _record(self, stat: str, start: float):
+        with self._lock:
+            self._stats[stat] += 1
+            self._stats['total_ms'] += (time.perf_counter() - start) * 1000
+
+
+# Instancia global del pool de bcrypt (los procesos se crean con el primer uso)
+password_pool = PasswordHasherPool(
+    workers=Config.PASSWORD_POOL_WORKERS,
+    max_pending=Config.PASSWORD_POOL_MAX_PENDING,
+    rounds=Config.BCRYPT_ROUNDS,
+    timeout=Config.PASSWORD_POOL_TIMEOUT_SECONDS
+)
+atexit.register(password_pool.shutdown)
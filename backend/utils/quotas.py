@@ -0,0 +1,102 @@
+"""
+Cuotas por usuario (token bucket) para las rutas de la API
+Cada ruta consume tokens de un bucket por usuario según su costo; los
+buckets, ráfagas y costos se configuran en Config (QUOTA_BUCKETS y
+QUOTA_ROUTES). Las solicitudes rechazadas no llegan a la base de datos.
+"""
+import logging
+import threading
+from collections import defaultdict
+from functools import wraps
+from typing import Dict, Any, Optional, Tuple
+
+from flask import jsonify
+
+from config import Config
+from utils.rate_limit_store import RateLimitStore
+from utils.security import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+class QuotaLimiter:
+    """Token buckets por usuario sobre un RateLimitStore compartido"""
+
+    DEFAULT_ROUTE = ('api', 1)
+
+    def __init__(self, store: RateLimitStore, buckets: Dict[str, Dict[str, float]],
+                 routes: Dict[str, Tuple[str, float]], enabled: bool = True):
+        self.store = store
+        self.buckets = buckets
+        self.routes = routes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._allowed: Dict[str, int] = defaultdict(int)
+        self._rejected: Dict[str, int] = defaultdict(int)
+
+    def check(self, user_id: Any, route: str) -> Tuple[bool, Optional[int]]:
+        """Consume el costo de la ruta; retorna (permitido, retry_after)"""
+        if not self.enabled:
+            return True, None
+
+        bucket_name, cost = self.routes.get(route, self.DEFAULT_ROUTE)
+        bucket = self.buckets[bucket_name]
+        try:
+            allowed, _, retry_after = self.store.take(
+                f"quota:{bucket_name}:{user_id}", bucket['burst'], bucket['refill_per_second'], cost
+            )
+        except Exception as e:
+            # Si el almacén falla se deja pasar: la cuota protege, no debe tumbar la API
+            logger.error(f"Error consultando cuota de {user_id} en {route}: {e}")
+            return True, None
+
+        with self._lock:
+            if allowed:
+                self._allowed[route] += 1
+            else:
+                self._rejected[route] += 1
+        return allowed, retry_after
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'allowed': dict(self._allowed),
+                'rejected': dict(self._rejected),
+                'rejected_total': sum(self._rejected.values())
+            }
+
+
+def user_quota(route: str):
+    """
+    Decorador para rutas con @token_required (va debajo de él): aplica la
+    cuota del usuario autenticado y responde 429 con Retry-After si se agotó
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(current_user, *args, **kwargs):
+            user_id = (current_user or {}).get('user_id')
+            if user_id is not None:
+                allowed, retry_after = quota_limiter.check(user_id, route)
+                if not allowed:
+                    response = jsonify({
+                        'success': False,
+                        'error': 'RATE_LIMITED',
+                        'message': f'Demasiadas solicitudes. Intenta de nuevo en {retry_after} segundos.',
+                        'retry_after': retry_after
+                    })
+                    response.headers['Retry-After'] = str(retry_after)
+                    return response, 429
+            return f(current_user, *args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+# Instancia global de cuotas (mismo almacén que el rate limiter por IP,
+# compartido entre workers si RATE_LIMIT_BACKEND=sqlite)
+quota_limiter = QuotaLimiter(
+    rate_limiter.store,
+    Config.QUOTA_BUCKETS,
+    Config.QUOTA_ROUTES,
+    enabled=Config.QUOTAS_ENABLED
+)
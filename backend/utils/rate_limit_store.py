@@ -0,0 +1,460 @@
+"""
+Almacenes de estado para el rate limiting
+Ventana deslizante aproximada (sliding window counter): por clave solo se
+guardan el contador de la ventana actual y el de la anterior, O(1) en
+memoria. También token buckets (tokens, última recarga) para cuotas por
+usuario. Todas las entradas expiran solas (TTL) para que las claves
+inactivas no acumulen memoria.
+
+Implementaciones:
+- MemoryRateLimitStore: en proceso (un solo worker o desarrollo)
+- SQLiteRateLimitStore: compartido entre los workers de un mismo host y
+  persistente entre reinicios
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def sliding_window_estimate(window_index: int, current: float, previous: float,
+                            now: float, window_seconds: float) -> Tuple[int, float, float]:
+    """
+    Avanza el estado guardado a la ventana de `now` y retorna
+    (window_index, current, previous) ya desplazados
+    """
+    now_index = int(now // window_seconds)
+    if now_index == window_index:
+        return window_index, current, previous
+    if now_index == window_index + 1:
+        return now_index, 0.0, current
+    return now_index, 0.0, 0.0
+
+
+def weighted_count(current: float, previous: float, now: float, window_seconds: float) -> float:
+    """Conteo estimado en los últimos window_seconds"""
+    elapsed = (now % window_seconds) / window_seconds
+    return previous * (1 - elapsed) + current
+
+
+def retry_after_seconds(current: float, previous: float, cost: float, limit: float,
+                        now: float, window_seconds: float) -> int:
+    """Segundos hasta que el conteo estimado deje espacio para `cost`"""
+    if current + cost > limit:
+        # Ni siquiera con la ventana anterior vacía alcanza: esperar la siguiente
+        return int(window_seconds - (now % window_seconds)) + 1
+    # La ventana anterior pesa cada vez menos; resolver cuándo previous*(1-t) cabe
+    needed = 1 - (limit - current - cost) / previous
+    wait = needed * window_seconds - (now % window_seconds)
+    return max(int(wait) + 1, 1)
+
+
+def refill_bucket(tokens: float, updated_at: float, now: float,
+                  capacity: float, refill_per_second: float) -> float:
+    """Tokens disponibles en `now` tras la recarga continua"""
+    return min(capacity, tokens + (now - updated_at) * refill_per_second)
+
+
+def bucket_expiry(tokens: float, now: float, capacity: float, refill_per_second: float) -> float:
+    """Momento en que el bucket vuelve a estar lleno (equivale a no existir)"""
+    return now + (capacity - tokens) / refill_per_second
+
+
+def bucket_retry_after(tokens: float, cost: float, refill_per_second: float) -> int:
+    """Segundos hasta tener `cost` tokens"""
+    return max(int((cost - tokens) / refill_per_second) + 1, 1)
+
+
+class RateLimitStore:
+    """Interfaz de los almacenes de rate limiting"""
+
+    name = "base"
+
+    def hit(self, key: str, limit: float, window_seconds: float,
+            cost: float = 1) -> Tuple[bool, float, Optional[int]]:
+        """
+        Cuenta `cost` solo si cabe en el límite.
+        Retorna (permitido, conteo_estimado, retry_after_segundos)
+        """
+        raise NotImplementedError
+
+    def incr(self, key: str, window_seconds: float, cost: float = 1) -> float:
+        """Cuenta siempre y retorna el conteo estimado de la ventana"""
+        raise NotImplementedError
+
+    def refund(self, key: str, window_seconds: float, cost: float = 1):
+        """Devuelve `cost` a la ventana actual (un hit que al final no se usó)"""
+        raise NotImplementedError
+
+    def count(self, key: str, window_seconds: float) -> float:
+        """Conteo estimado sin registrar nada"""
+        raise NotImplementedError
+
+    def take(self, key: str, capacity: float, refill_per_second: float,
+             cost: float = 1) -> Tuple[bool, float, Optional[int]]:
+        """
+        Token bucket: consume `cost` tokens si hay suficientes.
+        Retorna (permitido, tokens_restantes, retry_after_segundos)
+        """
+        raise NotImplementedError
+
+    def block(self, key: str, seconds: float):
+        """Marca la clave como bloqueada durante `seconds`"""
+        raise NotImplementedError
+
+    def blocked_for(self, key: str) -> Optional[int]:
+        """Segundos de bloqueo restantes o None"""
+        raise NotImplementedError
+
+    def acquire_block(self, key: str, seconds: float) -> Optional[int]:
+        """
+        Bloquea la clave solo si no lo estaba, de forma atómica.
+        Retorna None si la bloqueó o los segundos restantes del bloqueo vigente
+        """
+        raise NotImplementedError
+
+    def unblock(self, key: str):
+        """Levanta el bloqueo de la clave"""
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Elimina las entradas expiradas; retorna cuántas"""
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'backend': self.name}
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Almacén en proceso con límite de claves (LRU) y expiración"""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = 100000, purge_every: int = 1000):
+        self.max_keys = max_keys
+        self.purge_every = purge_every
+        # clave -> [window_index, current, previous, expires_at]
+        self._windows: "OrderedDict[str, list]" = OrderedDict()
+        # clave -> [tokens, updated_at, expires_at]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._blocks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+        self._evictions = 0
+
+    def hit(self, key, limit, window_seconds, cost=1):
+        now = time.time()
+        with self._lock:
+            window_index, current, previous = self._load(key, now, window_seconds)
+            estimate = weighted_count(current, previous, now, window_seconds)
+            if estimate + cost > limit:
+                self._save(key, window_index, current, previous, window_seconds)
+                return False, estimate, retry_after_seconds(current, previous, cost, limit, now, window_seconds)
+            self._save(key, window_index, current + cost, previous, window_seconds)
+            return True, estimate + cost, None
+
+    def incr(self, key, window_seconds, cost=1):
+        now = time.time()
+        with self._lock:
+            window_index, current, previous = self._load(key, now, window_seconds)
+            self._save(key, window_index, current + cost, previous, window_seconds)
+            return weighted_count(current + cost, previous, now, window_seconds)
+
+    def refund(self, key, window_seconds, cost=1):
+        now = time.time()
+        with self._lock:
+            window_index, current, previous = self._load(key, now, window_seconds)
+            self._save(key, window_index, max(0.0, current - cost), previous, window_seconds)
+
+    def count(self, key, window_seconds):
+        now = time.time()
+        with self._lock:
+            entry = self._windows.get(key)
+            if not entry:
+                return 0.0
+            _, current, previous = sliding_window_estimate(entry[0], entry[1], entry[2], now, window_seconds)
+            return weighted_count(current, previous, now, window_seconds)
+
+    def take(self, key, capacity, refill_per_second, cost=1):
+        now = time.time()
+        with self._lock:
+            self._ops += 1
+            if self._ops % self.purge_every == 0:
+                self._purge(now)
+            entry = self._buckets.get(key)
+            tokens = capacity if not entry else refill_bucket(entry[0], entry[1], now, capacity, refill_per_second)
+            if tokens < cost:
+                return False, tokens, bucket_retry_after(tokens, cost, refill_per_second)
+            tokens -= cost
+            self._buckets[key] = [tokens, now, bucket_expiry(tokens, now, capacity, refill_per_second)]
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self._evictions += 1
+            return True, tokens, None
+
+    def block(self, key, seconds):
+        with self._lock:
+            self._blocks[key] = time.time() + seconds
+
+    def blocked_for(self, key):
+        with self._lock:
+            until = self._blocks.get(key)
+            if until is None:
+                return None
+            remaining = until - time.time()
+            if remaining <= 0:
+                del self._blocks[key]
+                return None
+            return int(remaining) + 1
+
+    def acquire_block(self, key, seconds):
+        now = time.time()
+        with self._lock:
+            until = self._blocks.get(key)
+            if until is not None and until > now:
+                return int(until - now) + 1
+            self._blocks[key] = now + seconds
+            return None
+
+    def unblock(self, key):
+        with self._lock:
+            self._blocks.pop(key, None)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            return self._purge(now)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'backend': self.name,
+                'keys': len(self._windows),
+                'buckets': len(self._buckets),
+                'blocked': len(self._blocks),
+                'max_keys': self.max_keys,
+                'evictions': self._evictions
+            }
+
+    def _load(self, key: str, now: float, window_seconds: float) -> Tuple[int, float, float]:
+        self._ops += 1
+        if self._ops % self.purge_every == 0:
+            self._purge(now)
+        entry = self._windows.get(key)
+        if not entry or entry[3] <= now:
+            return int(now // window_seconds), 0.0, 0.0
+        return sliding_window_estimate(entry[0], entry[1], entry[2], now, window_seconds)
+
+    def _save(self, key: str, window_index: int, current: float, previous: float, window_seconds: float):
+        # La entrada deja de influir dos ventanas después de la actual
+        expires_at = (window_index + 2) * window_seconds
+        self._windows[key] = [window_index, current, previous, expires_at]
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_keys:
+            self._windows.popitem(last=False)
+            self._evictions += 1
+
+    def _purge(self, now: float) -> int:
+        expired = [key for key, entry in self._windows.items() if entry[3] <= now]
+        for key in expired:
+            del self._windows[key]
+        expired_buckets = [key for key, entry in self._buckets.items() if entry[2] <= now]
+        for key in expired_buckets:
+            del self._buckets[key]
+        expired_blocks = [key for key, until in self._blocks.items() if until <= now]
+        for key in expired_blocks:
+            del self._blocks[key]
+        return len(expired) + len(expired_buckets) + len(expired_blocks)
+
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """
+    Almacén compartido en un archivo SQLite (modo WAL). Cada operación es
+    una transacción BEGIN IMMEDIATE, atómica entre procesos del mismo host.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_windows (
+                key TEXT PRIMARY KEY,
+                window_index INTEGER NOT NULL,
+                current REAL NOT NULL,
+                previous REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_blocks (
+                key TEXT PRIMARY KEY,
+                until REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_windows_expires ON rate_windows (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, func):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _load(self, conn, key: str, now: float, window_seconds: float) -> Tuple[int, float, float]:
+        row = conn.execute(
+            "SELECT window_index, current, previous, expires_at FROM rate_windows WHERE key = ?",
+            (key,)
+        ).fetchone()
+        if not row or row[3] <= now:
+            return int(now // window_seconds), 0.0, 0.0
+        return sliding_window_estimate(row[0], row[1], row[2], now, window_seconds)
+
+    def _save(self, conn, key: str, window_index: int, current: float, previous: float, window_seconds: float):
+        conn.execute(
+            "INSERT OR REPLACE INTO rate_windows (key, window_index, current, previous, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, window_index, current, previous, (window_index + 2) * window_seconds)
+        )
+
+    def hit(self, key, limit, window_seconds, cost=1):
+        def operation(conn):
+            now = time.time()
+            window_index, current, previous = self._load(conn, key, now, window_seconds)
+            estimate = weighted_count(current, previous, now, window_seconds)
+            if estimate + cost > limit:
+                return False, estimate, retry_after_seconds(current, previous, cost, limit, now, window_seconds)
+            self._save(conn, key, window_index, current + cost, previous, window_seconds)
+            return True, estimate + cost, None
+        return self._transaction(operation)
+
+    def incr(self, key, window_seconds, cost=1):
+        def operation(conn):
+            now = time.time()
+            window_index, current, previous = self._load(conn, key, now, window_seconds)
+            self._save(conn, key, window_index, current + cost, previous, window_seconds)
+            return weighted_count(current + cost, previous, now, window_seconds)
+        return self._transaction(operation)
+
+    def refund(self, key, window_seconds, cost=1):
+        def operation(conn):
+            now = time.time()
+            window_index, current, previous = self._load(conn, key, now, window_seconds)
+            self._save(conn, key, window_index, max(0.0, current - cost), previous, window_seconds)
+        self._transaction(operation)
+
+    def count(self, key, window_seconds):
+        now = time.time()
+        _, current, previous = self._load(self._connection(), key, now, window_seconds)
+        return weighted_count(current, previous, now, window_seconds)
+
+    def take(self, key, capacity, refill_per_second, cost=1):
+        def operation(conn):
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = capacity if not row else refill_bucket(row[0], row[1], now, capacity, refill_per_second)
+            if tokens < cost:
+                return False, tokens, bucket_retry_after(tokens, cost, refill_per_second)
+            tokens -= cost
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, bucket_expiry(tokens, now, capacity, refill_per_second))
+            )
+            return True, tokens, None
+        return self._transaction(operation)
+
+    def block(self, key, seconds):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO rate_blocks (key, until) VALUES (?, ?)",
+            (key, time.time() + seconds)
+        )
+
+    def blocked_for(self, key):
+        row = self._connection().execute(
+            "SELECT until FROM rate_blocks WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return None
+        remaining = row[0] - time.time()
+        return int(remaining) + 1 if remaining > 0 else None
+
+    def acquire_block(self, key, seconds):
+        def operation(conn):
+            now = time.time()
+            row = conn.execute("SELECT until FROM rate_blocks WHERE key = ?", (key,)).fetchone()
+            if row and row[0] > now:
+                return int(row[0] - now) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_blocks (key, until) VALUES (?, ?)",
+                (key, now + seconds)
+            )
+            return None
+        return self._transaction(operation)
+
+    def unblock(self, key):
+        self._connection().execute("DELETE FROM rate_blocks WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        def operation(conn):
+            now = time.time()
+            windows = conn.execute("DELETE FROM rate_windows WHERE expires_at <= ?", (now,)).rowcount
+            buckets = conn.execute("DELETE FROM rate_buckets WHERE expires_at <= ?", (now,)).rowcount
+            blocks = conn.execute("DELETE FROM rate_blocks WHERE until <= ?", (now,)).rowcount
+            return windows + buckets + blocks
+        return self._transaction(operation)
+
+    def get_stats(self):
+        conn = self._connection()
+        return {
+            'backend': self.name,
+            'path': self.path,
+            'keys': conn.execute("SELECT COUNT(*) FROM rate_windows").fetchone()[0],
+            'buckets': conn.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0],
+            'blocked': conn.execute("SELECT COUNT(*) FROM rate_blocks").fetchone()[0]
+        }
+
+
+def create_rate_limit_store(backend: Optional[str] = None) -> RateLimitStore:
+    """Crea el almacén configurado (RATE_LIMIT_BACKEND=memory|sqlite)"""
+    backend = (backend or Config.RATE_LIMIT_BACKEND).lower()
+    if backend == 'sqlite':
+        try:
+            return SQLiteRateLimitStore(Config.RATE_LIMIT_SQLITE_PATH)
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"No se pudo abrir el almacén SQLite de rate limiting, usando memoria: {e}")
+    return MemoryRateLimitStore(max_keys=Config.RATE_LIMIT_MAX_KEYS)
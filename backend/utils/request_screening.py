@@ -0,0 +1,98 @@
+"""
+Motor de inspección de requests
+Compila todas las firmas de User-Agent y de path en una sola expresión
+regular por tipo al iniciar (una pasada por request en lugar de un
+re.search por patrón) y cachea el veredicto de los User-Agent repetidos
+en un LRU acotado.
+"""
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional, Pattern
+
+logger = logging.getLogger(__name__)
+
+# Firmas de herramientas de escaneo y ataque
+DEFAULT_USER_AGENT_SIGNATURES = [
+    r'sqlmap',
+    r'nikto',
+    r'nmap',
+    r'burp',
+    r'scanner',
+    r'bot.*scanner',
+    r'hack',
+    r'exploit'
+]
+
+# Firmas de path traversal (incluye variantes codificadas)
+DEFAULT_PATH_SIGNATURES = [
+    r'\.\.',
+    r'%2e%2e',
+    r'%252e%252e',
+    r'\.%2e',
+    r'%2e\.',
+    r'etc/passwd',
+    r'boot\.ini',
+    r'windows/system32'
+]
+
+
+def compile_signatures(signatures: Iterable[str], kind: str) -> Optional[Pattern]:
+    """
+    Combina las firmas en una alternancia compilada (insensible a mayúsculas).
+    Las firmas inválidas se descartan con un error en el log.
+    """
+    valid: List[str] = []
+    for signature in signatures:
+        try:
+            re.compile(signature)
+            valid.append(f"(?:{signature})")
+        except re.error as e:
+            logger.error(f"Firma de {kind} inválida descartada '{signature}': {e}")
+    if not valid:
+        return None
+    return re.compile("|".join(valid), re.IGNORECASE)
+
+
+class RequestScreener:
+    """Veredictos de User-Agent y path con firmas precompiladas"""
+
+    MAX_CACHED_USER_AGENT_LENGTH = 512
+
+    def __init__(self, extra_user_agent_signatures: Iterable[str] = (),
+                 extra_path_signatures: Iterable[str] = (), ua_cache_size: int = 4096):
+        self.user_agent_signatures = DEFAULT_USER_AGENT_SIGNATURES + list(extra_user_agent_signatures)
+        self.path_signatures = DEFAULT_PATH_SIGNATURES + list(extra_path_signatures)
+        self._user_agent_regex = compile_signatures(self.user_agent_signatures, 'User-Agent')
+        self._path_regex = compile_signatures(self.path_signatures, 'path')
+        # Los clientes legítimos repiten el mismo User-Agent en cada request
+        self._user_agent_verdict = lru_cache(maxsize=ua_cache_size)(self._match_user_agent)
+
+    def _match_user_agent(self, user_agent: str) -> bool:
+        return bool(self._user_agent_regex and self._user_agent_regex.search(user_agent))
+
+    def is_suspicious_user_agent(self, user_agent: str) -> bool:
+        """User-Agent vacío o con firma de herramienta de ataque"""
+        if not user_agent:
+            return True
+        if len(user_agent) > self.MAX_CACHED_USER_AGENT_LENGTH:
+            # No ocupar el caché con User-Agents anómalos de gran tamaño
+            return self._match_user_agent(user_agent)
+        return self._user_agent_verdict(user_agent)
+
+    def is_path_traversal(self, path: str) -> bool:
+        """Path con firma de path traversal"""
+        return bool(self._path_regex and self._path_regex.search(path))
+
+    def get_stats(self) -> Dict[str, Any]:
+        info = self._user_agent_verdict.cache_info()
+        total = info.hits + info.misses
+        return {
+            'user_agent_signatures': len(self.user_agent_signatures),
+            'path_signatures': len(self.path_signatures),
+            'ua_cache_size': info.currsize,
+            'ua_cache_max_size': info.maxsize,
+            'ua_cache_hits': info.hits,
+            'ua_cache_misses': info.misses,
+            'ua_cache_hit_rate': round(info.hits / total, 4) if total else 0.0
+        }
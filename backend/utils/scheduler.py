@@ -0,0 +1,158 @@
+"""
+Planificador de tareas periódicas en segundo plano
+Ejecuta trabajos de mantenimiento (proyecciones, limpiezas, reconciliaciones)
+en un único hilo daemon, sin dependencias externas
+"""
+import atexit
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScheduledJob:
+    """Trabajo registrado en el planificador"""
+    name: str
+    func: Callable[[], Any]
+    interval_seconds: float
+    next_run: float = 0.0
+    runs: int = 0
+    failures: int = 0
+    last_run: Optional[float] = None
+    last_duration_ms: Optional[float] = None
+    last_error: Optional[str] = None
+    running: bool = field(default=False, repr=False)
+
+
+class BackgroundScheduler:
+    """Planificador simple basado en intervalos fijos"""
+
+    def __init__(self):
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_job(self, name: str, func: Callable[[], Any], interval_seconds: float,
+                run_immediately: bool = False):
+        """Registrar (o reemplazar) un trabajo periódico"""
+        first_run = time.monotonic() + (0 if run_immediately else interval_seconds)
+        with self._lock:
+            self._jobs[name] = ScheduledJob(
+                name=name,
+                func=func,
+                interval_seconds=interval_seconds,
+                next_run=first_run
+            )
+        self._wakeup.set()
+        logger.info(f"Trabajo programado '{name}' cada {interval_seconds}s")
+
+    def remove_job(self, name: str):
+        """Eliminar un trabajo registrado"""
+        with self._lock:
+            self._jobs.pop(name, None)
+
+    def run_now(self, name: str) -> bool:
+        """Adelantar la próxima ejecución de un trabajo"""
+        with self._lock:
+            job = self._jobs.get(name)
+            if not job:
+                return False
+            job.next_run = time.monotonic()
+        self._wakeup.set()
+        return True
+
+    def start(self):
+        """Iniciar el hilo del planificador (idempotente)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run_loop,
+            name='background-scheduler',
+            daemon=True
+        )
+        self._thread.start()
+        logger.info("Planificador de tareas en segundo plano iniciado")
+
+    def shutdown(self, timeout: float = 5.0):
+        """Detener el planificador esperando al trabajo en curso"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Estadísticas por trabajo para monitoreo"""
+        with self._lock:
+            return {
+                name: {
+                    'interval_seconds': job.interval_seconds,
+                    'runs': job.runs,
+                    'failures': job.failures,
+                    'last_duration_ms': job.last_duration_ms,
+                    'last_error': job.last_error,
+                    'seconds_since_last_run': (
+                        round(time.monotonic() - job.last_run, 1) if job.last_run else None
+                    )
+                }
+                for name, job in self._jobs.items()
+            }
+
+    def _run_loop(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            due = []
+            with self._lock:
+                for job in self._jobs.values():
+                    if job.next_run <= now and not job.running:
+                        job.running = True
+                        due.append(job)
+                next_wakeup = min(
+                    (job.next_run for job in self._jobs.values() if not job.running),
+                    default=now + 60
+                )
+
+            for job in due:
+                if self._stop.is_set():
+                    break
+                self._execute(job)
+
+            if due:
+                continue
+
+            self._wakeup.clear()
+            self._wakeup.wait(max(0.0, next_wakeup - time.monotonic()))
+
+    def _execute(self, job: ScheduledJob):
+        started = time.monotonic()
+        try:
+            job.func()
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.error(f"Error en trabajo programado '{job.name}': {e}")
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                job.runs += 1
+                job.last_run = finished
+                job.last_duration_ms = round((finished - started) * 1000, 2)
+                job.next_run = finished + job.interval_seconds
+                job.running = False
+
+
+# Instancia global del planificador
+scheduler = BackgroundScheduler()
+atexit.register(scheduler.shutdown)
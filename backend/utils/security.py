@@ -4,14 +4,15 @@ Incluye sanitización, rate limiting, y otras protecciones
 """
 import html
 import re
-import time
 import logging
 from typing import Dict, Any, Optional, Tuple
-from datetime import datetime, timedelta
-from collections import defaultdict
 from flask import request
 import ipaddress
 
+from config import Config
+from utils.rate_limit_store import RateLimitStore, create_rate_limit_store
+from utils.security_events import SecurityEventAggregator, create_async_logger
+
 logger = logging.getLogger(__name__)
 
 class SecurityUtils:
@@ -87,16 +88,15 @@ class SecurityUtils:
 
 class RateLimiter:
     """
-    Rate limiter por IP con múltiples ventanas de tiempo
+    Rate limiter por IP con ventana deslizante aproximada.
+    El estado vive en un RateLimitStore intercambiable (memoria o compartido
+    entre workers), con memoria O(1) por clave y expiración automática.
     """
     
-    def __init__(self):
-        # Estructura: {ip: {endpoint: [(timestamp, count), ...]}}
-        self._requests: Dict[str, Dict[str, list]] = defaultdict(lambda: defaultdict(list))
-        # Estructura para intentos de login fallidos: {ip: [(timestamp, count)]}
-        self._failed_attempts: Dict[str, list] = defaultdict(list)
-        # Cuentas bloqueadas temporalmente: {email: timestamp_unblock}
-        self._blocked_accounts: Dict[str, datetime] = {}
+    FAILED_LOGIN_WINDOW = 3600  # 1 hora
+    
+    def __init__(self, store: Optional[RateLimitStore] = None):
+        self.store = store or create_rate_limit_store()
     
     def _get_client_ip(self) -> str:
         """Obtener IP real del cliente considerando proxies"""
@@ -116,17 +116,6 @@ class RateLimiter:
             logger.warning(f"IP inválida detectada: {ip}")
             return request.remote_addr or "unknown"
     
-    def _cleanup_old_requests(self, ip: str, endpoint: str, window_seconds: int):
-        """Limpiar requests antiguos fuera de la ventana de tiempo"""
-        current_time = time.time()
-        cutoff_time = current_time - window_seconds
-        
-        if ip in self._requests and endpoint in self._requests[ip]:
-            self._requests[ip][endpoint] = [
-                (timestamp, count) for timestamp, count in self._requests[ip][endpoint]
-                if timestamp > cutoff_time
-            ]
-    
     def is_rate_limited(self, endpoint: str, max_requests: int = 10, 
                        window_seconds: int = 60) -> Tuple[bool, Optional[int]]:
         """
@@ -136,28 +125,14 @@ class RateLimiter:
             Tuple[bool, Optional[int]]: (is_limited, retry_after_seconds)
         """
         ip = self._get_client_ip()
-        current_time = time.time()
-        
-        # Limpiar requests antiguos
-        self._cleanup_old_requests(ip, endpoint, window_seconds)
-        
-        # Contar requests en la ventana actual
-        request_count = sum(
-            count for timestamp, count in self._requests[ip][endpoint]
+        allowed, request_count, retry_after = self.store.hit(
+            f"req:{endpoint}:{ip}", max_requests, window_seconds
         )
         
-        if request_count >= max_requests:
-            # Calcular tiempo de espera
-            oldest_request = min(
-                timestamp for timestamp, count in self._requests[ip][endpoint]
-            )
-            retry_after = int(window_seconds - (current_time - oldest_request)) + 1
-            
-            logger.warning(f"Rate limit excedido para {ip} en {endpoint}: {request_count}/{max_requests}")
-            return True, max(retry_after, 1)
+        if not allowed:
+            logger.warning(f"Rate limit excedido para {ip} en {endpoint}: {request_count:.0f}/{max_requests}")
+            return True, retry_after
         
-        # Registrar este request
-        self._requests[ip][endpoint].append((current_time, 1))
         return False, None
     
     def record_failed_login(self, ip: str = None) -> int:
@@ -165,24 +140,12 @@ class RateLimiter:
         Registrar intento de login fallido
         
         Returns:
-            int: Número total de intentos fallidos en la última hora
+            int: Número (estimado) de intentos fallidos en la última hora
         """
         if ip is None:
             ip = self._get_client_ip()
         
-        current_time = time.time()
-        cutoff_time = current_time - 3600  # 1 hora
-        
-        # Limpiar intentos antiguos
-        self._failed_attempts[ip] = [
-            (timestamp, count) for timestamp, count in self._failed_attempts[ip]
-            if timestamp > cutoff_time
-        ]
-        
-        # Registrar nuevo intento fallido
-        self._failed_attempts[ip].append((current_time, 1))
-        
-        failed_count = len(self._failed_attempts[ip])
+        failed_count = round(self.store.incr(f"fail:{ip}", self.FAILED_LOGIN_WINDOW))
         
         if failed_count >= 5:
             logger.warning(f"Múltiples intentos de login fallidos desde {ip}: {failed_count}")
@@ -194,14 +157,13 @@ class RateLimiter:
         if ip is None:
             ip = self._get_client_ip()
         
-        failed_count = len(self._failed_attempts.get(ip, []))
+        failed_count = self.store.count(f"fail:{ip}", self.FAILED_LOGIN_WINDOW)
         return failed_count >= 10  # 10 intentos fallidos en una hora
     
     def block_account_temporarily(self, email: str, minutes: int = 15):
         """Bloquear cuenta temporalmente"""
-        unblock_time = datetime.utcnow() + timedelta(minutes=minutes)
-        self._blocked_accounts[email] = unblock_time
-        logger.warning(f"Cuenta bloqueada temporalmente: {email} hasta {unblock_time}")
+        self.store.block(f"account:{email}", minutes * 60)
+        logger.warning(f"Cuenta bloqueada temporalmente: {email} por {minutes} minutos")
     
     def is_account_blocked(self, email: str) -> Tuple[bool, Optional[int]]:
         """
@@ -210,63 +172,97 @@ class RateLimiter:
         Returns:
             Tuple[bool, Optional[int]]: (is_blocked, remaining_seconds)
         """
-        if email not in self._blocked_accounts:
+        remaining_seconds = self.store.blocked_for(f"account:{email}")
+        if remaining_seconds is None:
             return False, None
+        return True, remaining_seconds
+    
+    def reserve_verification_email(self, email: str, cooldown_seconds: int = 60,
+                                   max_per_window: int = 3,
+                                   window_seconds: int = 900) -> Tuple[bool, Optional[str], Optional[int]]:
+        """
+        Cooldown y límite por ventana de envíos de código a un email, resueltos
+        en el almacén del limiter antes de cualquier consulta a la base de datos.
+        Reserva el envío de forma atómica (toma el cooldown y cuenta en la
+        ventana), así una ráfaga de requests paralelas no pasa entera; si al
+        final no se envía el código, release_verification_email la devuelve.
         
-        unblock_time = self._blocked_accounts[email]
-        current_time = datetime.utcnow()
+        Returns:
+            Tuple[bool, Optional[str], Optional[int]]: (is_limited, 'cooldown' | 'window', retry_after_seconds)
+        """
+        email = email.strip().lower()
+        cooldown_remaining = self.store.acquire_block(f"verify_cooldown:{email}", cooldown_seconds)
+        if cooldown_remaining is not None:
+            return True, 'cooldown', cooldown_remaining
         
-        if current_time >= unblock_time:
-            # El bloqueo ha expirado
-            del self._blocked_accounts[email]
-            return False, None
+        allowed, request_count, retry_after = self.store.hit(
+            f"verify_window:{email}", max_per_window, window_seconds
+        )
+        if not allowed:
+            self.store.unblock(f"verify_cooldown:{email}")
+            logger.warning(f"Límite de envíos de código excedido para {email}: {request_count:.0f}/{max_per_window}")
+            return True, 'window', retry_after
         
-        remaining_seconds = int((unblock_time - current_time).total_seconds())
-        return True, remaining_seconds
+        return False, None, None
+    
+    def release_verification_email(self, email: str, window_seconds: int = 900):
+        """Devuelve una reserva que no terminó en un código enviado"""
+        email = email.strip().lower()
+        self.store.refund(f"verify_window:{email}", window_seconds)
+        self.store.unblock(f"verify_cooldown:{email}")
 
 class SecurityEventLogger:
-    """Logger especializado para eventos de seguridad"""
+    """
+    Logger especializado para eventos de seguridad.
+    Los eventos se agregan por (ip, tipo) y ventana y se escriben en segundo
+    plano (ver utils/security_events.py); una IP que supera el umbral en una
+    ventana queda bloqueada temporalmente.
+    """
     
     def __init__(self):
-        self.security_logger = logging.getLogger('security')
-        
-        # Configurar handler específico para seguridad si no existe
-        if not self.security_logger.handlers:
-            handler = logging.StreamHandler()
-            formatter = logging.Formatter(
-                '%(asctime)s - SECURITY - %(levelname)s - %(message)s'
-            )
-            handler.setFormatter(formatter)
-            self.security_logger.addHandler(handler)
-            self.security_logger.setLevel(logging.WARNING)
+        self.security_logger, self._listener = create_async_logger(
+            'security', '%(asctime)s - SECURITY - %(levelname)s - %(message)s'
+        )
+        self.aggregator = SecurityEventAggregator(
+            self.security_logger,
+            window_seconds=Config.SECURITY_EVENT_WINDOW_SECONDS,
+            max_keys=Config.SECURITY_EVENT_MAX_KEYS,
+            block_threshold=Config.SECURITY_AUTOBLOCK_THRESHOLD,
+            block_seconds=Config.SECURITY_AUTOBLOCK_SECONDS,
+            allowlist=['unknown', *Config.SECURITY_AUTOBLOCK_ALLOWLIST]
+        )
     
     def log_failed_login(self, login_field: str, ip: str, reason: str = "invalid_credentials"):
         """Log intento de login fallido"""
-        self.security_logger.warning(
+        self.aggregator.record(
+            ip, "failed_login", logging.WARNING,
             f"FAILED_LOGIN - IP: {ip}, Login: {login_field}, Reason: {reason}"
         )
     
     def log_rate_limit_exceeded(self, ip: str, endpoint: str, attempts: int):
         """Log rate limit excedido"""
-        self.security_logger.warning(
+        self.aggregator.record(
+            ip, f"rate_limit:{endpoint}", logging.WARNING,
             f"RATE_LIMIT_EXCEEDED - IP: {ip}, Endpoint: {endpoint}, Attempts: {attempts}"
         )
     
     def log_suspicious_activity(self, ip: str, activity: str, details: str = ""):
         """Log actividad sospechosa"""
-        self.security_logger.error(
+        self.aggregator.record(
+            ip, f"suspicious:{activity}", logging.ERROR,
             f"SUSPICIOUS_ACTIVITY - IP: {ip}, Activity: {activity}, Details: {details}"
         )
     
     def log_account_blocked(self, email: str, ip: str, reason: str):
-        """Log bloqueo de cuenta"""
+        """Log bloqueo de cuenta (poco frecuente: siempre se escribe)"""
         self.security_logger.error(
             f"ACCOUNT_BLOCKED - Email: {email}, IP: {ip}, Reason: {reason}"
         )
     
     def log_invalid_token(self, ip: str, token_error: str):
         """Log token JWT inválido"""
-        self.security_logger.warning(
+        self.aggregator.record(
+            ip, "invalid_token", logging.WARNING,
             f"INVALID_TOKEN - IP: {ip}, Error: {token_error}"
         )
     
@@ -274,9 +270,21 @@ class SecurityEventLogger:
         """Log intento de XSS detectado"""
         # No logear el payload completo por seguridad, solo un hash o preview
         payload_preview = payload[:50] + "..." if len(payload) > 50 else payload
-        self.security_logger.error(
+        self.aggregator.record(
+            ip, f"xss:{field}", logging.ERROR,
             f"XSS_ATTEMPT - IP: {ip}, Field: {field}, Payload_Preview: {payload_preview}"
         )
+    
+    def ip_blocked_for(self, ip: str) -> Optional[int]:
+        """Segundos restantes del bloqueo automático de la IP, o None"""
+        return self.aggregator.blocked_for(ip)
+    
+    def flush(self) -> int:
+        """Cerrar la ventana de agregación (trabajo periódico)"""
+        return self.aggregator.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return self.aggregator.get_stats()
 
 # Instancias globales
 security_utils = SecurityUtils()
@@ -302,4 +310,24 @@ def check_rate_limit(endpoint: str, max_requests: int = 10, window_seconds: int
 
 def record_failed_login(ip: str = None) -> int:
     """Función de conveniencia para registrar login fallido"""
-    return rate_limiter.record_failed_login(ip)
\ No newline at end of file
+    return rate_limiter.record_failed_login(ip)
+
+def is_account_blocked(email: str) -> Tuple[bool, Optional[int]]:
+    """Función de conveniencia para verificar bloqueo temporal de cuenta"""
+    return rate_limiter.is_account_blocked(email)
+
+def reserve_verification_email(email: str) -> Tuple[bool, Optional[str], Optional[int]]:
+    """Función de conveniencia para reservar un envío de código de verificación por email"""
+    return rate_limiter.reserve_verification_email(
+        email,
+        cooldown_seconds=Config.VERIFICATION_EMAIL_COOLDOWN_SECONDS,
+        max_per_window=Config.VERIFICATION_EMAIL_MAX_PER_WINDOW,
+        window_seconds=Config.VERIFICATION_EMAIL_WINDOW_SECONDS
+    )
+
+def release_verification_email(email: str):
+    """Función de conveniencia para devolver una reserva sin código enviado"""
+    rate_limiter.release_verification_email(
+        email,
+        window_seconds=Config.VERIFICATION_EMAIL_WINDOW_SECONDS
+    )
@@ -0,0 +1,148 @@
+"""
+Agregación de eventos de seguridad
+Una ráfaga de un escáner (miles de User-Agents sospechosos o tokens
+inválidos) ya no escribe una línea de log por evento: los eventos se cuentan
+en memoria por (ip, tipo) y ventana. El primero de cada clave se registra al
+momento y el resto sale en una línea de resumen al cerrar la ventana. La
+escritura la hace un hilo de fondo (QueueHandler + QueueListener), nunca la
+request.
+
+Al alcanzar el umbral de eventos en una ventana la IP queda bloqueada
+temporalmente; la comprobación es la misma cuenta que ya se hace por evento.
+Los bloqueos son locales a cada worker.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def create_async_logger(name: str, fmt: str, level: int = logging.WARNING) -> Tuple[logging.Logger, logging.handlers.QueueListener]:
+    """
+    Logger cuyas líneas se encolan y las escribe un QueueListener en su hilo;
+    no propaga al root para no volver a escribirlas de forma síncrona
+    """
+    target = logging.getLogger(name)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(fmt))
+    log_queue: queue.Queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    target.handlers = [logging.handlers.QueueHandler(log_queue)]
+    target.setLevel(level)
+    target.propagate = False
+    listener.start()
+    atexit.register(listener.stop)
+    return target, listener
+
+
+class SecurityEventAggregator:
+    """Contadores por (ip, tipo) por ventana y bloqueos automáticos por IP"""
+
+    OVERFLOW_IP = '*'
+
+    def __init__(self, sink: logging.Logger, window_seconds: int = 60, max_keys: int = 10000,
+                 block_threshold: int = 100, block_seconds: int = 900,
+                 allowlist: Iterable[str] = ('unknown',)):
+        self.sink = sink
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.block_threshold = block_threshold
+        self.block_seconds = block_seconds
+        self.allowlist = set(allowlist)
+        self._lock = threading.Lock()
+        # (ip, tipo) -> [cuenta, nivel, primer mensaje]
+        self._window: Dict[Tuple[str, str], List[Any]] = {}
+        self._window_started = time.monotonic()
+        self._blocked: Dict[str, float] = {}
+        self._stats = {
+            'events': 0,
+            'logged': 0,
+            'summaries': 0,
+            'overflow': 0,
+            'blocks': 0
+        }
+
+    def record(self, ip: str, event_type: str, level: int, message: str):
+        """Cuenta el evento; solo el primero de cada (ip, tipo) en la ventana se escribe"""
+        key = (ip, event_type)
+        blocked_now = False
+        if time.monotonic() - self._window_started >= self.window_seconds:
+            # Sin planificador (o atrasado) la ventana se cierra con el siguiente evento
+            self.flush()
+        with self._lock:
+            self._stats['events'] += 1
+            entry = self._window.get(key)
+            if entry is None:
+                if len(self._window) >= self.max_keys:
+                    # Demasiadas claves distintas: se agrupan sin mensaje propio
+                    self._stats['overflow'] += 1
+                    key = (self.OVERFLOW_IP, event_type)
+                    entry = self._window.setdefault(key, [0, level, f"{event_type} (claves agrupadas)"])
+                    entry[0] += 1
+                    return
+                self._window[key] = [1, level, message]
+                self._stats['logged'] += 1
+                count = 1
+            else:
+                entry[0] += 1
+                count = entry[0]
+            if count == self.block_threshold and ip not in self.allowlist:
+                self._blocked[ip] = time.monotonic() + self.block_seconds
+                self._stats['blocks'] += 1
+                blocked_now = True
+
+        if count == 1:
+            self.sink.log(level, message)
+        if blocked_now:
+            self.sink.error(
+                f"IP_AUTO_BLOCKED - IP: {ip}, Type: {event_type}, Events: {count} "
+                f"en {self.window_seconds}s, Duration: {self.block_seconds}s"
+            )
+
+    def blocked_for(self, ip: str) -> Optional[int]:
+        """Segundos restantes de bloqueo de la IP, o None"""
+        until = self._blocked.get(ip)
+        if until is None:
+            return None
+        remaining = until - time.monotonic()
+        if remaining <= 0:
+            with self._lock:
+                self._blocked.pop(ip, None)
+            return None
+        return max(1, int(remaining))
+
+    def unblock(self, ip: str) -> bool:
+        with self._lock:
+            return self._blocked.pop(ip, None) is not None
+
+    def flush(self) -> int:
+        """Cierra la ventana: una línea de resumen por clave repetida"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._window and now - self._window_started < self.window_seconds:
+                return 0
+            window, self._window = self._window, {}
+            elapsed = now - self._window_started
+            self._window_started = now
+            self._blocked = {ip: until for ip, until in self._blocked.items() if until > now}
+
+        summaries = 0
+        for (ip, event_type), (count, level, message) in window.items():
+            if ip == self.OVERFLOW_IP or count > 1:
+                self.sink.log(level, f"SUMMARY {event_type} x{count} en {elapsed:.0f}s - IP: {ip} - Primero: {message}")
+                summaries += 1
+        with self._lock:
+            self._stats['summaries'] += summaries
+        return summaries
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_keys'] = len(self._window)
+            stats['blocked_ips'] = len(self._blocked)
+        return stats
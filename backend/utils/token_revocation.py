@@ -0,0 +1,140 @@
+"""
+Lista de revocación de tokens JWT (por jti)
+Las revocaciones se escriben en revoked_tokens y se mantienen en memoria en
+un filtro de Bloom más un conjunto exacto; la consulta en token_required no
+toca la base de datos. Un trabajo periódico trae las revocaciones hechas por
+otros workers y poda de memoria las que ya expiraron.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from config import Config
+from utils.auth import verified_token_cache
+from utils.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+
+def _to_epoch(value: datetime) -> float:
+    """revoked_tokens.expires_at se guarda en UTC sin zona horaria"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TokenRevocationList:
+    """Revocaciones vigentes: Bloom como camino rápido y dict jti -> exp como verdad"""
+
+    def __init__(self, bloom_capacity: int = 100000, error_rate: float = 0.001):
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._revoked: Dict[str, float] = {}
+        self._bloom = BloomFilter(bloom_capacity, error_rate)
+        self._last_id = 0
+        self._last_sync: Optional[float] = None
+        self._stats = {
+            'checks': 0,
+            'bloom_negatives': 0,
+            'bloom_false_positives': 0,
+            'revoked_hits': 0
+        }
+
+    def is_revoked(self, payload: dict) -> bool:
+        """Solo memoria: nunca agrega una consulta a la request autenticada"""
+        jti = payload.get('jti')
+        if not jti:
+            return False
+        with self._lock:
+            self._stats['checks'] += 1
+            if jti not in self._bloom:
+                self._stats['bloom_negatives'] += 1
+                return False
+            expires_at = self._revoked.get(jti)
+            if expires_at is None:
+                self._stats['bloom_false_positives'] += 1
+                return False
+            self._stats['revoked_hits'] += 1
+            return True
+
+    def revoke(self, payload: dict) -> bool:
+        """Revoca el token del payload (persistente y efectivo de inmediato en este worker)"""
+        from utils.database import db_manager
+
+        jti = payload.get('jti')
+        exp = payload.get('exp')
+        if not jti or not exp:
+            return False
+
+        db_manager.execute_query("""
+            INSERT IGNORE INTO revoked_tokens (jti, user_id, expires_at)
+            VALUES (%s, %s, %s)
+        """, (jti, payload.get('user_id'), datetime.utcfromtimestamp(exp)))
+        self._add(jti, float(exp))
+        return True
+
+    def sync(self) -> int:
+        """Trae las revocaciones nuevas de revoked_tokens (incremental por id)"""
+        from utils.database import db_manager
+
+        rows = db_manager.fetch_all("""
+            SELECT id, jti, expires_at FROM revoked_tokens
+            WHERE id > %s AND expires_at > UTC_TIMESTAMP()
+            ORDER BY id
+        """, (self._last_id,)) or []
+
+        for row in rows:
+            self._add(row['jti'], _to_epoch(row['expires_at']))
+        with self._lock:
+            if rows:
+                self._last_id = max(self._last_id, rows[-1]['id'])
+            self._last_sync = time.time()
+        return len(rows)
+
+    def prune(self) -> int:
+        """
+        Quita de memoria las revocaciones expiradas y reconstruye el Bloom
+        (las filas de revoked_tokens las borra utils/maintenance.py por trozos)
+        """
+        now = time.time()
+        with self._lock:
+            vigentes = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+            pruned = len(self._revoked) - len(vigentes)
+            bloom = BloomFilter(max(self.bloom_capacity, len(vigentes) * 2), self.error_rate)
+            bloom.update(vigentes)
+            self._revoked = vigentes
+            self._bloom = bloom
+            # El siguiente sync relee todo lo vigente (cubre ids confirmados fuera de orden)
+            self._last_id = 0
+
+        if pruned:
+            logger.info(f"Revocaciones expiradas podadas: {pruned}")
+        return pruned
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['revoked'] = len(self._revoked)
+            stats['bloom_bits'] = self._bloom.num_bits
+            stats['bloom_saturated'] = self._bloom.is_saturated()
+            stats['last_sync'] = self._last_sync
+        return stats
+
+    def _add(self, jti: str, expires_at: float):
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._bloom.add(jti)
+            if self._bloom.is_saturated():
+                bloom = BloomFilter(self._bloom.capacity * 2, self.error_rate)
+                bloom.update(self._revoked)
+                self._bloom = bloom
+
+
+# Instancia global de la lista de revocación, conectada al caché de tokens
+# verificados para que también se consulte en los aciertos de caché
+token_revocation_list = TokenRevocationList(
+    bloom_capacity=Config.REVOCATION_BLOOM_CAPACITY,
+    error_rate=Config.REVOCATION_BLOOM_ERROR_RATE
+)
+verified_token_cache.register_revocation_check(token_revocation_list.is_revoked)
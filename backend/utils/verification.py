@@ -140,16 +140,16 @@ class VerificationTokenManager:
     
     @staticmethod
     def cleanup_all_expired_tokens() -> int:
-        """Limpiar todos los tokens expirados (para ejecutar periódicamente)"""
+        """
+        Limpiar todos los tokens expirados, por trozos para no bloquear la tabla
+        (el planificador ya lo hace periódicamente vía utils/maintenance.py)
+        """
         try:
-            query = """
-                DELETE FROM email_verification_tokens 
-                WHERE expires_at < %s
-            """
-            params = (datetime.now(),)
+            from utils.maintenance import expired_rows_purger, PurgeTarget
             
-            result = db_manager.execute_query(query, params)
-            deleted_count = result if isinstance(result, int) else 0
+            deleted_count = expired_rows_purger.purge(PurgeTarget(
+                'email_verification_tokens', 'email_verification_tokens', 'expires_at < %s', (datetime.now(),)
+            ))
             
             if deleted_count > 0:
                 logger.info(f"🧹 Limpiados {deleted_count} tokens expirados globalmente")
@@ -222,42 +222,3 @@ class VerificationTokenManager:
         except Exception as e:
             logger.error(f"❌ Error invalidando tokens para {user_email}: {e}")
             return 0
-    
-    @staticmethod
-    def get_recent_token_requests(user_email: str, minutes: int = 15) -> int:
-        """Contar solicitudes de token recientes para rate limiting"""
-        try:
-            since_time = datetime.now() - timedelta(minutes=minutes)
-            query = """
-                SELECT COUNT(*) as count
-                FROM email_verification_tokens 
-                WHERE user_email = %s AND created_at > %s
-            """
-            params = (user_email, since_time)
-            
-            result = db_manager.fetch_one(query, params)
-            return result['count'] if result else 0
-            
-        except Exception as e:
-            logger.error(f"❌ Error contando requests recientes para {user_email}: {e}")
-            return 0
-    
-    @staticmethod
-    def get_last_token_time(user_email: str) -> Optional[datetime]:
-        """Obtener timestamp del último token generado"""
-        try:
-            query = """
-                SELECT created_at
-                FROM email_verification_tokens 
-                WHERE user_email = %s
-                ORDER BY created_at DESC
-                LIMIT 1
-            """
-            params = (user_email,)
-            
-            result = db_manager.fetch_one(query, params)
-            return result['created_at'] if result else None
-            
-        except Exception as e:
-            logger.error(f"❌ Error obteniendo último token para {user_email}: {e}")
-            return None
\ No newline at end of file
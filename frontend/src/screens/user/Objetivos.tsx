@@ -410,16 +410,16 @@ const Objetivos: React.FC<ObjetivosProps> = ({ onAuthChange }) => {
     try {
       console.log(`🎯 Agregando $${cantidad} al objetivo ${objetivoId}...`);
 
-      const updatedGoal = await financialService.addMoneyToGoal(objetivoId, cantidad);
+      const { ahorroActual } = await financialService.addMoneyToGoal(objetivoId, cantidad);
 
-      // Update local state
+      // Update local state (the API only returns the new balance)
       setObjetivos(prev => prev.map(obj =>
-        obj.id === objetivoId ? updatedGoal : obj
+        obj.id === objetivoId ? { ...obj, ahorroActual } : obj
       ));
 
       // Update selected objetivo if it's the same one we just updated
       if (selectedObjetivo && selectedObjetivo.id === objetivoId) {
-        setSelectedObjetivo(updatedGoal);
+        setSelectedObjetivo({ ...selectedObjetivo, ahorroActual });
       }
 
       // Update summary
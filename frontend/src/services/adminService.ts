@@ -15,10 +15,13 @@ export interface User {
 export interface GetUsersResponse {
   users: User[];
   pagination: {
-    page: number;
+    page?: number;
     limit: number;
-    total: number;
-    totalPages: number;
+    total?: number;
+    totalPages?: number;
+    totalIsApproximate?: boolean;
+    nextCursor: string | null;
+    hasMore: boolean;
   };
 }
 
@@ -56,6 +59,8 @@ export const adminService = {
     params: {
       page?: number;
       limit?: number;
+      cursor?: string;
+      count?: boolean;
       search?: string;
       status?: 'all' | 'active' | 'suspended' | 'banned';
     }
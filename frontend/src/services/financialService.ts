@@ -130,6 +130,17 @@ interface Goal {
   estado?: 'activo' | 'completado' | 'pausado';
 }
 
+interface GoalMovementResult {
+  id: number;
+  ahorroActual: number;
+  movimiento: {
+    id: number;
+    monto: number;
+    esAporte: boolean;
+    descripcion: string;
+  };
+}
+
 interface GoalResumen {
   totalAhorrado: number;
   totalMetas: number;
@@ -150,6 +161,7 @@ interface GoalMovement {
   tipo: 'aporte' | 'retiro';
   descripcion: string;
   fecha: string;
+  saldo_acumulado?: number;
 }
 
 interface Bill {
@@ -667,7 +679,7 @@ class FinancialService {
     }
   }
 
-  async addMoneyToGoal(goalId: number, amount: number): Promise<Goal> {
+  async addMoneyToGoal(goalId: number, amount: number): Promise<GoalMovementResult> {
     try {
       console.log(`🎯 Agregando $${amount} al objetivo ${goalId}...`);
       const { headers, hasToken } = await this.getAuthHeaders();
@@ -697,7 +709,7 @@ class FinancialService {
     }
   }
 
-  async withdrawMoneyFromGoal(goalId: number, amount: number): Promise<Goal> {
+  async withdrawMoneyFromGoal(goalId: number, amount: number): Promise<GoalMovementResult> {
     try {
       console.log(`🎯 Retirando $${amount} del objetivo ${goalId}...`);
       const { headers, hasToken } = await this.getAuthHeaders();
@@ -1271,6 +1283,7 @@ export type {
   ExpenseResumen,
   Goal,
   GoalResumen,
+  GoalMovementResult,
   GoalMovement,
   Category,
   IncomeType,